@@ -0,0 +1,136 @@
+# ann_benchmark.py
+#
+# Yaklaşık komşu arama motorlarının (IVF, LSH) recall@k ve sorgu gecikmesini
+# tam (exact) arama ile karşılaştırır.
+#
+# Kullanım:
+#   PYTHONPATH=. python benchmarks/ann_benchmark.py --rows 3900 20000 --k 10
+#   PYTHONPATH=. python benchmarks/ann_benchmark.py --features items --output ann.json
+
+import argparse
+import json
+import time
+
+import numpy as np
+from sklearn.preprocessing import normalize
+
+from benchmarks.synthetic import generate_dataset
+from common.ann import build_neighbor_index
+from common.data_preprocessing import FeatureCache, split_dataset, split_frame
+from common.neighbors import row_similarities, select_top_k
+
+
+# Denenecek motor yapılandırmaları
+CONFIGURATIONS = [
+    ('ivf', {'n_probe': 1}),
+    ('ivf', {'n_probe': 4}),
+    ('ivf', {'n_probe': 8}),
+    ('lsh', {'n_tables': 8, 'n_bits': 12}),
+    ('lsh', {'n_tables': 16, 'n_bits': 12}),
+    ('lsh', {'n_tables': 16, 'n_bits': 16}),
+]
+
+
+def load_matrix(n_rows, features, data_path):
+    """Gerçek (n_rows=None) ya da sentetik veri setinden kodlanmış özellik matrisi"""
+    if n_rows is None:
+        user_df, item_df = split_dataset(data_path)
+    else:
+        user_df, item_df = split_frame(generate_dataset(n_rows, data_path=data_path))
+
+    cache = FeatureCache()
+    if features == 'users':
+        return cache.encode(user_df)
+    return cache.encode(item_df, [col for col in item_df.columns
+                                  if col not in ('Customer ID', 'Purchase Amount (USD)')])
+
+
+def exact_neighbors(matrix, queries, k):
+    """Sorgu satırlarının tam en benzer k komşusu ve sorgu başına süre"""
+    normalized = normalize(matrix)
+    started = time.perf_counter()
+    indices, scores, counts = [], [], []
+    for row in queries:
+        block = row_similarities(normalized, [row])
+        row_indices, row_scores, row_counts = select_top_k(block, k, [row])
+        indices.append(row_indices[0])
+        scores.append(row_scores[0])
+        counts.append(row_counts[0])
+    latency = (time.perf_counter() - started) / len(queries)
+    return np.array(indices), np.array(scores), np.array(counts), latency
+
+
+def recall_at_k(exact_scores, exact_counts, scores, counts):
+    """
+    Skor tabanlı recall@k: tam listedeki k. skora eşit ya da büyük skorlu bulunan
+    komşuların oranı (sınırdaki eşit skorlu komşular birbirinin yerine sayılır).
+    """
+    has_neighbors = exact_counts > 0
+    if not has_neighbors.any():
+        return 1.0
+    rows = np.arange(len(exact_counts))
+    kth = exact_scores[rows, np.maximum(exact_counts - 1, 0)]
+    valid = np.arange(scores.shape[1]) < counts[:, None]
+    hits = ((scores >= kth[:, None] - 1e-6) & valid).sum(axis=1)
+    hits = np.minimum(hits, exact_counts)
+    return float(hits[has_neighbors].sum() / exact_counts[has_neighbors].sum())
+
+
+def run(rows_list, features, k, n_queries, data_path, seed=42):
+    results = []
+    for n_rows in rows_list:
+        matrix = load_matrix(n_rows, features, data_path)
+        size = matrix.shape[0]
+        queries = np.random.default_rng(seed).choice(size, min(n_queries, size), replace=False)
+        exact_indices, exact_scores, exact_counts, exact_latency = exact_neighbors(matrix, queries, k)
+
+        results.append({'rows': size, 'backend': 'exact', 'options': {}, 'build_s': 0.0,
+                        'query_ms': exact_latency * 1000, 'recall': 1.0})
+
+        for backend, options in CONFIGURATIONS:
+            started = time.perf_counter()
+            index = build_neighbor_index(backend, k, **options).fit(matrix)
+            build_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            _, scores, counts = index.neighbors_batch(queries, k)
+            latency = (time.perf_counter() - started) / len(queries)
+
+            results.append({
+                'rows': size, 'backend': backend, 'options': options,
+                'build_s': build_time, 'query_ms': latency * 1000,
+                'recall': recall_at_k(exact_scores, exact_counts, scores, counts)
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ANN recall@k / gecikme karşılaştırması')
+    parser.add_argument('--rows', type=int, nargs='*', default=[None],
+                        help='Sentetik veri seti boyutları (verilmezse gerçek veri seti)')
+    parser.add_argument('--features', choices=['users', 'items'], default='users',
+                        help='Kullanıcı ya da ürün özellik matrisi')
+    parser.add_argument('--k', type=int, default=10, help='Komşu sayısı')
+    parser.add_argument('--queries', type=int, default=500, help='Sorgu sayısı')
+    parser.add_argument('--data_path', default='./data/shopping_trends_updated.csv')
+    parser.add_argument('--output', help='Sonuçların yazılacağı JSON dosyası')
+    args = parser.parse_args()
+
+    results = run(args.rows, args.features, args.k, args.queries, args.data_path)
+
+    print(f"\n{'Satır':>8} {'Motor':<6} {'Seçenekler':<28} {'Kurulum (s)':>11} "
+          f"{'Sorgu (ms)':>10} {'Recall@' + str(args.k):>10}")
+    print("-" * 78)
+    for entry in results:
+        options = ', '.join(f"{name}={value}" for name, value in entry['options'].items())
+        print(f"{entry['rows']:>8} {entry['backend']:<6} {options:<28} {entry['build_s']:>11.2f} "
+              f"{entry['query_ms']:>10.3f} {entry['recall']:>10.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSonuçlar kaydedildi: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
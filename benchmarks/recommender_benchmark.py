@@ -0,0 +1,213 @@
+# recommender_benchmark.py
+#
+# Üç öneri modelinin sentetik veri setlerinde eğitim süresini, tek sorgu gecikmesini,
+# toplu (batch) sorgu hızını ve en yüksek bellek kullanımını (peak RSS) ölçer.
+# Her (boyut, mod) ölçümü ayrı bir süreçte yapılır; böylece bellek ölçümleri birbirini etkilemez.
+#
+# Kullanım:
+#   PYTHONPATH=. python benchmarks/recommender_benchmark.py --rows 10000 --output baseline.json
+#   PYTHONPATH=. python benchmarks/recommender_benchmark.py --rows 10000 --baseline baseline.json
+#
+# --baseline verildiğinde tolerans dışında kötüleşen ölçümler raporlanır ve çıkış kodu 1 olur.
+
+import argparse
+import contextlib
+import io
+import json
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from benchmarks.synthetic import DEFAULT_DATA_PATH, generate_dataset
+from common.customer_index import CustomerIndex
+from common.data_preprocessing import split_frame
+
+
+MODES = ['user', 'item', 'cluster']
+
+DEFAULT_ROWS = [10000, 100000, 1000000]
+
+# Bu satır sayısının üzerinde tam top-k komşu listeleri (O(N²)) yerine IVF kullanılır
+# ve elbow araması örneklem üzerinde MiniBatchKMeans ile yapılır
+EXACT_MAX_ROWS = 100000
+LARGE_ELBOW_OPTIONS = {'sample_size': 50000, 'mini_batch': True}
+
+# Ölçüm -> yüksek değerin iyi olup olmadığı (regresyon yönü)
+REGRESSION_METRICS = {
+    'fit_s': False,
+    'query_p50_ms': False,
+    'batch_users_per_s': True,
+    'peak_rss_mb': False
+}
+
+
+def peak_rss_mb():
+    """Sürecin şimdiye kadarki en yüksek bellek kullanımı (MB; Linux'ta ru_maxrss KB cinsindendir)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def build_recommender(mode, user_df, item_df, neighbor_backend='exact', elbow_options=None):
+    # Model modülleri yalnızca ölçüm sürecinde içe aktarılır
+    from models.collaborative_user.user_recommender import UserBasedRecommender
+    from models.collaborative_item.item_recommender import ItemBasedRecommender
+    from models.kmeans_hybrid.cluster_recommender import ClusteringRecommender
+
+    customer_index = CustomerIndex(user_df['Customer ID'])
+    if mode == 'user':
+        return UserBasedRecommender(user_df, item_df, customer_index=customer_index,
+                                    neighbor_backend=neighbor_backend)
+    if mode == 'item':
+        return ItemBasedRecommender(user_df, item_df, customer_index=customer_index,
+                                    neighbor_backend=neighbor_backend)
+    return ClusteringRecommender(user_df, item_df, customer_index=customer_index,
+                                 elbow_options=elbow_options)
+
+
+def run_case(n_rows, mode, n_queries=100, batch_size=1000, n_recommendations=10,
+             seed=42, data_path=DEFAULT_DATA_PATH):
+    """
+    Tek bir (boyut, mod) için ölçümleri yapar.
+
+    Dönüş:
+    dict: rows, mode, neighbors, fit_s, query_p50_ms, query_p99_ms,
+          batch_users_per_s, dataset_rss_mb ve peak_rss_mb
+    """
+    user_df, item_df = split_frame(generate_dataset(n_rows, seed=seed, data_path=data_path))
+    dataset_rss = peak_rss_mb()
+
+    large = n_rows > EXACT_MAX_ROWS
+    neighbor_backend = 'ivf' if large else 'exact'
+    elbow_options = LARGE_ELBOW_OPTIONS if large else None
+
+    # Modellerin eğitim sırasındaki bilgi çıktıları ölçümü etkilemesin
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        recommender = build_recommender(mode, user_df, item_df, neighbor_backend, elbow_options)
+        fit_time = time.perf_counter() - started
+
+    rng = np.random.default_rng(seed)
+    customer_ids = user_df['Customer ID'].to_numpy()
+
+    # Tek kullanıcılık sorgular (sunucunun kullandığı yol)
+    latencies = []
+    for user_id in rng.choice(customer_ids, min(n_queries, len(customer_ids)), replace=False):
+        started = time.perf_counter()
+        recommender.get_recommendations_batch([user_id], n_recommendations)
+        latencies.append(time.perf_counter() - started)
+
+    # Toplu sorgu
+    batch_ids = rng.choice(customer_ids, min(batch_size, len(customer_ids)), replace=False)
+    started = time.perf_counter()
+    recommender.get_recommendations_batch(batch_ids, n_recommendations)
+    batch_time = time.perf_counter() - started
+
+    return {
+        'rows': n_rows,
+        'mode': mode,
+        'neighbors': neighbor_backend if mode != 'cluster' else None,
+        'fit_s': fit_time,
+        'query_p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'query_p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'batch_users_per_s': len(batch_ids) / batch_time,
+        'dataset_rss_mb': dataset_rss,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def run(rows_list, modes=MODES, **options):
+    """Her (boyut, mod) çiftini temiz bir süreçte ölçer"""
+    results = []
+    for n_rows in rows_list:
+        for mode in modes:
+            print(f"-> {n_rows} satır, {mode} modu ölçülüyor...", flush=True)
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                results.append(executor.submit(run_case, n_rows, mode, **options).result())
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=0.25):
+    """
+    Sonuçları kayıtlı temel ölçümlerle karşılaştırır.
+
+    Parametreler:
+    results: run() sonuçları
+    baseline: Daha önce kaydedilmiş sonuç listesi
+    tolerance: İzin verilen göreli kötüleşme (0.25: %25)
+
+    Dönüş:
+    list: Tolerans dışında kötüleşen her ölçüm için rows, mode, metric,
+          baseline, current ve change (göreli değişim) içeren kayıtlar
+    """
+    baseline_cases = {(entry['rows'], entry['mode']): entry for entry in baseline}
+    regressions = []
+    for entry in results:
+        reference = baseline_cases.get((entry['rows'], entry['mode']))
+        if reference is None:
+            continue
+        for metric, higher_is_better in REGRESSION_METRICS.items():
+            old, new = reference.get(metric), entry.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change < -tolerance if higher_is_better else change > tolerance
+            if worse:
+                regressions.append({'rows': entry['rows'], 'mode': entry['mode'], 'metric': metric,
+                                    'baseline': old, 'current': new, 'change': change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Öneri modelleri ölçeklenebilirlik ölçümü')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+                        help='Sentetik veri seti boyutları')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES,
+                        help='Ölçülecek öneri modelleri')
+    parser.add_argument('--queries', type=int, default=100, help='Tek kullanıcılık sorgu sayısı')
+    parser.add_argument('--batch_size', type=int, default=1000, help='Toplu sorgudaki kullanıcı sayısı')
+    parser.add_argument('--num_recommendations', type=int, default=10, help='Sorgu başına öneri sayısı')
+    parser.add_argument('--seed', type=int, default=42, help='Veri üretimi ve kullanıcı seçimi tohumu')
+    parser.add_argument('--data_path', default=DEFAULT_DATA_PATH,
+                        help='Sütun dağılımlarının örnekleneceği veri seti')
+    parser.add_argument('--output', help='Sonuçların yazılacağı JSON dosyası')
+    parser.add_argument('--baseline', help='Karşılaştırılacak temel sonuç JSON dosyası')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Regresyon sayılmadan önce izin verilen göreli kötüleşme')
+    args = parser.parse_args()
+
+    results = run(args.rows, args.modes, n_queries=args.queries, batch_size=args.batch_size,
+                  n_recommendations=args.num_recommendations, seed=args.seed,
+                  data_path=args.data_path)
+
+    print(f"\n{'Satır':>8} {'Mod':<8} {'Eğitim (s)':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'Toplu (k/s)':>11} {'RSS (MB)':>9}")
+    print("-" * 70)
+    for entry in results:
+        print(f"{entry['rows']:>8} {entry['mode']:<8} {entry['fit_s']:>10.2f} "
+              f"{entry['query_p50_ms']:>9.2f} {entry['query_p99_ms']:>9.2f} "
+              f"{entry['batch_users_per_s']:>11.0f} {entry['peak_rss_mb']:>9.0f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f"\nSonuçlar kaydedildi: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegresyonlar (tolerans %{args.tolerance * 100:.0f}):")
+            for entry in regressions:
+                print(f"- {entry['rows']} satır, {entry['mode']}, {entry['metric']}: "
+                      f"{entry['baseline']:.3f} -> {entry['current']:.3f} ({entry['change']:+.0%})")
+            sys.exit(1)
+        print("\nTemel ölçümlere göre regresyon yok.")
+
+
+if __name__ == "__main__":
+    main()
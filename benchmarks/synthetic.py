@@ -0,0 +1,31 @@
+# synthetic.py
+
+import numpy as np
+import pandas as pd
+from common.data_preprocessing import DATASET_COLUMNS, load_dataset
+
+
+DEFAULT_DATA_PATH = './data/shopping_trends_updated.csv'
+
+
+def generate_dataset(n_rows, seed=42, data_path=DEFAULT_DATA_PATH):
+    """
+    Gerçek veri setinin sütun dağılımlarından örnekleyerek sentetik veri seti üretir.
+
+    Her sütun gerçek verideki değerlerden bağımsız olarak (yerine koyarak) örneklenir;
+    Customer ID 1..n_rows olarak atanır. Aynı tohum aynı veri setini üretir.
+
+    Dönüş:
+    pd.DataFrame: DATASET_COLUMNS sütunlarına sahip n_rows satır
+    """
+    source = load_dataset(data_path)
+    rng = np.random.default_rng(seed)
+
+    columns = {}
+    for col in DATASET_COLUMNS:
+        if col == 'Customer ID':
+            columns[col] = np.arange(1, n_rows + 1, dtype=np.int64)
+        else:
+            values = source[col].to_numpy()
+            columns[col] = values[rng.integers(0, len(values), n_rows)]
+    return pd.DataFrame(columns)
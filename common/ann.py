@@ -0,0 +1,361 @@
+# ann.py
+
+import numpy as np
+from scipy import sparse as sp
+from sklearn.preprocessing import normalize
+from common import MIN_SIMILARITY_THRESHOLD
+from common.neighbors import TopKNeighborIndex, row_similarities, select_top_k
+from common.profiling import profiler
+
+
+# Bu satır sayısının üzerinde kaba nicemleyici MiniBatchKMeans ile eğitilir
+MINI_BATCH_ROWS = 20000
+
+
+def _stack_rows(normalized, new_normalized):
+    if sp.issparse(normalized):
+        return sp.vstack([normalized, new_normalized], format='csr')
+    return np.vstack([normalized, np.asarray(new_normalized, dtype=normalized.dtype)])
+
+
+class _CandidateNeighborIndex:
+    """
+    Aday kümesi üzerinden yaklaşık komşu arama yapan indekslerin ortak sorgu mantığı.
+
+    Alt sınıflar _candidate_groups(rows) ile aynı aday satırları paylaşan sorgu gruplarını
+    (sorguların rows içindeki konumları, artan sıradaki aday satır konumları) döndürür;
+    bir sorgunun grupları arasında aday tekrarlanmaz. Her grup tek bir benzerlik bloğu
+    olarak hesaplanır ve adaylar tam cosine benzerliğiyle yeniden sıralanır. Tüm satırlar
+    için komşu listesi saklanmaz; eğitim maliyeti O(N·d)'dir.
+    """
+
+    def extend(self, matrix):
+        """Matrisin sona eklenmiş satırlarını indeksi yeniden eğitmeden ekler"""
+        return self.refresh(matrix)
+
+
+    def refresh(self, matrix, changed_rows=()):
+        """
+        Vektörü değişen satırları ve sona eklenmiş satırları indeksi yeniden eğitmeden
+        (merkezler/hiperdüzlemler aynı kalır) listelere ya da kovalara yeniden yerleştirir.
+
+        Parametreler:
+        matrix: Tüm satırları içeren güncel matris
+        changed_rows: Vektörü değişen mevcut satırların konumları
+        """
+        n_old = self.normalized.shape[0]
+        changed = np.unique(np.asarray(changed_rows, dtype=np.int64))
+        if matrix.shape[0] == n_old and len(changed) == 0:
+            return self
+        if len(changed):
+            self.normalized = normalize(matrix)
+        else:
+            self.normalized = _stack_rows(self.normalized, normalize(matrix[n_old:]))
+        self._assign(np.concatenate([changed, np.arange(n_old, matrix.shape[0])]), n_old)
+        return self
+
+
+    def neighbors(self, row, n):
+        """Bir satırın (yaklaşık) en benzer n komşusunu (konumlar, skorlar) olarak döndürür"""
+        indices, scores, counts = self.neighbors_batch([row], n)
+        return indices[0, :counts[0]], scores[0, :counts[0]]
+
+
+    def neighbors_batch(self, rows, n):
+        """
+        Birden çok satırın (yaklaşık) en benzer n komşusunu döndürür.
+
+        Dönüş:
+        (indices, scores, counts): TopKNeighborIndex.neighbors_batch ile aynı biçimde
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        width = min(n, self.normalized.shape[0])
+        indices = np.full((len(rows), width), -1, dtype=np.int64)
+        scores = np.zeros((len(rows), width), dtype=self.normalized.dtype)
+        counts = np.zeros(len(rows), dtype=np.int32)
+        profiler.count('neighbors.queries', len(rows))
+        if len(rows) == 0 or width == 0:
+            return indices, scores, counts
+
+        # Her grupta sorgu başına en iyi n aday seçilir; grupların adayları ayrık olduğundan
+        # sorgunun genel en iyi n'i bu seçimlerin birleşiminden çıkar
+        queries, found, found_scores = [], [], []
+        for positions, candidates in self._candidate_groups(rows):
+            profiler.count('ann.candidates', len(positions) * len(candidates))
+            if len(candidates) == 0:
+                continue
+            query_rows = rows[positions]
+            block = row_similarities(self.normalized, query_rows, candidates)
+            exclude = np.searchsorted(candidates, query_rows)
+            clipped = np.minimum(exclude, len(candidates) - 1)
+            exclude[candidates[clipped] != query_rows] = -1
+            selected, selected_scores, _ = select_top_k(block, n, exclude, self.threshold)
+            valid = selected >= 0
+            queries.append(np.broadcast_to(positions[:, None], selected.shape)[valid])
+            found.append(candidates[selected[valid]])
+            found_scores.append(selected_scores[valid])
+        if not queries:
+            return indices, scores, counts
+
+        # Sorgu başına skora göre azalan, eşitlikte küçük konum önce (tam yol ile aynı sıra)
+        queries, found, found_scores = (np.concatenate(parts) for parts in (queries, found, found_scores))
+        order = np.lexsort((found, -found_scores, queries))
+        queries, found, found_scores = queries[order], found[order], found_scores[order]
+        totals = np.bincount(queries, minlength=len(rows))
+        ranks = np.arange(len(queries)) - np.concatenate(([0], np.cumsum(totals)[:-1]))[queries]
+        keep = ranks < width
+        indices[queries[keep], ranks[keep]] = found[keep]
+        scores[queries[keep], ranks[keep]] = found_scores[keep]
+        counts[:] = np.minimum(totals, width)
+        return indices, scores, counts
+
+
+class IVFNeighborIndex(_CandidateNeighborIndex):
+    """
+    KMeans merkezlerini kaba nicemleyici olarak kullanan IVF (inverted file) indeksi.
+
+    Satırlar en yakın merkezin listesine yazılır; sorguda yalnızca sorguya en yakın
+    n_probe listenin satırları aday olarak taranır. clusters verilirse ayrı bir KMeans
+    eğitilmez: listeler bu etiketlerden (ör. ClusteringRecommender'ın zaten eğittiği
+    kullanıcı/ürün kümeleri), merkezler ise her listenin normalize satır ortalamasından
+    oluşur.
+
+    Parametreler:
+    n_lists: Liste (küme) sayısı; None ise √N (clusters verilirse kullanılmaz)
+    n_probe: Sorgu başına taranacak liste sayısı
+    clusters: Her satırın önceden hesaplanmış küme etiketi (0..k-1) ya da None
+    """
+
+    backend = 'ivf'
+
+    def __init__(self, n_neighbors=100, threshold=MIN_SIMILARITY_THRESHOLD,
+                 n_lists=None, n_probe=4, random_state=42, clusters=None):
+        self.n_neighbors = n_neighbors
+        self.threshold = threshold
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.random_state = random_state
+        self.clusters = clusters
+
+
+    @profiler.timed('ann.ivf_fit')
+    def fit(self, matrix):
+        """Kaba nicemleyiciyi eğitir ve ters listeleri oluşturur"""
+        self.normalized = normalize(matrix)
+        n_rows = self.normalized.shape[0]
+        if self.clusters is not None:
+            self._fit_from_clusters(np.asarray(self.clusters))
+            return self
+        n_lists = min(self.n_lists or max(1, int(round(np.sqrt(n_rows)))), n_rows)
+        
+        # sklearn.cluster yalnızca IVF eğitilirken gerekir (tam arama için yüklenmez)
+        from sklearn.cluster import KMeans, MiniBatchKMeans
+
+        model_cls = MiniBatchKMeans if n_rows > MINI_BATCH_ROWS else KMeans
+        quantizer = model_cls(n_clusters=n_lists, random_state=self.random_state)
+        self.assignments = quantizer.fit_predict(self.normalized).astype(np.int32)
+        self.centroids = normalize(quantizer.cluster_centers_).astype(self.normalized.dtype)
+        self._build_lists()
+        return self
+
+
+    def _fit_from_clusters(self, clusters):
+        # Merkezler bu indeksin özellik uzayında her kümenin satır ortalamasıdır. Etiketi
+        # olmayan sondaki satırlar (ör. güncellemeyle eklenen müşteriler) en yakın merkeze atanır
+        n_labeled = len(clusters)
+        if n_labeled > self.normalized.shape[0]:
+            raise ValueError("clusters satır sayısından fazla etiket içeremez")
+        membership = sp.csr_matrix((np.ones(n_labeled, dtype=self.normalized.dtype),
+                                    (clusters, np.arange(n_labeled))),
+                                   shape=(int(clusters.max()) + 1, self.normalized.shape[0]))
+        sums = membership @ self.normalized
+        self.centroids = normalize(sums.toarray() if sp.issparse(sums) else sums).astype(
+            self.normalized.dtype)
+        unlabeled = np.asarray(self.normalized[n_labeled:] @ self.centroids.T).argmax(axis=1)
+        self.assignments = np.concatenate([clusters, unlabeled]).astype(np.int32)
+        self._build_lists()
+
+
+    def _build_lists(self):
+        # Listeler satır konumlarına göre artan sırada tutulur (eşitlikte küçük konum önce)
+        self.list_rows = np.argsort(self.assignments, kind='stable').astype(np.int64)
+        sizes = np.bincount(self.assignments, minlength=len(self.centroids))
+        self.list_offsets = np.concatenate(([0], np.cumsum(sizes)))
+
+
+    def _candidate_groups(self, rows):
+        # Her liste, onu tarayan tüm sorgular için tek blokta karşılaştırılır
+        centroid_sims = self.normalized[rows] @ self.centroids.T
+        n_probe = min(self.n_probe, len(self.centroids))
+        probes = np.argsort(-np.asarray(centroid_sims), axis=1, kind='stable')[:, :n_probe].ravel()
+        order = np.argsort(probes, kind='stable')
+        positions = np.repeat(np.arange(len(rows)), n_probe)[order]
+        probes = probes[order]
+        starts = np.flatnonzero(np.r_[True, probes[1:] != probes[:-1]])
+        for start, stop in zip(starts, np.r_[starts[1:], len(probes)]):
+            probe = probes[start]
+            yield positions[start:stop], self.list_rows[self.list_offsets[probe]:self.list_offsets[probe + 1]]
+
+
+    def _assign(self, rows, n_old):
+        # Değişen ve yeni satırlar en yakın merkezin listesine yazılır
+        assignments = np.concatenate([
+            self.assignments, np.zeros(self.normalized.shape[0] - n_old, dtype=np.int32)])
+        assignments[rows] = np.asarray(self.normalized[rows] @ self.centroids.T).argmax(axis=1)
+        self.assignments = assignments
+        self._build_lists()
+
+
+    def get_state(self):
+        """Kaydedilebilir durum (bkz. common.persistence)"""
+        return {
+            'backend': self.backend,
+            'n_neighbors': self.n_neighbors,
+            'threshold': self.threshold,
+            'n_lists': self.n_lists,
+            'n_probe': self.n_probe,
+            'random_state': self.random_state,
+            'normalized': self.normalized,
+            'centroids': self.centroids,
+            'assignments': self.assignments
+        }
+
+
+    @classmethod
+    def from_state(cls, state):
+        index = cls(state['n_neighbors'], state['threshold'], state['n_lists'],
+                    state['n_probe'], state['random_state'])
+        index.normalized = state['normalized']
+        index.centroids = state['centroids']
+        index.assignments = state['assignments']
+        index._build_lists()
+        return index
+
+
+class LSHNeighborIndex(_CandidateNeighborIndex):
+    """
+    Rastgele hiperdüzlem (SimHash) tabanlı LSH indeksi.
+
+    Her tabloda satırlar n_bits hiperdüzlemin hangi tarafında kaldıklarına göre
+    kovalara ayrılır; sorguda herhangi bir tabloda aynı kovaya düşen satırlar aday olur.
+    Daha fazla tablo recall'u, daha fazla bit ise seçiciliği (ve hızı) artırır.
+    """
+
+    backend = 'lsh'
+
+    def __init__(self, n_neighbors=100, threshold=MIN_SIMILARITY_THRESHOLD,
+                 n_tables=16, n_bits=12, random_state=42):
+        self.n_neighbors = n_neighbors
+        self.threshold = threshold
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.random_state = random_state
+
+
+    def _hash(self, normalized):
+        # (satır, tablo) boyutlu kova kodları. Özellikler negatif olmadığından vektörler
+        # aynı bölgede toplanır; hiperdüzlemler ortalamadan geçirilerek kovalar dengelenir.
+        weights = 1 << np.arange(self.n_bits, dtype=np.int64)
+        offsets = self.center @ self.planes
+        codes = np.empty((normalized.shape[0], self.n_tables), dtype=np.int64)
+        for table, planes in enumerate(self.planes):
+            codes[:, table] = (np.asarray(normalized @ planes) >= offsets[table]) @ weights
+        return codes
+
+
+    @profiler.timed('ann.lsh_fit')
+    def fit(self, matrix):
+        """Hiperdüzlemleri üretir ve satırları kovalara yerleştirir"""
+        self.normalized = normalize(matrix)
+        rng = np.random.default_rng(self.random_state)
+        self.planes = rng.standard_normal(
+            (self.n_tables, self.normalized.shape[1], self.n_bits)).astype(self.normalized.dtype)
+        self.center = np.asarray(self.normalized.mean(axis=0)).ravel().astype(self.normalized.dtype)
+        self.codes = self._hash(self.normalized)
+        self._build_tables()
+        return self
+
+
+    def _build_tables(self):
+        # Her tablo için kova koduna göre sıralı satırlar (aralık araması için)
+        self.table_rows = np.argsort(self.codes, axis=0, kind='stable').T.astype(np.int64)
+        self.table_codes = np.take_along_axis(self.codes.T, self.table_rows, axis=1)
+
+
+    def _candidate_groups(self, rows):
+        # Tüm tablolarda aynı kovaya düşen sorgular aynı adayları paylaşır
+        keys, inverse = np.unique(self.codes[rows], axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind='stable')
+        starts = np.r_[0, np.cumsum(np.bincount(inverse, minlength=len(keys)))]
+        for key, codes in enumerate(keys):
+            parts = []
+            for table, code in enumerate(codes):
+                start = np.searchsorted(self.table_codes[table], code, side='left')
+                stop = np.searchsorted(self.table_codes[table], code, side='right')
+                parts.append(self.table_rows[table, start:stop])
+            yield order[starts[key]:starts[key + 1]], np.unique(np.concatenate(parts))
+
+
+    def _assign(self, rows, n_old):
+        # Değişen ve yeni satırlar mevcut hiperdüzlemlerle yeniden kovalanır
+        codes = np.vstack([self.codes, np.zeros(
+            (self.normalized.shape[0] - n_old, self.n_tables), dtype=self.codes.dtype)])
+        codes[rows] = self._hash(self.normalized[rows])
+        self.codes = codes
+        self._build_tables()
+
+
+    def get_state(self):
+        """Kaydedilebilir durum (bkz. common.persistence)"""
+        return {
+            'backend': self.backend,
+            'n_neighbors': self.n_neighbors,
+            'threshold': self.threshold,
+            'n_tables': self.n_tables,
+            'n_bits': self.n_bits,
+            'random_state': self.random_state,
+            'normalized': self.normalized,
+            'planes': self.planes,
+            'center': self.center,
+            'codes': self.codes
+        }
+
+
+    @classmethod
+    def from_state(cls, state):
+        index = cls(state['n_neighbors'], state['threshold'], state['n_tables'],
+                    state['n_bits'], state['random_state'])
+        index.normalized = state['normalized']
+        index.planes = state['planes']
+        index.center = state['center']
+        index.codes = state['codes']
+        index._build_tables()
+        return index
+
+
+# Seçilebilir komşu arama motorları: 'exact' tam top-k listeleri, diğerleri yaklaşık
+NEIGHBOR_BACKENDS = {
+    'exact': TopKNeighborIndex,
+    'ivf': IVFNeighborIndex,
+    'lsh': LSHNeighborIndex
+}
+
+
+def build_neighbor_index(backend='exact', n_neighbors=100, **options):
+    """
+    Seçilen motor için (eğitilmemiş) komşu indeksi oluşturur.
+
+    Parametreler:
+    backend: 'exact', 'ivf' veya 'lsh'
+    options: Motora özgü parametreler (ör. ivf için n_probe, lsh için n_tables)
+    """
+    if backend not in NEIGHBOR_BACKENDS:
+        raise ValueError(f"Bilinmeyen komşu arama motoru: {backend} "
+                         f"(seçenekler: {', '.join(NEIGHBOR_BACKENDS)})")
+    return NEIGHBOR_BACKENDS[backend](n_neighbors, **options)
+
+
+def neighbor_index_from_state(state):
+    """Kaydedilmiş durumdan ilgili motorun indeksini yükler"""
+    return NEIGHBOR_BACKENDS[state.get('backend', 'exact')].from_state(state)
@@ -0,0 +1,186 @@
+# batching.py
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+# İlk istek geldikten sonra toplu hesaplama için beklenecek en uzun süre (saniye)
+DEFAULT_MAX_WAIT = 0.002
+
+# Tek toplu hesaplamada birleştirilecek en fazla istek sayısı
+DEFAULT_MAX_BATCH = 64
+
+# Toplu hesaplama ve bekleme metrikleri son bu kadar kayıt üzerinden hesaplanır
+BATCH_STATS_WINDOW = 10000
+
+
+class _PendingRequest:
+    """Sıradaki tek kullanıcılık istek; sonuç hazır olduğunda done işaretlenir"""
+
+    __slots__ = ('mode', 'user_id', 'n_recommendations', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, mode, user_id, n_recommendations):
+        self.mode = mode
+        self.user_id = user_id
+        self.n_recommendations = n_recommendations
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Eşzamanlı tek kullanıcılık istekleri toplayıp tek bir recommend_batch çağrısıyla
+    hesaplayan zamanlayıcı.
+
+    Arka plandaki iş parçacığı ilk isteği bekler; ardından max_batch istek birikene ya da
+    ilk isteğin üzerinden max_wait saniye geçene kadar yeni istekleri toplar. Toplanan
+    istekler moda göre gruplanır ve her grup modelin vektörel recommend_batch yöntemiyle
+    gruptaki en büyük n için bir kez hesaplanır; sıralama kararlı olduğundan her çağırana
+    kendi kullanıcısının satırlarının ilk n'i döner.
+
+    Parametreler:
+    recommenders: Mod adı -> recommend_batch destekleyen öneri modeli
+    max_wait: İlk istekten sonra toplu hesaplama için beklenecek en uzun süre (saniye)
+    max_batch: Tek seferde hesaplanacak en fazla istek sayısı
+    """
+
+    def __init__(self, recommenders, max_wait=DEFAULT_MAX_WAIT, max_batch=DEFAULT_MAX_BATCH):
+        if max_wait < 0:
+            raise ValueError("max_wait negatif olamaz")
+        if max_batch < 1:
+            raise ValueError("max_batch en az 1 olmalıdır")
+        self.recommenders = recommenders
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+
+        self._pending = []
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self._batch_sizes = deque(maxlen=BATCH_STATS_WINDOW)
+        self._queue_times = deque(maxlen=BATCH_STATS_WINDOW)
+
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+
+    def recommend(self, mode, user_id, n_recommendations):
+        """
+        İsteği sıraya ekler ve sonuç hazır olana kadar bekler.
+
+        Dönüş:
+        RecommendationResult: recommend_batch([user_id], n) ile aynı öneriler
+        """
+        request = _PendingRequest(mode, user_id, n_recommendations)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Zamanlayıcı kapatıldı")
+            self._pending.append(request)
+            self._condition.notify()
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+
+    def _next_batch(self):
+        """Sıradaki toplu işi döndürür; zamanlayıcı kapatıldıysa ve sıra boşsa None"""
+        with self._condition:
+            while not self._pending and not self._closed:
+                self._condition.wait()
+            if not self._pending:
+                return None
+
+            # Bekleme süresi ilk istekten itibaren sayılır; önceki toplu iş sürerken
+            # biriken istekler beklemeden hesaplanır
+            deadline = self._pending[0].enqueued + self.max_wait
+            while len(self._pending) < self.max_batch and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._record(batch)
+            self._execute(batch)
+
+
+    def _record(self, batch):
+        dispatched = time.perf_counter()
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self._batch_sizes.append(len(batch))
+            self._queue_times.extend(dispatched - request.enqueued for request in batch)
+
+
+    def _execute(self, batch):
+        groups = {}
+        for request in batch:
+            groups.setdefault(request.mode, []).append(request)
+
+        for mode, requests in groups.items():
+            try:
+                # Aynı kullanıcı için gelen istekler tek kez hesaplanır
+                user_ids = list(dict.fromkeys(request.user_id for request in requests))
+                n_recommendations = max(request.n_recommendations for request in requests)
+                result = self.recommenders[mode].recommend_batch(user_ids, n_recommendations)
+                for request in requests:
+                    request.result = result.take(result.user_ids == request.user_id).head(
+                        request.n_recommendations)
+            except Exception as e:
+                for request in requests:
+                    request.error = e
+            finally:
+                for request in requests:
+                    request.done.set()
+
+
+    def close(self):
+        """Sıradaki istekleri tamamlayıp arka plan iş parçacığını durdurur"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._worker.join()
+
+
+    def stats(self):
+        """
+        Dönüş:
+        dict: Toplu iş ve istek sayıları, toplu iş boyutu dağılımı ve milisaniye
+        cinsinden p50/p99 sırada bekleme süresi
+        """
+        with self._stats_lock:
+            sizes = np.array(self._batch_sizes)
+            queue_times = np.array(self._queue_times)
+            batches, requests = self.batches, self.requests
+
+        return {
+            'batches': batches,
+            'requests': requests,
+            'max_wait_ms': self.max_wait * 1000,
+            'max_batch': self.max_batch,
+            'mean_batch_size': float(sizes.mean()) if len(sizes) else None,
+            'p50_batch_size': float(np.percentile(sizes, 50)) if len(sizes) else None,
+            'largest_batch': int(sizes.max()) if len(sizes) else None,
+            'queue_p50_ms': float(np.percentile(queue_times, 50) * 1000) if len(queue_times) else None,
+            'queue_p99_ms': float(np.percentile(queue_times, 99) * 1000) if len(queue_times) else None
+        }
@@ -0,0 +1,110 @@
+# catalog.py
+
+import numpy as np
+import pandas as pd
+from common.data_preprocessing import FeatureCache
+from common.profiling import profiler
+
+
+# Bir ürünü tanımlayan sütunlar; bu değerleri aynı olan alışverişler tek ürün sayılır
+PRODUCT_COLUMNS = ['Item Purchased', 'Category', 'Color', 'Season']
+
+# Ürün tablosunda ortalama fiyat alışveriş satırlarındaki adla tutulur; böylece fiyat
+# içeren özellik kümeleri ürün tablosunda da aynı sütun adlarıyla kodlanabilir
+PRICE_COLUMN = 'Purchase Amount (USD)'
+
+
+def _factorize_products(item_df):
+    """
+    Satırları ilk görülme sırasıyla ürün numaralarına eşler. Sütun kodları tek bir
+    tam sayı anahtarda birleştirilir (MultiIndex üzerinden gruplamaktan çok daha hızlı).
+    """
+    keys = np.zeros(len(item_df), dtype=np.int64)
+    for col in PRODUCT_COLUMNS:
+        codes, uniques = pd.factorize(item_df[col])
+        keys = keys * (len(uniques) + 1) + (codes + 1)
+    return pd.factorize(keys)[0]
+
+
+class ProductCatalog:
+    """
+    Alışveriş satırlarını (item_df) benzersiz ürünlere indirger.
+    
+    Ürün özellikleri, benzerlikleri ve kümeleri alışveriş başına değil ürün başına
+    bir kez hesaplanır. Sonuçlar `codes` ile alışveriş satırlarına, `first_rows` ile
+    gösterilecek alışverişe (ve onu yapan müşteriye) eşlenir. Ürünler ilk görüldükleri
+    sırayla numaralanır; extend mevcut numaraları korur ve yeni ürünleri sona ekler.
+    
+    Öznitelikler:
+    codes: Her alışveriş satırının ürün numarası
+    products: Ürün tablosu (PRODUCT_COLUMNS, ortalama fiyat ve 'Purchase Count')
+    first_rows: Her ürünün item_df'deki ilk satırı
+    purchase_counts: Her ürünün alışveriş sayısı
+    features: Ürün tablosunun kodlanmış özellikleri (alışveriş satırlarının önbelleğinden ayrı)
+    """
+
+    def __init__(self, item_df, codes, features=None):
+        self.codes = np.asarray(codes, dtype=np.int32)
+        n_products = int(self.codes.max()) + 1 if len(self.codes) else 0
+        
+        # Numaralar ilk görülme sırasıyla verildiği için ilk satırlar artan sıradadır
+        _, self.first_rows = np.unique(self.codes, return_index=True)
+        self.purchase_counts = np.bincount(self.codes, minlength=n_products)
+        prices = item_df[PRICE_COLUMN].to_numpy(dtype=float)
+        mean_prices = np.bincount(self.codes, weights=prices, minlength=n_products) / np.maximum(
+            self.purchase_counts, 1)
+        
+        products = item_df[PRODUCT_COLUMNS].iloc[self.first_rows].reset_index(drop=True)
+        products[PRICE_COLUMN] = mean_prices
+        products['Purchase Count'] = self.purchase_counts
+        self.products = products
+        self._index = pd.MultiIndex.from_frame(products[PRODUCT_COLUMNS])
+        
+        self.features = features if features is not None else FeatureCache()
+
+
+    @classmethod
+    @profiler.timed('catalog.build')
+    def from_frame(cls, item_df, dtype=np.float32, sparse=False):
+        """
+        Alışveriş satırlarından katalog oluşturur.
+        
+        Parametreler:
+        dtype, sparse: Ürün özelliklerinin kodlanma biçimi (bkz. FeatureCache)
+        """
+        return cls(item_df, _factorize_products(item_df), FeatureCache(dtype, sparse))
+
+
+    def __len__(self):
+        return len(self.products)
+
+
+    def lookup(self, frame):
+        """
+        Satırların (PRODUCT_COLUMNS sütunlarıyla) ürün numaraları; katalogda olmayanlar için -1
+        """
+        return self._index.get_indexer(pd.MultiIndex.from_frame(frame[PRODUCT_COLUMNS]))
+
+
+    @profiler.timed('catalog.extend')
+    def extend(self, item_df):
+        """
+        item_df'nin sona eklenmiş satırlarıyla genişletilmiş yeni katalog döndürür.
+        Mevcut ürünlerin numaraları değişmez; kodlanmış özellik önbelleği paylaşılır ve
+        encode ile yalnızca yeni ürünler kodlanır. item_df bu kataloğun satırlarını
+        aynı sırayla (başta) içermelidir.
+        """
+        n_old = len(self.codes)
+        new_codes = self.lookup(item_df.iloc[n_old:])
+        unknown = new_codes < 0
+        if unknown.any():
+            new_codes[unknown] = len(self) + _factorize_products(item_df.iloc[n_old:][unknown])
+        return ProductCatalog(item_df, np.concatenate([self.codes, new_codes]), self.features)
+
+
+    def encode(self, columns):
+        """
+        Ürün tablosunun verilen sütunlarla kodlanmış matrisi. İlk çağrıda kodlayıcı
+        eğitilir; katalog genişletildiyse yalnızca yeni ürünler kodlanır.
+        """
+        return self.features.extend(self.products, columns)
@@ -0,0 +1,72 @@
+# customer_index.py
+
+import numpy as np
+
+
+class CustomerNotFoundError(LookupError):
+    """Veri setinde bulunmayan müşteri ID'si için fırlatılır"""
+
+    def __init__(self, customer_id):
+        super().__init__(f"Müşteri bulunamadı: {customer_id}")
+        self.customer_id = customer_id
+
+
+class CustomerIndex:
+    """
+    Müşteri ID'lerini satır konumlarına eşleyen önceden hesaplanmış indeks.
+
+    Her ID, veri setindeki ilk satırının konumuna eşlenir. user_df ve item_df aynı
+    veri setinden ayrıldığı için (bkz. split_dataset) tek bir indeks ikisi için de geçerlidir.
+    """
+
+    def __init__(self, customer_ids):
+        ids = np.asarray(customer_ids)
+        self._ids, self._first_rows = np.unique(ids, return_index=True)
+        self._positions = dict(zip(self._ids.tolist(), self._first_rows.tolist()))
+        self.n_rows = len(ids)
+
+
+    @classmethod
+    def from_frame(cls, df, column='Customer ID'):
+        return cls(df[column].to_numpy())
+
+
+    def __len__(self):
+        return len(self._positions)
+
+
+    @property
+    def ids(self):
+        """Veri setindeki müşteri ID'leri (artan sırada)"""
+        return self._ids
+
+
+    def __contains__(self, customer_id):
+        return customer_id in self._positions
+
+
+    def position(self, customer_id):
+        """Müşterinin satır konumunu döndürür; bulunamazsa CustomerNotFoundError fırlatır"""
+        try:
+            return self._positions[customer_id]
+        except (KeyError, TypeError):
+            raise CustomerNotFoundError(customer_id) from None
+
+
+    def get(self, customer_id, default=None):
+        """Müşterinin satır konumunu, bulunamazsa default değerini döndürür"""
+        return self._positions.get(customer_id, default)
+
+
+    def positions(self, customer_ids):
+        """
+        Birden çok müşterinin satır konumlarını vektörel olarak döndürür.
+        Bulunamayan ID'ler için -1 döner.
+        """
+        ids = np.asarray(customer_ids)
+        if len(self._ids) == 0:
+            return np.full(ids.shape, -1, dtype=np.int64)
+        slots = np.searchsorted(self._ids, ids)
+        slots = np.minimum(slots, len(self._ids) - 1)
+        found = self._ids[slots] == ids
+        return np.where(found, self._first_rows[slots], -1)
@@ -1,136 +1,491 @@
 # data_preprocessing.py
 
+import os
 import pandas as pd
 import numpy as np
+from scipy import sparse as sp
 from sklearn.preprocessing import OneHotEncoder, MinMaxScaler
+from common.profiling import profiler
 
 
-def split_dataset(data_path):
+# Kullanıcı özellikleri
+USER_FEATURES = [
+    'Customer ID',            # Bağlantı için
+    'Age',                    # Sayısal
+    'Gender',                 # Kategorik
+    'Location',               # Kategorik
+    'Size',                   # Özel kodlama
+    'Previous Purchases',     # Sayısal
+    'Frequency of Purchases', # Özel kodlama
+    'Subscription Status'     # Yeni eklenen özellik
+]
+
+# Ürün özellikleri
+ITEM_FEATURES = [
+    'Customer ID',            # Bağlantı için
+    'Item Purchased',         # Ürün ismi
+    'Category',               # Kategorisi
+    'Purchase Amount (USD)',  # Fiyat
+    'Color',                  # Renk
+    'Season'                  # Sezon
+]
+
+# Modellerin kullandığı sütunlar (veri setinin geri kalanı okunmaz)
+DATASET_COLUMNS = list(dict.fromkeys(USER_FEATURES + ITEM_FEATURES))
+
+# Düşük kardinaliteli metin sütunları; pandas categorical olarak (dar tam sayı kodlarla) tutulur
+CATEGORICAL_COLUMNS = [
+    'Gender', 'Location', 'Size', 'Frequency of Purchases', 'Subscription Status',
+    'Item Purchased', 'Category', 'Color', 'Season'
+]
+
+
+# Bu boyutu aşan CSV dosyaları parça parça okunur
+CHUNKED_CSV_BYTES = 256 * 1024 * 1024
+CSV_CHUNK_ROWS = 1_000_000
+
+
+def _concat_chunks(chunks):
+    """Parça parça okunan DataFrame'leri kategorik sütunları koruyarak birleştirir"""
+    if len(chunks) == 1:
+        return chunks[0]
+    
+    # Parçaların kategori kümeleri farklı olabilir; birleşik kategorilerle yeniden kodla
+    # (sığ kopyalar üzerinde; verilen DataFrame'ler değiştirilmez)
+    chunks = [chunk.copy(deep=False) for chunk in chunks]
+    categorical = [col for col in chunks[0].columns
+                   if isinstance(chunks[0][col].dtype, pd.CategoricalDtype)]
+    for col in categorical:
+        categories = pd.api.types.union_categoricals(
+            [chunk[col] for chunk in chunks], sort_categories=True).categories
+        for chunk in chunks:
+            chunk[col] = chunk[col].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _narrow_dtypes(df):
+    """Sayısal sütunları değer aralığına uyan en dar tipe, metinleri categorical'a çevirir"""
+    for col in df.columns:
+        if col in CATEGORICAL_COLUMNS:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+        elif pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+        elif pd.api.types.is_float_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast='float')
+    return df
+
+
+@profiler.timed('data.load')
+def load_dataset(data_path, columns=None, chunksize=None):
     """
-    Veri setini kullanıcı ve ürün özellikleri olarak ikiye ayırır.
+    Veri setini yalnızca gereken sütunlarla ve dar veri tipleriyle yükler.
+    
+    Parametreler:
+    data_path: CSV, Parquet (.parquet/.pq) ya da Feather (.feather) dosyası
+    columns: Okunacak sütunlar (None ise DATASET_COLUMNS)
+    chunksize: CSV'yi bu kadar satırlık parçalar halinde okur (None ise CHUNKED_CSV_BYTES
+               üzerindeki dosyalar CSV_CHUNK_ROWS satırlık parçalarla okunur)
+    
+    Dönüş:
+    pd.DataFrame: Metin sütunları categorical, sayısal sütunlar dar tam sayı/ondalık tipli
     """
-    # Ana veri setini yükle
-    df = pd.read_csv(data_path)
+    columns = list(columns) if columns is not None else DATASET_COLUMNS
+    extension = str(data_path).lower().rsplit('.', 1)[-1]
+    
+    if extension in ('parquet', 'pq'):
+        df = pd.read_parquet(data_path, columns=columns)
+    elif extension == 'feather':
+        df = pd.read_feather(data_path, columns=columns)
+    else:
+        dtypes = {col: 'category' for col in columns if col in CATEGORICAL_COLUMNS}
+        if chunksize is None and os.path.getsize(data_path) > CHUNKED_CSV_BYTES:
+            chunksize = CSV_CHUNK_ROWS
+        if chunksize:
+            # Parçalar okunurken daraltılır; tüm dosya hiçbir zaman object tipinde tutulmaz
+            chunks = [_narrow_dtypes(chunk) for chunk in
+                      pd.read_csv(data_path, usecols=columns, dtype=dtypes, chunksize=chunksize)]
+            df = _concat_chunks(chunks)
+        else:
+            df = pd.read_csv(data_path, usecols=columns, dtype=dtypes)
     
+    # Sütun sırasını istenen sıraya getir (usecols dosyadaki sırayı korur)
+    return _narrow_dtypes(df[columns])
+
+
+def append_rows(df, new_rows):
+    """
+    df'nin sonuna yeni satırları ekler. Yeni satırlar df ile aynı tiplere daraltılır;
+    categorical sütunlar birleşik kategorilerle korunur.
+    
+    Dönüş:
+    pd.DataFrame: Yeni DataFrame (satır konumları 0..N-1)
+    """
+    new_rows = _narrow_dtypes(new_rows[list(df.columns)].copy())
+    return _concat_chunks([df, new_rows])
+
+
+def _read_only(series, copy=True):
+    """Sütunun değerlerini salt okunur dizi (categorical sütunlarda salt okunur kodlar) olarak döndürür"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = np.array(series.cat.codes.to_numpy(), copy=copy)
+        codes.flags.writeable = False
+        return pd.Categorical.from_codes(codes, dtype=series.dtype)
+    values = np.array(series.to_numpy(), copy=copy)
+    values.flags.writeable = False
+    return values
+
+
+# Görünümün sahibi olan depo bu öznitelikte tutulur; öznitelik yalnızca deponun
+# oluşturduğu DataFrame nesnelerinde bulunur, türetilen DataFrame'lere geçmez
+_STORE_ATTR = '_dataset_store'
+
+
+def store_of(df):
+    """DataFrame bir DatasetStore görünümüyse sahibi olan depoyu, değilse None döndürür"""
+    return getattr(df, '__dict__', {}).get(_STORE_ATTR)
+
+
+class DatasetStore:
+    """
+    Veri setinin sütunlarını bir kez, salt okunur diziler olarak tutan değişmez depo.
+    
+    Öneri sistemleri ve değerlendirici veri setini kopyalamak yerine depodaki dizileri
+    gösteren DataFrame görünümlerini paylaşır. Görünümler üzerinden değer atanamaz;
+    modele özgü sütunlar (ör. küme etiketleri) modelin kendi dizilerinde tutulur.
+    Satır eklemek (append) yeni bir depo oluşturur.
+    """
+
+    def __init__(self, columns):
+        self._columns = dict(columns)
+        lengths = {len(values) for values in self._columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Sütun uzunlukları farklı: {sorted(lengths)}")
+        self.n_rows = lengths.pop() if lengths else 0
+        self._views = {}
+
+
+    @classmethod
+    def from_frame(cls, df, copy=True):
+        """
+        DataFrame'in sütunlarından depo oluşturur.
+        
+        Parametreler:
+        copy: False ise sütun dizileri kopyalanmaz (df başka bir yerde değiştirilmemelidir)
+        """
+        return cls({col: _read_only(df[col], copy) for col in df.columns})
+
+
+    @classmethod
+    def of(cls, user_df, item_df):
+        """
+        user_df ve item_df aynı deponun görünümleriyse o depoyu döndürür; değilse iki
+        DataFrame'in sütunlarından (ortak sütunlar bir kez kopyalanarak) yeni depo oluşturur.
+        """
+        store = store_of(user_df)
+        if store is not None and store_of(item_df) is store:
+            return store
+        if len(user_df) != len(item_df):
+            raise ValueError(f"user_df ({len(user_df)} satır) ve item_df ({len(item_df)} satır) "
+                             f"aynı veri setinden ayrılmalıdır")
+        
+        columns = {col: _read_only(user_df[col]) for col in user_df.columns}
+        for col in item_df.columns:
+            if col not in columns:
+                columns[col] = _read_only(item_df[col])
+        return cls(columns)
+
+
+    def __len__(self):
+        return self.n_rows
+
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+
+    def column(self, name):
+        """Sütunun salt okunur dizisi"""
+        return self._columns[name]
+
+
+    def view(self, columns):
+        """
+        Verilen sütunların kopyasız DataFrame görünümü. Aynı sütunlar için her seferinde
+        aynı nesne döndürülür; görünümün dizilerine değer atanamaz.
+        """
+        key = tuple(columns)
+        frame = self._views.get(key)
+        if frame is None:
+            frame = pd.DataFrame({col: self._columns[col] for col in key}, copy=False)
+            object.__setattr__(frame, _STORE_ATTR, self)
+            self._views[key] = frame
+        return frame
+
+
+    @property
+    def user_df(self):
+        return self.view(USER_FEATURES)
+
+
+    @property
+    def item_df(self):
+        return self.view(ITEM_FEATURES)
+
+
+    def append(self, new_rows):
+        """Yeni satırların sona eklendiği yeni bir depo döndürür (bu depo değişmez)"""
+        return DatasetStore.from_frame(append_rows(self.view(self.columns), new_rows), copy=False)
+
+
+    def memory_usage(self):
+        """
+        Dönüş:
+        dict: Sütun -> bayt (categorical sütunlarda kodlar ve kategoriler)
+        """
+        usage = {}
+        for col, values in self._columns.items():
+            if isinstance(values, pd.Categorical):
+                usage[col] = values.codes.nbytes + int(values.categories.memory_usage(deep=True))
+            else:
+                usage[col] = values.nbytes
+        return usage
+
+
+@profiler.timed('data.split')
+def split_frame(df, copy=True):
+    """
+    Yüklenmiş veri setini kullanıcı ve ürün özellikleri olarak ikiye ayırır.
+    
+    Parametreler:
+    copy: False ise sütunlar kopyalanmadan depoya alınır (df daha sonra değiştirilmemelidir)
+    
+    Dönüş:
+    (user_df, item_df): Aynı DatasetStore'un salt okunur, kopyasız görünümleri
+    """
     # NaN değerleri kontrol et
     if df.isnull().any().any():
         print("\nUyarı: Veri setinde NaN değerler bulundu!")
         print("NaN değerlerin dağılımı:")
         print(df.isnull().sum())
         print("\nNaN değerler temizleniyor...")
-        df = df.dropna()
-    
-    # Kullanıcı özellikleri güncellendi
-    user_features = [
-        'Customer ID',            # Bağlantı için
-        'Age',                    # Sayısal
-        'Gender',                 # Kategorik
-        'Location',               # Kategorik
-        'Size',                   # Özel kodlama
-        'Previous Purchases',     # Sayısal
-        'Frequency of Purchases', # Özel kodlama
-        'Subscription Status'     # Yeni eklenen özellik
-    ]
+        df = df.dropna().reset_index(drop=True)
     
-    # Ürün özellikleri
-    item_features = [
-        'Customer ID',            # Bağlantı için
-        'Item Purchased',         # Ürün ismi
-        'Category',               # Kategorisi
-        'Purchase Amount (USD)',  # Fiyat
-        'Color',                  # Renk
-        'Season'                  # Sezon
-    ]
+    # NaN temizliğinden sonra tipleri daralt (boş değer içeren tam sayı sütunları float okunur)
+    df = _narrow_dtypes(df.copy(deep=False))
     
-    # DataFrameleri ayır
-    user_df = df[user_features].copy()
-    item_df = df[item_features].copy()
+    # DataFrameleri ayır: sütunlar depoda bir kez tutulur, iki taraf da kopyasız görünümdür
+    store = DatasetStore.from_frame(df, copy=copy)
     
-    return user_df, item_df
+    return store.user_df, store.item_df
 
 
-def encode_features(df):
+def split_dataset(data_path, chunksize=None):
     """
-    Özellikleri kodlar: Sayısal, kategorik ve özel kodlamalar
+    Veri setini kullanıcı ve ürün özellikleri olarak ikiye ayırır.
     """
-    # Özel kodlamalar için sözlükler
-    size_mapping = {'S': 0, 'M': 1, 'L': 2, 'XL': 3}
-    frequency_mapping = {
-        'Rarely': 0,
-        'Occasionally': 1,
-        'Monthly': 2,
-        'Weekly': 3,
-        'Often': 4
-    }
-    subscription_mapping = {
-        'Yes': 1,
-        'No': 0
-    }
-    
-    # DataFrame'in bir kopyasını oluştur
-    df_encoded = df.copy()
-    
-    # CustomerID'yi çıkar
-    if 'Customer ID' in df_encoded.columns:
-        df_encoded = df_encoded.drop('Customer ID', axis=1)
-    
-    # NaN kontrolü
-    if df_encoded.isnull().any().any():
-        df_encoded = df_encoded.fillna('Unknown')
-        print("Uyarı: Boş değerler 'Unknown' ile dolduruldu")
-    
-    # Özel kodlamaları uygula
-    if 'Size' in df_encoded.columns:
-        df_encoded['Size'] = df_encoded['Size'].map(size_mapping).fillna(-1)
+    # Ana veri setini yükle (yalnızca gereken sütunlar, dar veri tipleriyle); yüklenen
+    # DataFrame başka yerde tutulmadığı için depo sütunları kopyalamadan devralır
+    return split_frame(load_dataset(data_path, chunksize=chunksize), copy=False)
+
+
+# Özel kodlamalar için sözlükler
+SIZE_MAPPING = {'S': 0, 'M': 1, 'L': 2, 'XL': 3}
+FREQUENCY_MAPPING = {
+    'Rarely': 0,
+    'Occasionally': 1,
+    'Monthly': 2,
+    'Weekly': 3,
+    'Often': 4
+}
+SUBSCRIPTION_MAPPING = {
+    'Yes': 1,
+    'No': 0
+}
+ORDINAL_MAPPINGS = {
+    'Size': SIZE_MAPPING,
+    'Frequency of Purchases': FREQUENCY_MAPPING,
+    'Subscription Status': SUBSCRIPTION_MAPPING
+}
+
+# Ölçeklenecek sayısal sütunlar
+NUMERIC_COLUMNS = ['Age', 'Previous Purchases']
+
+
+class FeatureEncoder:
+    """
+    Özellikleri kodlar: Sayısal, kategorik ve özel kodlamalar.
     
-    if 'Frequency of Purchases' in df_encoded.columns:
-        df_encoded['Frequency of Purchases'] = df_encoded['Frequency of Purchases'].map(frequency_mapping).fillna(-1)
+    fit ile ölçekleyici ve one-hot kodlayıcı bir kez eğitilir; transform yeni
+    satırları yeniden eğitmeden aynı sütun düzeninde kodlar. sparse=True ise
+    çıktı baştan sona CSR matris olarak üretilir (yüksek kardinaliteli sütunlarda
+    bellek ve benzerlik maliyeti seyreklik oranında düşer).
+    """
+
+    def __init__(self, dtype=np.float32, sparse=False):
+        self.dtype = dtype
+        self.sparse = sparse
+
+
+    def _prepare(self, df):
+        # CustomerID'yi çıkar
+        df_encoded = df.drop(columns=['Customer ID'], errors='ignore')
         
-    if 'Subscription Status' in df_encoded.columns:
-        df_encoded['Subscription Status'] = df_encoded['Subscription Status'].map(subscription_mapping).fillna(-1)
-    
-    # Sayısal sütunları ölçeklendir
-    numeric_cols = ['Age', 'Previous Purchases']
-    numeric_cols = [col for col in numeric_cols if col in df_encoded.columns]
-    
-    if numeric_cols:
-        scaler = MinMaxScaler()
-        df_encoded[numeric_cols] = scaler.fit_transform(df_encoded[numeric_cols])
-    
-    # Kategorik sütunları belirle (özel kodlama ve sayısal olanlar hariç)
-    categorical_cols = [col for col in df_encoded.columns 
-                       if col not in numeric_cols + ['Size', 'Frequency of Purchases', 'Subscription Status']]
-    
-    # One-Hot Encoding uygula
-    if categorical_cols:
-        onehot = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
-        encoded_cats = onehot.fit_transform(df_encoded[categorical_cols])
-        
-        # One-Hot encoded verileri DataFrame'e çevir
-        encoded_cats_df = pd.DataFrame(
-            encoded_cats,
-            columns=onehot.get_feature_names_out(categorical_cols)
-        )
-        
-        # Sayısal ve özel kodlanmış sütunları al
-        final_cols = [col for col in df_encoded.columns if col not in categorical_cols]
-        
-        # Tüm kodlanmış verileri birleştir
-        if final_cols:
-            encoded_matrix = pd.concat([
-                df_encoded[final_cols].reset_index(drop=True),
-                encoded_cats_df
-            ], axis=1)
+        # Kategorik sütunlarda boş değerler 'Unknown' olarak kodlanır
+        # (categorical sütunlar yeni kategori kabul etmediği için önce object tipine çevrilir)
+        if self.categorical_cols and df_encoded[self.categorical_cols].isnull().any().any():
+            df_encoded[self.categorical_cols] = (
+                df_encoded[self.categorical_cols].astype(object).fillna('Unknown'))
+            print("Uyarı: Boş değerler 'Unknown' ile dolduruldu")
+        
+        # Özel kodlamaları uygula
+        for col in self.ordinal_cols:
+            df_encoded[col] = df_encoded[col].astype(object).map(ORDINAL_MAPPINGS[col]).fillna(-1)
+        
+        return df_encoded
+
+
+    def fit(self, df):
+        """Sütun rollerini belirler ve ölçekleyici/one-hot kodlayıcıyı eğitir"""
+        self.columns = [col for col in df.columns if col != 'Customer ID']
+        self.numeric_cols = [col for col in NUMERIC_COLUMNS if col in self.columns]
+        self.ordinal_cols = [col for col in self.columns if col in ORDINAL_MAPPINGS]
+        
+        # Kategorik sütunları belirle (özel kodlama ve sayısal olanlar hariç)
+        self.categorical_cols = [col for col in self.columns
+                                 if col not in self.numeric_cols + self.ordinal_cols]
+        
+        # Sayısal ve özel kodlanmış sütunlar (veri setindeki sırasıyla)
+        self.final_cols = [col for col in self.columns if col not in self.categorical_cols]
+        
+        df_encoded = self._prepare(df)
+        
+        self.scaler = None
+        if self.numeric_cols:
+            self.scaler = MinMaxScaler().fit(df_encoded[self.numeric_cols])
+        
+        self.onehot = None
+        if self.categorical_cols:
+            self.onehot = OneHotEncoder(sparse_output=self.sparse, handle_unknown='ignore', dtype=self.dtype)
+            self.onehot.fit(df_encoded[self.categorical_cols])
+        
+        return self
+
+
+    def transform(self, df):
+        """Satırları eğitilmiş kodlayıcılarla kodlar (yeniden eğitmeden)"""
+        df_encoded = self._prepare(df)
+        
+        # Sayısal sütunları ölçeklendir
+        if self.numeric_cols:
+            df_encoded[self.numeric_cols] = self.scaler.transform(df_encoded[self.numeric_cols])
+        
+        parts = []
+        if self.final_cols:
+            parts.append(df_encoded[self.final_cols].to_numpy(dtype=self.dtype))
+        if self.categorical_cols:
+            parts.append(self.onehot.transform(df_encoded[self.categorical_cols]))
+        
+        if self.sparse:
+            encoded_matrix = sp.hstack([sp.csr_matrix(part) for part in parts],
+                                       format='csr', dtype=self.dtype)
+            values = encoded_matrix.data
         else:
-            encoded_matrix = encoded_cats_df
-            
+            encoded_matrix = np.hstack(parts) if len(parts) > 1 else parts[0]
+            encoded_matrix = np.asarray(encoded_matrix, dtype=self.dtype)
+            values = encoded_matrix
+        
         # Son bir NaN kontrolü
-        if encoded_matrix.isnull().any().any():
+        if np.isnan(values).any():
             print("Uyarı: Kodlama sonrası NaN değerler tespit edildi!")
-            print("NaN değerlerin dağılımı:")
-            print(encoded_matrix.isnull().sum())
-            encoded_matrix = encoded_matrix.fillna(0)
-            
-        return encoded_matrix.values
-    
-    return df_encoded.values
+            values[np.isnan(values)] = 0.0
+        
+        return encoded_matrix
+
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+
+    def get_feature_names_out(self):
+        names = list(self.final_cols)
+        if self.onehot is not None:
+            names.extend(self.onehot.get_feature_names_out(self.categorical_cols))
+        return names
+
+
+class FeatureCache:
+    """
+    Bir veri setinin sütun kümelerini bir kez kodlar ve kodlayıcı ile matrisi
+    tüm öneri sistemleri arasında paylaştırır. Her veri seti için ayrı bir
+    önbellek kullanılmalıdır.
+    """
+
+    def __init__(self, dtype=np.float32, sparse=False):
+        self.dtype = dtype
+        self.sparse = sparse
+        self._entries = {}
+
+
+    @staticmethod
+    def _key(columns):
+        return tuple(col for col in columns if col != 'Customer ID')
+
+
+    def encode(self, df, columns=None):
+        """Sütun kümesinin kodlanmış matrisini döndürür; ilk çağrıda kodlar"""
+        key = self._key(df.columns if columns is None else columns)
+        if key in self._entries:
+            profiler.count('features.cache_hits')
+        else:
+            with profiler.span('features.encode'):
+                encoder = FeatureEncoder(self.dtype, self.sparse)
+                self._entries[key] = (encoder, encoder.fit_transform(df[list(key)]))
+            profiler.count('features.encoded_rows', len(df))
+        return self._entries[key][1]
+
+
+    def extend(self, df, columns=None):
+        """
+        Sütun kümesinin matrisini df'nin sona eklenmiş satırlarıyla genişletir.
+        Kodlayıcı yeniden eğitilmez, yalnızca yeni satırlar kodlanır. df önbellekteki
+        matrisin satırlarını aynı sırayla (başta) içermelidir.
+        """
+        key = self._key(df.columns if columns is None else columns)
+        if key not in self._entries:
+            return self.encode(df, columns)
+        
+        encoder, matrix = self._entries[key]
+        n_cached = matrix.shape[0]
+        if n_cached > len(df):
+            raise ValueError(f"Önbellekteki matris ({n_cached} satır) veri setinden ({len(df)} satır) uzun")
+        
+        if n_cached < len(df):
+            profiler.count('features.encoded_rows', len(df) - n_cached)
+            with profiler.span('features.extend'):
+                new_matrix = encoder.transform(df.iloc[n_cached:][list(key)])
+            if sp.issparse(matrix):
+                matrix = sp.vstack([matrix, new_matrix], format='csr')
+            else:
+                matrix = np.vstack([matrix, new_matrix])
+            self._entries[key] = (encoder, matrix)
+        return matrix
+
+
+    def encoder(self, columns):
+        """Sütun kümesi için eğitilmiş FeatureEncoder'ı döndürür"""
+        return self._entries[self._key(columns)][0]
+
+
+    def register(self, columns, encoder, matrix):
+        """Önceden eğitilmiş (ör. diskten yüklenmiş) kodlayıcı ve matrisi ekler"""
+        self._entries.setdefault(self._key(columns), (encoder, matrix))
+        return self._entries[self._key(columns)][1]
+
+
+def encode_features(df):
+    """
+    Özellikleri kodlar: Sayısal, kategorik ve özel kodlamalar
+    """
+    return FeatureEncoder().fit_transform(df)
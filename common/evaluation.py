@@ -1,20 +1,61 @@
 # evaluation.py
 
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
-import matplotlib.pyplot as plt
+from scipy import sparse as sp
+from sklearn.preprocessing import normalize
 from models.collaborative_user.user_recommender import UserBasedRecommender
 from models.collaborative_item.item_recommender import ItemBasedRecommender
 from models.kmeans_hybrid.cluster_recommender import ClusteringRecommender
-from common.data_preprocessing import encode_features, split_dataset
+from common.data_preprocessing import DatasetStore, FeatureCache, split_dataset
+from common.catalog import ProductCatalog
+from common.interactions import InteractionMatrix
+from common.customer_index import CustomerIndex, CustomerNotFoundError
+from common.parallel import fork_context
+from common.profiling import profiler
+
+
+# Değerlendirmede kullanıcılar bu boyutta sabit parçalara bölünür; parçalar süreç
+# sayısından bağımsız olduğu için seri ve paralel çalıştırmalar aynı sonucu verir
+EVAL_CHUNK_SIZE = 256
+
+# Alt süreçlerde paylaşılan değerlendirici (fork ile kopyalanmadan paylaşılır)
+_worker_evaluator = None
+
+
+def _init_worker(evaluator):
+    global _worker_evaluator
+    _worker_evaluator = evaluator
+
+
+def _score_chunk(test_users, recommendation_ranges):
+    return _worker_evaluator.score_users(test_users, recommendation_ranges)
 
 
 class RecommenderEvaluator:
 
+    # Sezon, renk ve kategori eşleşmeleri için bonus skorlar
+    SEASON_BONUS = 0.25
+    COLOR_BONUS = 0.15
+    CATEGORY_BONUS = 0.25
+
     def __init__(self, user_df, item_df):
-        self.user_df = user_df.copy()
-        self.item_df = item_df.copy()
+        # Değerlendirici ve üç model veri setini kopyalamaz; hepsi aynı deponun salt
+        # okunur görünümlerini kullanır
+        self.dataset = DatasetStore.of(user_df, item_df)
+        self.user_df = self.dataset.view(user_df.columns)
+        self.item_df = self.dataset.view(item_df.columns)
+        
+        # Tüm modellerin paylaştığı müşteri ID -> satır konumu indeksi ve kodlanmış özellikler
+        self.customer_index = CustomerIndex.from_frame(self.item_df)
+        self.features = FeatureCache()
+        
+        # Ürün bazlı ve küme bazlı modellerin paylaştığı benzersiz ürün kataloğu
+        self.catalog = ProductCatalog.from_frame(self.item_df)
+        
+        # Üç modelin ve değerlendirmenin paylaştığı müşteri × ürün etkileşimleri
+        self.interactions = InteractionMatrix.from_frame(self.item_df, self.catalog)
         
         # Benzerlik matrisi için kullanılacak özellikleri seç
         self.similarity_features = [
@@ -25,16 +66,29 @@ class RecommenderEvaluator:
             'Purchase Amount (USD)'
         ]
         
-        # Özellik matrisini oluştur
-        self.encoded_items = encode_features(self.item_df[self.similarity_features])
+        # Özellik matrisini ürün başına oluştur (fiyat, ürünün ortalama fiyatıdır)
+        self.encoded_items = self.catalog.encode(self.similarity_features)
+        
+        # N×N benzerlik matrisi yerine satır normalize edilmiş matris; gereken
+        # benzerlikler ürün çiftleri üzerinden hesaplanır
+        self.normalized_items = normalize(self.encoded_items)
         
-        # Benzerlik matrisini hesapla
-        self.similarity_matrix = cosine_similarity(self.encoded_items)
+        # Ürün başına sezon, renk ve kategori kodları
+        products = self.catalog.products
+        self.season_codes = pd.factorize(products['Season'])[0]
+        self.color_codes = pd.factorize(products['Color'])[0]
+        self.category_codes = pd.factorize(products['Category'])[0]
         
         # Modelleri başlat
-        self.user_recommender = UserBasedRecommender(self.user_df, self.item_df)
-        self.item_recommender = ItemBasedRecommender(self.user_df, self.item_df)
-        self.cluster_recommender = ClusteringRecommender(self.user_df, self.item_df)
+        self.user_recommender = UserBasedRecommender(
+            self.user_df, self.item_df, customer_index=self.customer_index,
+            features=self.features, interactions=self.interactions)
+        self.item_recommender = ItemBasedRecommender(
+            self.user_df, self.item_df, customer_index=self.customer_index,
+            features=self.features, catalog=self.catalog, interactions=self.interactions)
+        self.cluster_recommender = ClusteringRecommender(
+            self.user_df, self.item_df, customer_index=self.customer_index,
+            features=self.features, catalog=self.catalog, interactions=self.interactions)
         
         # Sonuçları saklamak için sözlükler
         self.results = {
@@ -44,113 +98,205 @@ class RecommenderEvaluator:
         }
 
 
+    def memory_components(self):
+        """
+        Bellek raporu için bileşenler; paylaşılan nesneler (veri deposu, müşteri indeksi,
+        kodlanmış özellikler, ürün kataloğu, etkileşim matrisi) modellerden önce gelir,
+        böylece yalnızca bir kez sayılır.
+        """
+        return {
+            'dataset': self.dataset,
+            'customer_index': self.customer_index,
+            'features': self.features,
+            'catalog': self.catalog,
+            'interactions': self.interactions,
+            'user_based': self.user_recommender,
+            'item_based': self.item_recommender,
+            'cluster_based': self.cluster_recommender,
+            'evaluator': self
+        }
+
+
+    def recommendation_scores(self, user_ids, recommendations, model_type='item_based'):
+        """
+        Her öneri satırı için skoru vektörel olarak hesaplar.
+        
+        Parametreler:
+        user_ids: Her öneri satırının hedef kullanıcısı
+        recommendations: Öneri satırları (get_recommendations_batch çıktısı ile aynı sütunlar)
+        model_type: 'cluster_based' ise modelin kendi benzerlik skoru kullanılır
+        
+        Dönüş:
+        np.ndarray: Satır başına skor
+        """
+        if model_type == 'cluster_based':
+            # Cluster-based model için benzerlik skorlarını direkt al
+            return recommendations['Similarity'].to_numpy(dtype=float)
+        
+        # Diğer modeller için cosine similarity kullan: önerilen ürün, kullanıcının
+        # geçmişindeki her ürünle karşılaştırılır ve skorlar ürünlerin geçmişteki payıyla
+        # (alışveriş sayısıyla) ağırlıklı ortalanır
+        customers = self.interactions.customer_codes[self.customer_index.positions(user_ids)]
+        owners, cells = self.interactions.cells_of(customers)
+        user_products = self.interactions.matrix.indices[cells]
+        rec_products = self.catalog.lookup(recommendations)[owners]
+        
+        user_vectors = self.normalized_items[user_products]
+        rec_vectors = self.normalized_items[rec_products]
+        if sp.issparse(user_vectors):
+            base_similarity = np.asarray(user_vectors.multiply(rec_vectors).sum(axis=1)).ravel()
+        else:
+            base_similarity = np.einsum('ij,ij->i', user_vectors, rec_vectors)
+        
+        # Bonus skorlar
+        bonus = np.zeros(len(rec_products))
+        bonus += np.where(self.season_codes[rec_products] == self.season_codes[user_products], self.SEASON_BONUS, 0.0)
+        bonus += np.where(self.color_codes[rec_products] == self.color_codes[user_products], self.COLOR_BONUS, 0.0)
+        bonus += np.where(self.category_codes[rec_products] == self.category_codes[user_products], self.CATEGORY_BONUS, 0.0)
+        
+        pair_scores = np.minimum(1.0, base_similarity + bonus)
+        weights = self.interactions.weights.data[cells].astype(float)
+        return np.bincount(owners, weights=weights * pair_scores, minlength=len(user_ids))
+
+
     def calculate_recommendation_score(self, user_id, recommendations, n_recommendations, model_type='item_based'):
         try:
-            user_item_idx = self.item_df[self.item_df['Customer ID'] == user_id].index[0]
-            user_item = self.item_df.iloc[user_item_idx]
+            self.customer_index.position(user_id)
             
             # Önerileri direkt kullan
             recommended_items = recommendations.head(n_recommendations)
-            
-            if model_type == 'cluster_based':
-                # Cluster-based model için benzerlik skorlarını direkt al
-                similarity_scores = recommended_items['Similarity'].values
-            else:
-                # Diğer modeller için cosine similarity kullan
-                similarity_scores = []
-                for _, rec in recommended_items.iterrows():
-                    rec_idx = self.item_df[
-                        (self.item_df['Item Purchased'] == rec['Item Purchased']) & 
-                        (self.item_df['Category'] == rec['Category']) &
-                        (self.item_df['Color'] == rec['Color']) &
-                        (self.item_df['Season'] == rec['Season'])
-                    ].index[0]
-                    
-                    base_similarity = self.similarity_matrix[user_item_idx][rec_idx]
-                    
-                    # Bonus skorlar
-                    bonus = 0.0
-                    if rec['Season'] == user_item['Season']:
-                        bonus += 0.25
-                    if rec['Color'] == user_item['Color']:
-                        bonus += 0.15
-                    if rec['Category'] == user_item['Category']:
-                        bonus += 0.25
-                    
-                    final_similarity = min(1.0, base_similarity + bonus)
-                    similarity_scores.append(final_similarity)
+            user_ids = np.full(len(recommended_items), user_id)
             
             # Ortalama benzerlik skoru
-            return np.mean(similarity_scores)
+            return np.mean(self.recommendation_scores(user_ids, recommended_items, model_type))
                 
+        except CustomerNotFoundError as e:
+            print(f"Uyarı: {str(e)}")
+            return 0
+            
         except Exception as e:
             print(f"Skor hesaplama hatası: {str(e)}")
             return 0
 
 
-    def evaluate_models(self, test_users, recommendation_ranges=None):
+    def prefix_scores(self, batch, recommendation_ranges, model_type):
+        """
+        En büyük n için hesaplanan sıralamanın önekleri üzerinden her n için
+        kullanıcı başına ortalama skorları hesaplar.
+        
+        Dönüş:
+        np.ndarray: (öneri alan kullanıcı sayısı, aralık sayısı) boyutlu ortalamalar;
+        kullanıcılar batch içindeki sırayla
+        """
+        if batch.empty:
+            return np.zeros((0, len(recommendation_ranges)))
+        
+        scores = self.recommendation_scores(batch['User ID'].to_numpy(), batch, model_type)
+        
+        # Kullanıcı × sıra tablosu; satır içi kümülatif toplam önek toplamlarını verir
+        user_codes = pd.factorize(batch['User ID'])[0]
+        ranks = batch['Rank'].to_numpy() - 1
+        table = np.zeros((user_codes.max() + 1, ranks.max() + 1))
+        table[user_codes, ranks] = scores
+        cumulative = np.cumsum(table, axis=1)
+        counts = np.bincount(user_codes)
+        
+        means = np.empty((len(counts), len(recommendation_ranges)))
+        for col, n_recommendations in enumerate(recommendation_ranges):
+            taken = np.minimum(n_recommendations, counts)
+            means[:, col] = cumulative[np.arange(len(counts)), taken - 1] / taken
+        return means
+
+
+    def score_users(self, test_users, recommendation_ranges):
+        """
+        Verilen kullanıcılar için her modelin kullanıcı başına ortalama skorlarını hesaplar.
+        Sıralama her model için en büyük n ile bir kez hesaplanır; küçük n değerleri
+        bu sıralamanın önekleridir.
+        
+        Dönüş:
+        dict: Model adı -> (öneri alan kullanıcı sayısı, aralık sayısı) boyutlu skorlar
+        """
+        max_recommendations = max(recommendation_ranges)
+        recommenders = {
+            'user_based': self.user_recommender,
+            'item_based': self.item_recommender,
+            'cluster_based': self.cluster_recommender
+        }
+        model_scores = {}
+        for model_name, recommender in recommenders.items():
+            batch = recommender.get_recommendations_batch(test_users, max_recommendations)
+            with profiler.span('evaluation.prefix_scores'):
+                model_scores[model_name] = self.prefix_scores(batch, recommendation_ranges, model_name)
+        return model_scores
+
+
+    def evaluate_models(self, test_users, recommendation_ranges=None, n_jobs=1):
+        """
+        Modelleri test kullanıcıları üzerinde değerlendirir.
+        
+        Parametreler:
+        test_users: Test edilecek kullanıcı ID'leri
+        recommendation_ranges: Denenecek öneri sayıları
+        n_jobs: Kullanıcı parçalarını puanlayacak süreç sayısı (fork desteklenmiyorsa seri)
+        """
         if recommendation_ranges is None:
             recommendation_ranges = range(10, 101, 10)
+        recommendation_ranges = list(recommendation_ranges)
+        test_users = np.asarray(test_users)
             
         total_users = len(test_users)
         total_ranges = len(recommendation_ranges)
         
         print("\nDeğerlendirme başlıyor...")
         print(f"Test edilecek kullanıcı sayısı: {total_users}")
-        print(f"Test edilecek öneri sayısı aralıkları: {list(recommendation_ranges)}")
+        print(f"Test edilecek öneri sayısı aralıkları: {recommendation_ranges}")
         print("="*50)
         
-        for range_idx, n_recommendations in enumerate(recommendation_ranges, 1):
-            print(f"\nİLERLEME: {range_idx}/{total_ranges} - Öneri sayısı: {n_recommendations}")
-            
-            model_scores = {
-                'user_based': [],
-                'item_based': [],
-                'cluster_based': []
-            }
-            
-            for idx, user_id in enumerate(test_users, 1):
-                print(f"Test edilen kullanıcı: {idx}/{total_users}", end='\r')
-                
-                # User-based öneriler
-                recommendations, _ = self.user_recommender.get_recommendations(
-                    user_id, n_recommendations)
-                if not recommendations.empty:
-                    score = self.calculate_recommendation_score(user_id, recommendations, n_recommendations, 'user_based')
-                    model_scores['user_based'].append(score)
-
-                # Item-based öneriler            
-                recommendations, _ = self.item_recommender.get_recommendations(
-                    user_id, n_recommendations)
-                if not recommendations.empty:
-                    score = self.calculate_recommendation_score(user_id, recommendations, n_recommendations, 'item_based')
-                    model_scores['item_based'].append(score)
-
-                # Cluster-based öneriler
-                recommendations, _ = self.cluster_recommender.get_cluster_recommendations(
-                    user_id, n_recommendations)
-                if not recommendations.empty:
-                    score = self.calculate_recommendation_score(user_id, recommendations, n_recommendations, 'cluster_based')
-                    model_scores['cluster_based'].append(score)
-            
-            print()  # Yeni satır
+        # Kullanıcı parçaları seri ya da paralel olarak puanlanır ve sırayla birleştirilir
+        chunks = [test_users[start:start + EVAL_CHUNK_SIZE]
+                  for start in range(0, total_users, EVAL_CHUNK_SIZE)]
+        # Değerlendirici alt süreçlere fork ile kopyalanmadan aktarılır; fork desteklenmiyorsa
+        # (ör. Windows) parçalar seri puanlanır.
+        # Not: paralel çalıştırmada alt süreçlerdeki aşamalar profile yansımaz
+        context = fork_context() if n_jobs > 1 and len(chunks) > 1 else None
+        if context is not None:
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks)), mp_context=context,
+                                     initializer=_init_worker,
+                                     initargs=(self,)) as executor:
+                chunk_scores = list(executor.map(
+                    _score_chunk, chunks, [recommendation_ranges] * len(chunks)))
+        else:
+            chunk_scores = [self.score_users(chunk, recommendation_ranges) for chunk in chunks]
+        
+        model_scores = {
+            model_name: np.concatenate([scores[model_name] for scores in chunk_scores])
+            if chunk_scores else np.zeros((0, total_ranges))
+            for model_name in self.results
+        }
+        
+        for range_idx, n_recommendations in enumerate(recommendation_ranges):
+            print(f"\nİLERLEME: {range_idx + 1}/{total_ranges} - Öneri sayısı: {n_recommendations}")
             
             # Her model için ortalama skorları kaydet
-            for model_name in model_scores:
-                if model_scores[model_name]:
-                    avg_score = np.mean(model_scores[model_name])
+            for model_name, scores in model_scores.items():
+                if len(scores):
+                    avg_score = np.mean(scores[:, range_idx])
                     self.results[model_name].append(avg_score)
                 else:
                     self.results[model_name].append(0)
-                print(f"{model_name}: {len(model_scores[model_name])} kullanıcı için ortalama skor = {self.results[model_name][-1]:.4f}")
+                print(f"{model_name}: {len(scores)} kullanıcı için ortalama skor = {self.results[model_name][-1]:.4f}")
                     
-        return self.results, list(recommendation_ranges)
+        return self.results, recommendation_ranges
 
 
     def plot_results(self, results, recommendation_ranges):
         """
         Değerlendirme sonuçlarını görselleştirir
         """
+        # matplotlib yalnızca grafik çizilirken yüklenir
+        import matplotlib.pyplot as plt
+        
         plt.figure(figsize=(12, 8))
         
         # Her modelin sonuçlarını ayrı ayrı çiz
@@ -186,25 +332,41 @@ class RecommenderEvaluator:
         plt.close()  # Belleği temizle
 
 
-def evaluate_recommenders(data_path, n_test_users=100, recommendation_ranges=None):
+def evaluate_recommenders(data_path, n_test_users=100, recommendation_ranges=None,
+                          n_jobs=1, seed=42, report_memory=False):
     """
     Öneri sistemlerini değerlendirir ve sonuçları görselleştirir
+    
+    Parametreler:
+    n_jobs: Değerlendirmede kullanılacak süreç sayısı
+    seed: Test kullanıcılarını seçen rastgele sayı üretecinin tohumu
+    report_memory: True ise modeller hazırlandıktan sonra bileşen başına bellek kullanımı yazdırılır
     """
     # Veriyi yükle
     user_df, item_df = split_dataset(data_path)
     
-    # Rastgele test kullanıcıları seç
-    test_users = np.random.choice(user_df['Customer ID'].unique(), 
-                                size=min(n_test_users, len(user_df)), 
-                                replace=False)
+    # Rastgele test kullanıcıları seç (aynı tohum aynı kullanıcıları verir)
+    rng = np.random.default_rng(seed)
+    customer_ids = user_df['Customer ID'].unique()
+    test_users = rng.choice(customer_ids, 
+                            size=min(n_test_users, len(customer_ids)), 
+                            replace=False)
     
     # Değerlendiriciyi başlat
-    evaluator = RecommenderEvaluator(user_df, item_df)
+    with profiler.span('evaluation.setup'):
+        evaluator = RecommenderEvaluator(user_df, item_df)
+    
+    if report_memory:
+        from common.memory import format_memory_report, memory_report
+        print("\nBELLEK KULLANIMI:")
+        print(format_memory_report(memory_report(evaluator.memory_components())))
     
     # Modelleri değerlendir
-    results, ranges = evaluator.evaluate_models(test_users, recommendation_ranges)
+    with profiler.span('evaluation.score'):
+        results, ranges = evaluator.evaluate_models(test_users, recommendation_ranges, n_jobs=n_jobs)
     
     # Sonuçları görselleştir
-    evaluator.plot_results(results, ranges)
+    with profiler.span('evaluation.plot'):
+        evaluator.plot_results(results, ranges)
     
     return results, ranges
\ No newline at end of file
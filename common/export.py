@@ -0,0 +1,237 @@
+# export.py
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from common.parallel import fork_context
+from common.profiling import profiler
+
+
+# Birlikte hesaplanıp dosyaya tek parça (Parquet'te tek satır grubu) olarak yazılan kullanıcı sayısı
+EXPORT_CHUNK_SIZE = 2048
+
+# İlerleme satırları en fazla bu aralıkla (saniye) yazdırılır
+PROGRESS_INTERVAL = 5.0
+
+EXPORT_FORMATS = ('parquet', 'csv')
+
+DEFAULT_EXPORT_DIR = './exports'
+
+# Süreç başına aynı anda bekletilen parça sayısı; yazılmayı bekleyen sonuçları sınırlar
+PENDING_CHUNKS_PER_JOB = 2
+
+# Alt süreçlerde paylaşılan modeller (fork ile kopyalanmadan paylaşılır)
+_worker_recommenders = None
+
+
+def _init_worker(recommenders):
+    global _worker_recommenders
+    _worker_recommenders = recommenders
+
+
+def _recommend_chunk(mode, user_ids, n_recommendations):
+    return _worker_recommenders[mode].recommend_batch(user_ids, n_recommendations).to_frame()
+
+
+class _CsvWriter:
+    """Parçaları tek bir CSV dosyasına ekler (başlık yalnızca ilk parçada yazılır)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._started = False
+
+
+    def write(self, frame):
+        frame.to_csv(self.path, mode='a' if self._started else 'w', header=not self._started,
+                     index=False)
+        self._started = True
+
+
+    def close(self):
+        pass
+
+
+class _ParquetWriter:
+    """Parçaları tek bir Parquet dosyasına ayrı satır grupları olarak ekler"""
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+
+
+    def write(self, frame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Şema ilk parçadan alınır; sonraki parçalar aynı şemaya dönüştürülür
+        if self._writer is None:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = pa.Table.from_pandas(frame, schema=self._writer.schema, preserve_index=False)
+        self._writer.write_table(table)
+
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _open_writer(path, file_format):
+    return _ParquetWriter(path) if file_format == 'parquet' else _CsvWriter(path)
+
+
+class ExportProgress:
+    """
+    Bir modun dışa aktarım ilerlemesini ve hızını izler; ilerleme satırlarını en fazla
+    interval saniyede bir yazdırır.
+    """
+
+    def __init__(self, mode, total_users, interval=PROGRESS_INTERVAL):
+        self.mode = mode
+        self.total_users = total_users
+        self.interval = interval
+        self.users = 0
+        self.rows = 0
+        self.started = time.perf_counter()
+        self._last_print = self.started
+
+
+    def update(self, n_users, n_rows):
+        self.users += n_users
+        self.rows += n_rows
+        profiler.count('export.users', n_users)
+        profiler.count('export.rows', n_rows)
+
+        now = time.perf_counter()
+        if now - self._last_print >= self.interval and self.users < self.total_users:
+            self._last_print = now
+            print(self.format_line(now))
+
+
+    def format_line(self, now=None):
+        elapsed = (now or time.perf_counter()) - self.started
+        users_per_s = self.users / elapsed if elapsed > 0 else 0.0
+        remaining = (self.total_users - self.users) / users_per_s if users_per_s > 0 else 0.0
+        percent = 100.0 * self.users / self.total_users if self.total_users else 100.0
+        return (f"[{self.mode}] {self.users}/{self.total_users} kullanıcı (%{percent:.1f}) - "
+                f"{self.rows} satır - {users_per_s:.0f} kullanıcı/s - kalan ~{remaining:.0f} s")
+
+
+    def summary(self):
+        """
+        Dönüş:
+        dict: users, rows, seconds, users_per_s, rows_per_s
+        """
+        seconds = time.perf_counter() - self.started
+        return {
+            'users': self.users,
+            'rows': self.rows,
+            'seconds': seconds,
+            'users_per_s': self.users / seconds if seconds > 0 else 0.0,
+            'rows_per_s': self.rows / seconds if seconds > 0 else 0.0
+        }
+
+
+def _chunk_frames(recommenders, mode, chunks, n_recommendations, executor, n_pending):
+    """Parçaların öneri tablolarını parça sırasıyla üretir"""
+    if executor is None:
+        for chunk in chunks:
+            yield chunk, recommenders[mode].recommend_batch(chunk, n_recommendations).to_frame()
+        return
+
+    # Kayan pencere: en fazla n_pending parça hesaplanır ya da yazılmayı bekler
+    pending = deque()
+    for chunk in chunks:
+        pending.append((chunk, executor.submit(_recommend_chunk, mode, chunk, n_recommendations)))
+        if len(pending) >= n_pending:
+            done_chunk, future = pending.popleft()
+            yield done_chunk, future.result()
+    while pending:
+        done_chunk, future = pending.popleft()
+        yield done_chunk, future.result()
+
+
+def export_recommendations(recommenders, user_ids, output_dir, n_recommendations=10,
+                           file_format='parquet', n_jobs=1, chunk_size=EXPORT_CHUNK_SIZE,
+                           progress_interval=PROGRESS_INTERVAL):
+    """
+    Tüm kullanıcılar için her moddaki ilk n öneriyi hesaplayıp mod başına bir dosyaya yazar.
+
+    Kullanıcılar chunk_size'lık parçalara bölünür; parçalar seri ya da süreç havuzunda
+    hesaplanır ve sırayla dosyaya eklenir. Aynı anda yalnızca birkaç parça bellekte
+    tutulduğundan bellek kullanımı kullanıcı sayısından bağımsızdır.
+
+    Parametreler:
+    recommenders: Mod adı -> model (recommend_batch ile)
+    user_ids: Öneri hesaplanacak kullanıcı ID'leri
+    output_dir: Çıktı dizini; her mod için <mod>.<file_format> dosyası yazılır
+    n_recommendations: Kullanıcı başına öneri sayısı
+    file_format: 'parquet' ya da 'csv'
+    n_jobs: Parçaları hesaplayacak süreç sayısı (fork desteklenmiyorsa seri)
+    chunk_size: Parça başına kullanıcı sayısı
+    progress_interval: İlerleme satırları arasındaki en kısa süre (saniye)
+
+    Dönüş:
+    dict: Mod -> metrikler (users, rows, seconds, users_per_s, rows_per_s, path)
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Desteklenmeyen dışa aktarım formatı: {file_format}")
+    os.makedirs(output_dir, exist_ok=True)
+    user_ids = np.asarray(user_ids)
+    chunks = [user_ids[start:start + chunk_size] for start in range(0, len(user_ids), chunk_size)]
+
+    # Havuz tüm modlar için bir kez açılır; modeller alt süreçlere fork ile kopyalanmadan
+    # aktarılır. fork desteklenmiyorsa (ör. Windows) parçalar seri hesaplanır.
+    # Not: paralel çalıştırmada alt süreçlerdeki aşamalar profile yansımaz
+    executor = None
+    context = fork_context() if n_jobs > 1 and len(chunks) > 1 else None
+    if context is not None:
+        executor = ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks)), mp_context=context,
+                                       initializer=_init_worker, initargs=(recommenders,))
+
+    metrics = {}
+    try:
+        for mode, recommender in recommenders.items():
+            path = os.path.join(output_dir, f"{mode}.{file_format}")
+            progress = ExportProgress(mode, len(user_ids), progress_interval)
+            writer = _open_writer(path, file_format)
+            print(f"\n[{mode}] {len(user_ids)} kullanıcı için öneriler yazılıyor: {path}")
+
+            with profiler.span(f'export.{mode}'):
+                try:
+                    for chunk, frame in _chunk_frames(recommenders, mode, chunks, n_recommendations,
+                                                      executor, PENDING_CHUNKS_PER_JOB * n_jobs):
+                        if not frame.empty:
+                            with profiler.span('write'):
+                                writer.write(frame)
+                        progress.update(len(chunk), len(frame))
+
+                    # Hiç öneri yoksa yalnızca sütunları içeren dosya yazılır
+                    if progress.rows == 0:
+                        writer.write(recommender.recommend_batch([], n_recommendations).to_frame())
+                finally:
+                    writer.close()
+
+            metrics[mode] = {**progress.summary(), 'path': path}
+            print(progress.format_line())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return metrics
+
+
+def format_export_summary(metrics):
+    """Dışa aktarım metriklerini metin tablosu olarak döndürür"""
+    lines = [f"\n{'Mod':<10} {'Kullanıcı':>10} {'Satır':>12} {'Süre (s)':>10} "
+             f"{'Kullanıcı/s':>12} {'Satır/s':>12} {'Boyut (MB)':>11}", "-" * 82]
+    for mode, entry in metrics.items():
+        size_mb = os.path.getsize(entry['path']) / 2**20
+        lines.append(f"{mode:<10} {entry['users']:>10} {entry['rows']:>12} {entry['seconds']:>10.2f} "
+                     f"{entry['users_per_s']:>12.0f} {entry['rows_per_s']:>12.0f} {size_mb:>11.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,149 @@
+# interactions.py
+
+import numpy as np
+import pandas as pd
+from scipy import sparse as sp
+from sklearn.preprocessing import normalize
+from common.profiling import profiler
+
+
+def top_k_sparse(scores, n, exclude=None, tiebreak=None):
+    """
+    Seyrek skor matrisinin her satırından en yüksek skorlu n hücreyi seçer.
+    
+    Parametreler:
+    scores: (sorgu, sütun) boyutlu CSR skor matrisi; sıfırdan büyük hücreler adaydır.
+        Sütun konumları yerinde sıralanır (sort_indices).
+    n: Satır başına seçilecek hücre sayısı
+    exclude: Aynı boyutta seyrek matris; sıfır olmayan hücreleri seçilmez
+    tiebreak: scores.data ile hizalı ikincil anahtar; eşit skorlarda küçük olan önce gelir
+    
+    Dönüş:
+    (rows, cells, ranks): Satır ve sıra sırasıyla seçilen hücrelerin satırları ve
+    scores.data/indices içindeki konumları. Sıralama skora göre azalan, eşitlikte
+    tiebreak ve sütun konumuna göre artandır; ranks 0'dan başlar.
+    """
+    scores.sort_indices()
+    rows = np.repeat(np.arange(scores.shape[0]), np.diff(scores.indptr))
+    cells = np.arange(scores.nnz)
+    keep = scores.data > 0
+    if exclude is not None:
+        exclude = sp.csr_matrix(exclude)
+        exclude_rows = np.repeat(np.arange(exclude.shape[0]), np.diff(exclude.indptr))
+        keys = rows.astype(np.int64) * scores.shape[1] + scores.indices
+        excluded = exclude_rows.astype(np.int64) * scores.shape[1] + exclude.indices
+        keep &= ~np.isin(keys, excluded)
+    rows, cells = rows[keep], cells[keep]
+    
+    # Hücreler konum sırasında olduğundan son anahtar (konum) sütun sırasını verir
+    secondary = tiebreak[cells] if tiebreak is not None else np.zeros(len(cells), dtype=np.int8)
+    order = np.lexsort((cells, secondary, -scores.data[cells], rows))
+    rows, cells = rows[order], cells[order]
+    
+    # Satır içindeki sıra: konum - satırın ilk hücresinin konumu
+    positions = np.arange(len(rows))
+    row_starts = np.maximum.accumulate(np.where(np.r_[True, rows[1:] != rows[:-1]], positions, 0)
+                                       ) if len(rows) else positions
+    ranks = positions - row_starts
+    selected = ranks < n
+    return rows[selected], cells[selected], ranks[selected]
+
+
+class InteractionMatrix:
+    """
+    Alışveriş kayıtlarından oluşturulan seyrek (CSR) müşteri × ürün etkileşim matrisi.
+    
+    Bir müşterinin birden çok alışverişi olabilir; öneriler müşterinin yalnızca ilk
+    alışverişine değil tüm geçmişine göre hesaplanır. Müşteriler ilk görüldükleri sırayla
+    numaralanır; her müşterinin tek alışverişi varsa müşteri numarası satır konumuna eşittir.
+    
+    Öznitelikler:
+    customer_codes: Her alışveriş satırının müşteri numarası
+    first_rows: Her müşterinin ilk alışveriş satırı
+    matrix: Müşteri × ürün alışveriş sayıları (ürün numaraları catalog'a göredir)
+    weights: Satır toplamları 1'e normalize edilmiş matrix (ürünlerin müşteri geçmişindeki payı)
+    """
+
+    def __init__(self, customer_codes, catalog):
+        self.customer_codes = np.asarray(customer_codes, dtype=np.int32)
+        self.catalog = catalog
+        _, self.first_rows = np.unique(self.customer_codes, return_index=True)
+        
+        # Aynı (müşteri, ürün) çiftleri toplanır: hücre değeri alışveriş sayısıdır
+        purchases = np.ones(len(self.customer_codes), dtype=np.float32)
+        self.matrix = sp.csr_matrix((purchases, (self.customer_codes, catalog.codes)),
+                                    shape=(len(self.first_rows), len(catalog)))
+        self.matrix.sum_duplicates()
+        self.weights = normalize(self.matrix, norm='l1')
+        
+        # Her hücrenin (müşterinin o ürünü ilk aldığı) alışveriş satırı; hücreler CSR
+        # sırasındadır (müşteri, sonra ürün numarasına göre), matrix.data ile hizalıdır
+        order = np.lexsort((catalog.codes, self.customer_codes))
+        cells = self.customer_codes[order].astype(np.int64) * len(catalog) + catalog.codes[order]
+        self.cell_rows = order[np.r_[True, cells[1:] != cells[:-1]]] if len(cells) else order
+
+
+    @classmethod
+    @profiler.timed('interactions.build')
+    def from_frame(cls, item_df, catalog):
+        """
+        Alışveriş satırlarından matrisi oluşturur.
+        
+        Parametreler:
+        catalog: item_df satırlarının ürün numaralarını veren ProductCatalog
+        """
+        return cls(pd.factorize(item_df['Customer ID'])[0], catalog)
+
+
+    def __len__(self):
+        return len(self.first_rows)
+
+
+    @property
+    def single_purchase(self):
+        """Her müşterinin tek alışverişi varsa True (müşteri numaraları satır konumlarıdır)"""
+        return len(self) == len(self.customer_codes)
+
+
+    def profiles(self, row_matrix):
+        """
+        Müşteri profilleri: müşterinin alışveriş satırlarındaki vektörlerin ortalaması.
+        Her müşterinin tek alışverişi varsa satır matrisi olduğu gibi döndürülür.
+        
+        Parametreler:
+        row_matrix: Alışveriş satırı başına (dense ya da seyrek) özellik matrisi
+        """
+        if self.single_purchase:
+            return row_matrix
+        
+        n_rows = len(self.customer_codes)
+        counts = np.bincount(self.customer_codes, minlength=len(self))
+        averaging = sp.csr_matrix(
+            ((1.0 / counts[self.customer_codes]).astype(row_matrix.dtype),
+             (self.customer_codes, np.arange(n_rows))), shape=(len(self), n_rows))
+        return averaging @ row_matrix
+
+
+    def cells_of(self, customers):
+        """
+        Verilen müşterilerin satın aldığı ürün hücreleri.
+        
+        Dönüş:
+        (owners, cells): Her hücrenin customers içindeki konumu ve matrix.data/indices
+        içindeki konumu (müşteri sırasıyla, her müşteri içinde ürün numarasına göre)
+        """
+        customers = np.asarray(customers, dtype=np.int64)
+        starts = self.matrix.indptr[customers]
+        lengths = self.matrix.indptr[customers + 1] - starts
+        owners = np.repeat(np.arange(len(customers)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return owners, np.repeat(starts, lengths) + offsets
+
+
+    def returning_customers(self, n_old_rows):
+        """İlk n_old_rows satırdan sonra yeni alışverişi olan, önceden görülmüş müşterilerin numaraları"""
+        if n_old_rows == 0:
+            return np.array([], dtype=self.customer_codes.dtype)
+        n_old_customers = int(self.customer_codes[:n_old_rows].max()) + 1
+        new_codes = self.customer_codes[n_old_rows:]
+        return np.unique(new_codes[new_codes < n_old_customers])
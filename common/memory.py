@@ -0,0 +1,128 @@
+# memory.py
+
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+from scipy import sparse as sp
+
+
+# Boyutu ölçülmeyen (modül, sınıf, fonksiyon gibi paylaşılan) nesneler
+_SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                  types.MethodType)
+
+
+def _root_array(array):
+    """Görünümün bellek sahibi olan en dıştaki diziyi döndürür (ortak tampon bir kez sayılır)"""
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+class _SizeCounter:
+    """
+    Nesne grafiğini gezerek bayt sayar. Aynı dizi (ya da aynı tamponun görünümleri)
+    birden çok yerden erişilse de yalnızca ilk karşılaşıldığında sayılır.
+    """
+
+    def __init__(self):
+        # id -> nesne; gezinti sırasında oluşan geçici nesneler (ör. kod görünümleri)
+        # canlı tutulur, böylece id'leri başka bir nesneye yeniden verilmez
+        self.seen = {}
+
+
+    def measure(self, obj):
+        """
+        Dönüş:
+        (memory, mapped): Bellekteki ve dosyaya eşlenmiş (np.memmap) bayt sayısı
+        """
+        self.memory = 0
+        self.mapped = 0
+        self._visit(obj)
+        return self.memory, self.mapped
+
+
+    def _visit(self, obj):
+        if obj is None or isinstance(obj, _SKIPPED_TYPES) or id(obj) in self.seen:
+            return
+        self.seen[id(obj)] = obj
+        
+        if isinstance(obj, np.ndarray):
+            root = _root_array(obj)
+            if root is not obj:
+                if id(root) in self.seen:
+                    return
+                self.seen[id(root)] = root
+            if isinstance(root, np.memmap):
+                self.mapped += root.nbytes
+            else:
+                self.memory += root.nbytes
+                if root.dtype == object:
+                    for value in root.ravel():
+                        self._visit(value)
+        elif sp.issparse(obj):
+            self.memory += sys.getsizeof(obj)
+            for name in ('data', 'indices', 'indptr', 'row', 'col'):
+                self._visit(getattr(obj, name, None))
+        elif isinstance(obj, (pd.DataFrame, pd.Series)):
+            self.memory += sys.getsizeof(object())
+            for _, column in (obj.items() if isinstance(obj, pd.DataFrame) else [(None, obj)]):
+                self._visit(column.array)
+            self._visit(obj.index)
+        elif isinstance(obj, pd.Categorical):
+            self._visit(obj.codes)
+            self._visit(obj.categories)
+        elif isinstance(obj, pd.Index):
+            self.memory += int(obj.memory_usage(deep=True))
+        elif isinstance(obj, pd.api.extensions.ExtensionArray):
+            self.memory += int(obj.nbytes)
+        elif isinstance(obj, dict):
+            self.memory += sys.getsizeof(obj)
+            for key, value in obj.items():
+                self._visit(key)
+                self._visit(value)
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            self.memory += sys.getsizeof(obj)
+            for value in obj:
+                self._visit(value)
+        elif hasattr(obj, '__dict__') or hasattr(type(obj), '__slots__'):
+            self.memory += sys.getsizeof(obj)
+            for value in getattr(obj, '__dict__', {}).values():
+                self._visit(value)
+            for name in getattr(type(obj), '__slots__', ()):
+                self._visit(getattr(obj, name, None))
+        else:
+            self.memory += sys.getsizeof(obj)
+
+
+def memory_report(components):
+    """
+    Bileşen başına bellek kullanımını ölçer.
+    
+    Parametreler:
+    components: Ad -> nesne. Bileşenler verilen sırayla ölçülür; birden çok bileşenin
+        paylaştığı diziler (ör. veri deposu, kodlanmış özellikler) yalnızca ilk
+        bileşene sayılır. Bu nedenle paylaşılan nesneler önce verilmelidir.
+    
+    Dönüş:
+    dict: components (ad -> memory_mb, mapped_mb), total_memory_mb ve total_mapped_mb
+    """
+    counter = _SizeCounter()
+    report = {'components': {}}
+    for name, component in components.items():
+        memory, mapped = counter.measure(component)
+        report['components'][name] = {'memory_mb': memory / 2**20, 'mapped_mb': mapped / 2**20}
+    
+    report['total_memory_mb'] = sum(entry['memory_mb'] for entry in report['components'].values())
+    report['total_mapped_mb'] = sum(entry['mapped_mb'] for entry in report['components'].values())
+    return report
+
+
+def format_memory_report(report):
+    """Bellek raporunu metin tablosu olarak döndürür"""
+    lines = [f"\n{'Bileşen':<32} {'Bellek (MB)':>12} {'Eşlenmiş (MB)':>14}", "-" * 60]
+    for name, entry in report['components'].items():
+        lines.append(f"{name:<32} {entry['memory_mb']:>12.2f} {entry['mapped_mb']:>14.2f}")
+    lines.append(f"{'Toplam':<32} {report['total_memory_mb']:>12.2f} {report['total_mapped_mb']:>14.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,328 @@
+# neighbors.py
+
+import numpy as np
+from scipy import sparse as sp
+from sklearn.preprocessing import normalize
+from common import MIN_SIMILARITY_THRESHOLD
+from common.profiling import profiler
+
+
+# Bir blokta aynı anda tutulacak en fazla benzerlik hücresi (~128 MB float64)
+DEFAULT_BLOCK_CELLS = 2 ** 24
+
+# Komşu listelerinde k'nın ötesinde saklanan ek komşu sayısı (bkz. TopKNeighborIndex.refresh)
+DEFAULT_SLACK = 8
+
+
+def row_similarities(normalized, rows, columns=None):
+    """
+    Satır normalize edilmiş (dense ya da CSR) matristen verilen satırların
+    diğer satırlarla cosine benzerliklerini yoğun blok olarak döndürür.
+    """
+    others = normalized if columns is None else normalized[columns]
+    block = normalized[rows] @ others.T
+    profiler.count('neighbors.similarity_cells', block.shape[0] * block.shape[1])
+    return block.toarray() if sp.issparse(block) else block
+
+
+def select_top_k(similarities, k, exclude=None, threshold=MIN_SIMILARITY_THRESHOLD):
+    """
+    Bir benzerlik bloğundan her satır için eşiği geçen en benzer k sütunu seçer.
+
+    Parametreler:
+    similarities: (b, N) benzerlik bloğu
+    k: Satır başına tutulacak komşu sayısı
+    exclude: Her satır için dışlanacak sütun konumu (satırın kendisi, -1 ise yok)
+    threshold: Minimum benzerlik eşiği
+
+    Dönüş:
+    (indices, scores, counts): (b, k) boyutlu komşu konumları (-1 ile doldurulmuş),
+    skorları ve her satırdaki geçerli komşu sayısı.
+
+    Sıralama tam (dense) yol ile aynıdır: skora göre azalan, eşitlikte küçük konum önce.
+    """
+    sims = np.array(similarities, dtype=np.result_type(similarities.dtype, np.float32))
+    n_rows, n_cols = sims.shape
+
+    # Kendisini ve eşik altını dışla
+    valid = sims >= threshold
+    if exclude is not None:
+        exclude = np.asarray(exclude)
+        has_self = (exclude >= 0) & (exclude < n_cols)
+        valid[np.flatnonzero(has_self), exclude[has_self]] = False
+    sims[~valid] = -np.inf
+
+    if n_cols > k:
+        # k. en büyük değer; sınırdaki eşitlikler konuma göre çözülür
+        kth = -np.partition(-sims, k - 1, axis=1)[:, k - 1]
+        greater = sims > kth[:, None]
+        equal = (sims == kth[:, None]) & valid
+        need = k - greater.sum(axis=1)
+        equal_rank = np.cumsum(equal, axis=1, dtype=np.int32)
+        take = greater | (equal & (equal_rank <= need[:, None]))
+    else:
+        take = valid
+
+    rows, cols = np.nonzero(take)
+    counts = np.bincount(rows, minlength=n_rows).astype(np.int32)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    slots = np.arange(len(rows)) - offsets[rows]
+
+    width = min(k, n_cols)
+    indices = np.full((n_rows, width), -1, dtype=np.int64)
+    scores = np.full((n_rows, width), -np.inf, dtype=sims.dtype)
+    indices[rows, slots] = cols
+    scores[rows, slots] = sims[rows, cols]
+
+    # Konumlar artan sırada yerleştirildiği için kararlı sıralama eşitlikleri korur
+    order = np.argsort(-scores, axis=1, kind='stable')
+    indices = np.take_along_axis(indices, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    scores[indices < 0] = 0.0
+
+    return indices, scores, counts
+
+
+class TopKNeighborIndex:
+    """
+    Cosine benzerliğini satır blokları halinde hesaplar ve her satır için yalnızca
+    eşiği geçen en benzer k komşuyu saklar. Bellek kullanımı O(N·k)'dır.
+
+    Listelerde k'nın ötesinde slack kadar ek komşu tutulur: bazı satırların vektörü
+    değiştiğinde (bkz. refresh) bu satırlar diğer listelerden çıkarılsa da en iyi k
+    çoğu satır için baştan hesaplanmadan korunur.
+    """
+
+    backend = 'exact'
+
+    def __init__(self, n_neighbors=100, threshold=MIN_SIMILARITY_THRESHOLD,
+                 block_size=None, slack=DEFAULT_SLACK):
+        self.n_neighbors = n_neighbors
+        self.threshold = threshold
+        self.block_size = block_size
+        self.slack = slack
+
+
+    def _block_rows(self, n_cols):
+        if self.block_size:
+            return self.block_size
+        return max(1, DEFAULT_BLOCK_CELLS // max(n_cols, 1))
+
+
+    def _width(self, n_rows):
+        return min(self.n_neighbors + self.slack, n_rows)
+
+
+    def _fit_rows(self, rows, indices, scores, counts, truncated):
+        """Verilen satırların komşu listelerini tüm satırlara karşı tam hesaplar"""
+        width = indices.shape[1]
+        step = self._block_rows(self.normalized.shape[0])
+        for start in range(0, len(rows), step):
+            chunk = rows[start:start + step]
+            block = row_similarities(self.normalized, chunk)
+            block_indices, block_scores, block_counts = select_top_k(
+                block, width, chunk, self.threshold)
+            indices[chunk, :block_indices.shape[1]] = block_indices
+            scores[chunk, :block_scores.shape[1]] = block_scores
+            counts[chunk] = block_counts
+            # Dolu listeler eşiği geçen başka komşuları dışarıda bırakmış olabilir
+            truncated[chunk] = block_counts == width
+
+
+    @profiler.timed('neighbors.fit')
+    def fit(self, matrix):
+        """Komşu listelerini blok blok hesaplar"""
+        self.normalized = normalize(matrix)
+        n_rows = self.normalized.shape[0]
+        width = self._width(n_rows)
+
+        self.indices = np.full((n_rows, width), -1, dtype=np.int32)
+        self.scores = np.zeros((n_rows, width), dtype=self.normalized.dtype)
+        self.counts = np.zeros(n_rows, dtype=np.int32)
+        self.truncated = np.zeros(n_rows, dtype=bool)
+        self._fit_rows(np.arange(n_rows), self.indices, self.scores, self.counts, self.truncated)
+        return self
+
+
+    @profiler.timed('neighbors.extend')
+    def extend(self, matrix):
+        """
+        Matrisin sona eklenmiş satırlarını indekse ekler; mevcut satırlar değişmemiş olmalıdır.
+        Sonuç, fit ile baştan hesaplanan listelerle aynıdır (bkz. refresh).
+        """
+        return self.refresh(matrix)
+
+
+    @profiler.timed('neighbors.refresh')
+    def refresh(self, matrix, changed_rows=()):
+        """
+        Vektörü değişen satırları ve matrisin sona eklenmiş satırlarını tüm çiftleri yeniden
+        hesaplamadan indekse işler.
+
+        Değişen ve yeni satırların komşuları tüm satırlara karşı hesaplanır. Diğer satırların
+        listelerinden değişen satırlar çıkarılır ve listeler bu satırlarla yeni benzerliklerle
+        birleştirilir. Dolu bir listeden satır çıkarıldığında liste yalnızca kalan son saklı
+        komşuya kadar kesindir; kesin kısım k'nın altına düşen satırlar baştan hesaplanır.
+        İlk k komşu her satır için fit ile baştan hesaplananla aynıdır.
+
+        Parametreler:
+        matrix: Tüm satırları içeren güncel matris
+        changed_rows: Vektörü değişen mevcut satırların konumları
+        """
+        n_old = self.normalized.shape[0]
+        n_rows = matrix.shape[0]
+        changed = np.unique(np.asarray(changed_rows, dtype=np.int64))
+        if n_rows == n_old and len(changed) == 0:
+            return self
+
+        if len(changed):
+            normalized = normalize(matrix)
+        else:
+            new_normalized = normalize(matrix[n_old:])
+            if sp.issparse(self.normalized):
+                normalized = sp.vstack([self.normalized, new_normalized], format='csr')
+            else:
+                normalized = np.vstack([self.normalized,
+                                        new_normalized.astype(self.normalized.dtype)])
+        affected = np.concatenate([changed, np.arange(n_old, n_rows)])
+        k = min(self.n_neighbors, n_rows)
+        width = self._width(n_rows)
+
+        indices = np.full((n_rows, width), -1, dtype=np.int32)
+        scores = np.zeros((n_rows, width), dtype=normalized.dtype)
+        counts = np.zeros(n_rows, dtype=np.int32)
+        truncated = np.zeros(n_rows, dtype=bool)
+        recompute = []
+
+        # Diğer satırlar: değişmeyen saklı komşular + değişen/yeni satırlar arasından en iyi
+        # width; sıralama skora göre azalan, eşitlikte küçük konum önce
+        unaffected = np.setdiff1d(np.arange(n_old), changed)
+        old_width = self.indices.shape[1]
+        step = self._block_rows(old_width + len(affected))
+        for start in range(0, len(unaffected), step):
+            part = unaffected[start:start + step]
+            stored_indices = np.asarray(self.indices[part], dtype=np.int64)
+            kept = (stored_indices >= 0) & ~np.isin(stored_indices, changed)
+            remaining = kept.sum(axis=1)
+            block = row_similarities(normalized, part, affected)
+
+            candidates = np.hstack([np.where(kept, stored_indices, -1),
+                                    np.broadcast_to(affected, block.shape)])
+            candidate_scores = np.hstack([
+                np.where(kept, self.scores[part], -np.inf),
+                np.where(block >= self.threshold, block, -np.inf)])
+            order = np.lexsort((candidates, -candidate_scores), axis=1)[:, :width]
+            selected = np.take_along_axis(candidates, order, axis=1)
+            selected_scores = np.take_along_axis(candidate_scores, order, axis=1)
+            valid = selected_scores > -np.inf
+            selected_counts = valid.sum(axis=1)
+
+            # Dolu listelerde kesin kısım son saklı komşuda biter; saklı komşuların bir kısmı
+            # width dışında kaldıysa seçilen listenin tamamı kesindir
+            from_stored = valid & (order < old_width)
+            last_stored = width - np.argmax(from_stored[:, ::-1], axis=1)
+            exact = np.where(remaining == 0, 0, last_stored)
+            exact = np.where(self.truncated[part] & (from_stored.sum(axis=1) == remaining),
+                             exact, selected_counts)
+            part_counts = np.minimum(selected_counts, exact)
+            part_truncated = self.truncated[part] | (selected_counts == width)
+
+            keep = np.arange(width) < part_counts[:, None]
+            indices[part] = np.where(keep, selected, -1)
+            scores[part] = np.where(keep, selected_scores, 0)
+            counts[part] = part_counts
+            truncated[part] = part_truncated
+            recompute.append(part[part_truncated & (part_counts < k)])
+
+        self.normalized = normalized
+        rows = np.union1d(affected, np.concatenate(recompute)) if recompute else affected
+        profiler.count('neighbors.refreshed_rows', len(rows))
+        self._fit_rows(rows, indices, scores, counts, truncated)
+
+        self.indices = indices
+        self.scores = scores
+        self.counts = counts
+        self.truncated = truncated
+        return self
+
+
+    def get_state(self):
+        """Kaydedilebilir durum (bkz. common.persistence)"""
+        return {
+            'backend': self.backend,
+            'n_neighbors': self.n_neighbors,
+            'threshold': self.threshold,
+            'block_size': self.block_size,
+            'slack': self.slack,
+            'normalized': self.normalized,
+            'indices': self.indices,
+            'scores': self.scores,
+            'counts': self.counts,
+            'truncated': self.truncated
+        }
+
+
+    @classmethod
+    def from_state(cls, state):
+        index = cls(state['n_neighbors'], state['threshold'], state['block_size'],
+                    state.get('slack', 0))
+        index.normalized = state['normalized']
+        index.indices = state['indices']
+        index.scores = state['scores']
+        index.counts = state['counts']
+        index.truncated = state.get('truncated', index.counts == index.indices.shape[1])
+        return index
+
+
+    def _stored(self, rows, n):
+        # Saklı listeler ilk count komşu için kesindir; kesilmemiş listeler eksiksizdir
+        return (~self.truncated[rows]) | (self.counts[rows] >= n)
+
+
+    def neighbors(self, row, n):
+        """
+        Bir satırın en benzer n komşusunu (konumlar, skorlar) olarak döndürür.
+        Saklı liste n komşu için yetmiyorsa satır tam olarak yeniden hesaplanır.
+        """
+        profiler.count('neighbors.queries')
+        count = self.counts[row]
+        if self._stored(row, n):
+            n = min(n, count)
+            return self.indices[row, :n], self.scores[row, :n]
+
+        indices, scores, counts = self.neighbors_batch([row], n)
+        return indices[0, :counts[0]], scores[0, :counts[0]]
+
+
+    def neighbors_batch(self, rows, n):
+        """
+        Birden çok satırın en benzer n komşusunu birlikte döndürür.
+
+        Dönüş:
+        (indices, scores, counts): (b, n) boyutlu konumlar (-1 ile doldurulmuş),
+        skorlar ve her satırdaki geçerli komşu sayısı.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        profiler.count('neighbors.queries', len(rows))
+        if n <= self.indices.shape[1] and self._stored(rows, n).all():
+            counts = np.minimum(self.counts[rows], n)
+            return self.indices[rows, :n], self.scores[rows, :n], counts
+
+        # Saklanan liste yetmiyorsa satır dilimleri üzerinden tam hesapla
+        width = min(n, self.normalized.shape[0])
+        indices = np.full((len(rows), width), -1, dtype=np.int64)
+        scores = np.zeros((len(rows), width), dtype=self.scores.dtype)
+        counts = np.zeros(len(rows), dtype=np.int32)
+
+        step = self._block_rows(self.normalized.shape[0])
+        for start in range(0, len(rows), step):
+            chunk = rows[start:start + step]
+            block = row_similarities(self.normalized, chunk)
+            block_indices, block_scores, block_counts = select_top_k(
+                block, n, chunk, self.threshold)
+            stop = start + len(chunk)
+            indices[start:stop] = block_indices
+            scores[start:stop] = block_scores
+            counts[start:stop] = block_counts
+
+        return indices, scores, counts
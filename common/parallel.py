@@ -0,0 +1,18 @@
+# parallel.py
+
+import multiprocessing
+
+
+def fork_context():
+    """
+    Alt süreçleri fork ile başlatan çoklu işlem bağlamı; fork desteklenmiyorsa None.
+
+    Süreç havuzlarının initializer argümanları (eğitilmiş modeller) fork ile alt süreçlere
+    kopyalanmadan, yazıldığında kopyalanan bellek sayfaları olarak aktarılır. spawn ve
+    forkserver yöntemlerinde (macOS ve Windows'ta varsayılan; Linux'ta Python 3.14'ten
+    itibaren forkserver) bu argümanlar her alt sürece pickle ile kopyalanırdı. Bu
+    durumda çağıranlar işi seri olarak yapar.
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context('fork')
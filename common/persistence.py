@@ -0,0 +1,116 @@
+# persistence.py
+
+import hashlib
+import json
+import os
+import uuid
+import joblib
+import numpy as np
+from common.profiling import profiler
+
+
+# Kaydedilen model formatı değiştiğinde artırılır (eski dosyalar geçersiz olur)
+ARTIFACT_VERSION = 6
+
+DEFAULT_ARTIFACT_DIR = './artifacts'
+
+# Sonucu değiştirmeyen, yalnızca çalışma biçimini etkileyen parametreler (özete katılmaz)
+RUNTIME_OPTIONS = {'customer_index', 'features', 'catalog', 'interactions', 'n_jobs'}
+
+# Kayıttan yüklerken de modele aktarılan paylaşılan nesneler
+SHARED_OPTIONS = ('customer_index', 'features', 'catalog', 'interactions')
+
+
+def new_model_version():
+    """
+    Eğitilen ya da yüklenen her model örneği için benzersiz bir sürüm kimliği üretir.
+    Önbellekler bu kimlik değiştiğinde eski sonuçları geçersiz sayar.
+    """
+    return uuid.uuid4().hex
+
+
+def dataset_fingerprint(data_path, config=None, chunk_size=1 << 20):
+    """
+    Veri dosyasının içeriği ve model yapılandırmasından kısa bir özet (hash) üretir.
+    Veri veya yapılandırma değiştiğinde özet de değişir.
+    """
+    digest = hashlib.sha256()
+    with open(data_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+
+    config = dict(config or {}, artifact_version=ARTIFACT_VERSION)
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def save_state(state, path):
+    """
+    Model durumunu sıkıştırmadan kaydeder; NumPy dizileri daha sonra
+    bellek eşlemeli (memory-mapped) olarak açılabilir.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Yarım kalmış dosya bırakmamak için önce geçici dosyaya yaz
+    tmp_path = f"{path}.tmp"
+    joblib.dump(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_state(path, mmap_mode='r'):
+    """Kaydedilmiş model durumunu diziler bellek eşlemeli olacak şekilde yükler"""
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+def _model_config(params):
+    """Model yapılandırmasından çalışma zamanı seçeneklerini ayıklar"""
+    config = {}
+    for name, value in params.items():
+        if name in RUNTIME_OPTIONS:
+            continue
+        if isinstance(value, dict):
+            value = _model_config(value)
+        elif isinstance(value, np.ndarray):
+            # Diziler (ör. IVF listeleri için küme etiketleri) içerik özetiyle temsil edilir
+            value = hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()
+        config[name] = value
+    return config
+
+
+def artifact_path(artifact_dir, recommender_cls, fingerprint):
+    return os.path.join(artifact_dir, f"{recommender_cls.__name__}-{fingerprint}.joblib")
+
+
+def load_or_fit(recommender_cls, user_df, item_df, data_path,
+                artifact_dir=DEFAULT_ARTIFACT_DIR, refit=False, **params):
+    """
+    Veri ve yapılandırma için kaydedilmiş model varsa yükler, yoksa modeli
+    eğitip kaydeder.
+
+    Parametreler:
+    recommender_cls: save/load destekleyen öneri sınıfı
+    data_path: Özet hesaplanacak veri dosyası
+    refit: True ise kayıt olsa bile yeniden eğitir
+    params: Öneri sınıfının yapılandırma parametreleri
+    """
+    config = dict(_model_config(params), model=recommender_cls.__name__)
+
+    # Seyrek/yoğun kodlama kaydedilen matrislerin biçimini değiştirir
+    config['sparse_features'] = getattr(params.get('features'), 'sparse', False)
+    path = artifact_path(artifact_dir, recommender_cls,
+                         dataset_fingerprint(data_path, config))
+
+    if not refit and os.path.exists(path):
+        print(f"Kaydedilmiş model yükleniyor: {path}")
+        shared = {name: params[name] for name in SHARED_OPTIONS if name in params}
+        with profiler.span('model.load'):
+            return recommender_cls.load(path, user_df, item_df, **shared)
+
+    with profiler.span('model.fit'):
+        recommender = recommender_cls(user_df, item_df, **params)
+    with profiler.span('model.save'):
+        recommender.save(path)
+    print(f"Model eğitildi ve kaydedildi: {path}")
+    return recommender
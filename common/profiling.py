@@ -0,0 +1,164 @@
+# profiling.py
+
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+
+# Devre dışıyken tüm span çağrılarının döndürdüğü tek, yeniden kullanılabilir bağlam
+_NULL_SPAN = nullcontext()
+
+
+class Profiler:
+    """
+    Adlandırılmış süre aralıkları (span) ve sayaçlar toplayan hafif ölçüm katmanı.
+
+    İç içe açılan span'ler 'dış/iç' biçiminde yol adlarıyla kaydedilir; böylece bir
+    aşamanın süresi alt aşamalarına ayrılabilir. Devre dışıyken span() paylaşılan boş
+    bir bağlam döndürür ve count() hemen döner; sıcak yoldaki maliyet tek bir bayrak
+    kontrolüdür.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+
+    def reset(self):
+        """Toplanan tüm ölçümleri siler"""
+        with self._lock:
+            self._spans = {}
+            self._counters = {}
+            self._started = time.perf_counter()
+
+
+    def enable(self):
+        self.reset()
+        self.enabled = True
+
+
+    def disable(self):
+        self.enabled = False
+
+
+    def span(self, name):
+        """
+        Bir aşamanın süresini ölçen bağlam yöneticisi.
+
+        Kullanım:
+        with profiler.span('data.load'):
+            ...
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._timed_span(name)
+
+
+    @contextmanager
+    def _timed_span(self, name):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(name)
+        path = '/'.join(stack)
+        
+        # Kayıt başlangıçta açılır; böylece rapor sırası ilk çalışma sırasını izler
+        with self._lock:
+            entry = self._spans.get(path)
+            if entry is None:
+                entry = self._spans[path] = {'calls': 0, 'total_s': 0.0, 'max_s': 0.0}
+        
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            with self._lock:
+                entry['calls'] += 1
+                entry['total_s'] += elapsed
+                entry['max_s'] = max(entry['max_s'], elapsed)
+
+
+    def timed(self, name):
+        """Fonksiyonun her çağrısını adlandırılmış span olarak ölçen dekoratör"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self._timed_span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+    def count(self, name, value=1):
+        """Adlandırılmış sayacı artırır (ör. skorlanan ürün sayısı)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+
+    def report(self):
+        """
+        Dönüş:
+        dict: wall_s (ölçümün başlangıcından beri geçen süre), spans (yol -> calls,
+              total_s, mean_ms, max_ms; ilk çalışma sırasıyla) ve counters
+        """
+        with self._lock:
+            spans = {path: dict(entry) for path, entry in self._spans.items()}
+            counters = dict(self._counters)
+            wall = time.perf_counter() - self._started
+
+        return {
+            'wall_s': wall,
+            'spans': {
+                path: {
+                    'calls': entry['calls'],
+                    'total_s': entry['total_s'],
+                    'mean_ms': entry['total_s'] / max(entry['calls'], 1) * 1000,
+                    'max_ms': entry['max_s'] * 1000
+                }
+                for path, entry in spans.items()
+            },
+            'counters': counters
+        }
+
+
+    def format_report(self):
+        """Aşama dökümünü girintili metin tablosu olarak döndürür"""
+        report = self.report()
+        wall = report['wall_s']
+        lines = [f"\n{'Aşama':<48} {'Çağrı':>7} {'Toplam (s)':>11} {'Ort. (ms)':>10} {'Pay':>6}",
+                 "-" * 86]
+
+        # Alt aşamalar, ebeveynlerinin hemen altında ilk çalışma sırasıyla gösterilir
+        order = {path: i for i, path in enumerate(report['spans'])}
+        
+        def tree_key(path):
+            parts = path.split('/')
+            return [order['/'.join(parts[:depth + 1])] for depth in range(len(parts))]
+        
+        for path in sorted(report['spans'], key=tree_key):
+            entry = report['spans'][path]
+            depth = path.count('/')
+            label = '  ' * depth + path.rsplit('/', 1)[-1]
+            share = entry['total_s'] / wall if wall else 0.0
+            lines.append(f"{label:<48} {entry['calls']:>7} {entry['total_s']:>11.3f} "
+                         f"{entry['mean_ms']:>10.2f} {share:>6.1%}")
+        lines.append(f"{'Toplam süre':<48} {'':>7} {wall:>11.3f}")
+
+        if report['counters']:
+            lines.append("\nSayaçlar:")
+            for name, value in report['counters'].items():
+                lines.append(f"  - {name}: {value:,}")
+        return "\n".join(lines)
+
+
+# Uygulama genelinde paylaşılan ölçüm nesnesi (varsayılan olarak kapalı)
+profiler = Profiler()
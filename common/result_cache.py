@@ -0,0 +1,116 @@
+# result_cache.py
+
+import threading
+from collections import OrderedDict
+
+
+# Önbellekte tutulacak en fazla (mod, kullanıcı) sonucu
+DEFAULT_CACHE_SIZE = 10000
+
+
+class ResultCache:
+    """
+    Öneri modellerinin önünde duran, boyutu sınırlı LRU sonuç önbelleği.
+
+    Her (mod, kullanıcı) için en uzun istenen öneri listesi saklanır. Sıralama
+    kararlı olduğundan daha küçük n için gelen istekler saklanan listenin başından
+    kesilerek yanıtlanır. Model yeniden eğitildiğinde ya da yüklendiğinde
+    (model_version değiştiğinde) ilgili kayıtlar geçersiz sayılır.
+
+    Parametreler:
+    recommenders: Mod adı -> recommend_batch destekleyen öneri modeli
+    max_entries: Önbellekte tutulacak en fazla kayıt sayısı
+    compute: Önbellekte olmayan sonuçları hesaplayan (mod, kullanıcı, n) fonksiyonu;
+        verilmezse modelin recommend_batch yöntemi kullanılır (bkz. MicroBatcher)
+    """
+
+    def __init__(self, recommenders, max_entries=DEFAULT_CACHE_SIZE, compute=None):
+        self.recommenders = recommenders
+        self.max_entries = max_entries
+        self.compute = compute
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+
+    def _lookup(self, key, model_version, n_recommendations):
+        """Önbellekten yanıtlanabiliyorsa sonucu, yoksa None döndürür"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != model_version:
+                # Model değişmiş; eski sonuç kullanılamaz
+                del self._entries[key]
+                self.invalidations += 1
+                entry = None
+
+            if entry is not None:
+                _, cached_n, recommendations = entry
+                # Saklanan liste n'den kısaysa eşik nedeniyle tamdır; daha büyük n için de geçerlidir
+                if n_recommendations <= cached_n or len(recommendations) < cached_n:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return recommendations.head(n_recommendations)
+
+            self.misses += 1
+            return None
+
+
+    def _store(self, key, model_version, n_recommendations, recommendations):
+        with self._lock:
+            entry = self._entries.get(key)
+            # Aynı model için daha uzun bir liste zaten saklanıyorsa onu koru
+            if entry is not None and entry[0] == model_version and entry[1] >= n_recommendations:
+                self._entries.move_to_end(key)
+                return
+
+            self._entries[key] = (model_version, n_recommendations, recommendations)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+    def get_recommendations(self, mode, user_id, n_recommendations):
+        """
+        Kullanıcının önerilerini önbellekten ya da modelden döndürür.
+
+        Dönüş:
+        RecommendationResult: recommend_batch([user_id], n) ile aynı öneriler
+        """
+        recommender = self.recommenders[mode]
+        key = (mode, user_id)
+        model_version = recommender.model_version
+
+        recommendations = self._lookup(key, model_version, n_recommendations)
+        if recommendations is not None:
+            return recommendations
+
+        # Hesaplama kilit dışında yapılır; eşzamanlı istekler birbirini beklemez
+        if self.compute is not None:
+            recommendations = self.compute(mode, user_id, n_recommendations)
+        else:
+            recommendations = recommender.recommend_batch([user_id], n_recommendations)
+        self._store(key, model_version, n_recommendations, recommendations)
+        return recommendations
+
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else None
+            }
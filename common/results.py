@@ -0,0 +1,258 @@
+# results.py
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+# Öneri satırındaki ürün sütunları: (gösterilen ad, item_df sütunu)
+ITEM_COLUMNS = (
+    ('Item Purchased', 'Item Purchased'),
+    ('Category', 'Category'),
+    ('Color', 'Color'),
+    ('Season', 'Season'),
+    ('Purchase Amount', 'Purchase Amount (USD)')
+)
+
+# Ürünü alan (ya da benzer) kullanıcının sütunları: (gösterilen ad, user_df sütunu)
+USER_COLUMNS = (
+    ('User_Age', 'Age'),
+    ('User_Gender', 'Gender'),
+    ('User_Location', 'Location'),
+    ('User_Size', 'Size'),
+    ('User_Previous_Purchases', 'Previous Purchases'),
+    ('User_Frequency', 'Frequency of Purchases')
+)
+
+# Sonuç düzenleri: (gösterilen ad, kaynak, sütun). Kaynak 'item' ise item_df'den ürün
+# satırında, 'user' ise user_df'den kullanıcı satırında, 'score' ise skor dizisinden,
+# 'extra' ise sonuçla birlikte verilen satır başına diziden okunur.
+COLLABORATIVE_LAYOUT = (
+    *((name, 'item', col) for name, col in ITEM_COLUMNS),
+    ('Similarity', 'score', None),
+    *((name, 'user', col) for name, col in USER_COLUMNS)
+)
+
+# Kullanıcı bazlı modelde 'Similarity' ürünü alan en benzer komşunun benzerliğidir;
+# sıralamada kullanılan skor (ürünü alan komşuların benzerlik toplamı) ayrı sütundadır
+USER_BASED_LAYOUT = (
+    *((name, 'item', col) for name, col in ITEM_COLUMNS),
+    ('Similarity', 'score', None),
+    ('Neighbor_Score', 'extra', None),
+    *((name, 'user', col) for name, col in USER_COLUMNS)
+)
+
+CLUSTER_LAYOUT = (
+    *((name, 'item', col) for name, col in ITEM_COLUMNS),
+    ('Similarity', 'score', None),
+    ('User_Cluster', 'extra', None),
+    ('Item_Cluster', 'extra', None),
+    *((name, 'user', col) for name, col in USER_COLUMNS),
+    ('User_Subscription', 'user', 'Subscription Status')
+)
+
+
+@lru_cache(maxsize=None)
+def _layout_sources(layout):
+    return {name: (source, col) for name, source, col in layout}
+
+
+def _take(series, rows):
+    """Sütunun verilen satırlardaki değerleri (categorical sütunlar kodlar üzerinden)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.categories.to_numpy()[series.cat.codes.to_numpy()[rows]]
+    return series.to_numpy()[rows]
+
+
+class RecommendationResult:
+    """
+    Satır konumları ve skor dizileriyle tutulan kompakt öneri sonucu.
+
+    Ürün ve kullanıcı özellikleri sonuç oluşturulurken kopyalanmaz; yalnızca
+    istendiğinde (biçimlendirme, JSON ya da DataFrame dönüşümü) veri setinden okunur.
+    Satırlar kullanıcı sırasıyla, her kullanıcı içinde sıra (Rank) sırasıyladır.
+
+    Parametreler:
+    item_df, user_df: Modelin veri setleri (satır konumları bunlara göredir)
+    user_ids: Her satırın hedef kullanıcısı
+    ranks: Her satırın kullanıcı içindeki sırası (1'den başlar)
+    item_rows: Önerilen ürünlerin item_df satır konumları
+    user_rows: Özellikleri gösterilecek kullanıcıların user_df satır konumları
+    scores: Benzerlik skorları
+    layout: Gösterilecek sütunlar (bkz. COLLABORATIVE_LAYOUT, USER_BASED_LAYOUT, CLUSTER_LAYOUT)
+    extras: 'extra' kaynaklı sütunlar için ad -> satır başına dizi
+    """
+
+    __slots__ = ('item_df', 'user_df', 'user_ids', 'ranks', 'item_rows', 'user_rows',
+                 'scores', 'layout', 'extras', '_sources')
+
+    def __init__(self, item_df, user_df, user_ids, ranks, item_rows, user_rows, scores,
+                 layout=COLLABORATIVE_LAYOUT, extras=None):
+        self.item_df = item_df
+        self.user_df = user_df
+        self.user_ids = np.asarray(user_ids)
+        self.ranks = np.asarray(ranks)
+        self.item_rows = np.asarray(item_rows, dtype=np.int64)
+        self.user_rows = np.asarray(user_rows, dtype=np.int64)
+        self.scores = np.asarray(scores)
+        self.layout = layout
+        self.extras = extras or {}
+        self._sources = _layout_sources(layout)
+
+
+    @classmethod
+    def single(cls, item_df, user_df, user_id, item_rows, user_rows, scores,
+               layout=COLLABORATIVE_LAYOUT, extras=None):
+        """Tek kullanıcının sıralı önerilerinden sonuç oluşturur"""
+        n_rows = len(item_rows)
+        return cls(item_df, user_df, np.full(n_rows, user_id), np.arange(1, n_rows + 1),
+                   item_rows, user_rows, scores, layout, extras)
+
+
+    @classmethod
+    def empty_for(cls, item_df, user_df, layout=COLLABORATIVE_LAYOUT):
+        """Öneri içermeyen sonuç"""
+        rows = np.array([], dtype=np.int64)
+        extras = {name: rows for name, source, _ in layout if source == 'extra'}
+        return cls(item_df, user_df, rows, rows, rows, rows, np.array([]), layout, extras)
+
+
+    def __len__(self):
+        return len(self.item_rows)
+
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+
+    @property
+    def columns(self):
+        return [name for name, _, _ in self.layout]
+
+
+    def column(self, name):
+        """Bir sütunun tüm satırlardaki değerleri (vektörel olarak çözülür)"""
+        source, col = self._sources[name]
+        if source == 'item':
+            return _take(self.item_df[col], self.item_rows)
+        if source == 'user':
+            return _take(self.user_df[col], self.user_rows)
+        if source == 'score':
+            return self.scores
+        return self.extras[name]
+
+
+    def value(self, index, name):
+        """Tek bir satırın tek bir sütun değeri"""
+        source, col = self._sources[name]
+        if source == 'item':
+            return self.item_df[col].iat[self.item_rows[index]]
+        if source == 'user':
+            return self.user_df[col].iat[self.user_rows[index]]
+        if source == 'score':
+            return self.scores[index]
+        return self.extras[name][index]
+
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return RecommendationRecord(self, index)
+
+
+    def __iter__(self):
+        return (RecommendationRecord(self, index) for index in range(len(self)))
+
+
+    def take(self, rows):
+        """Verilen satırlardan (dilim, konum dizisi ya da maske) yeni sonuç oluşturur"""
+        return RecommendationResult(
+            self.item_df, self.user_df, self.user_ids[rows], self.ranks[rows],
+            self.item_rows[rows], self.user_rows[rows], self.scores[rows], self.layout,
+            {name: values[rows] for name, values in self.extras.items()})
+
+
+    def head(self, n_recommendations):
+        """Her kullanıcının ilk n önerisi (sıralama kararlı olduğundan önek geçerli bir sonuçtur)"""
+        if len(self) and self.ranks.max() <= n_recommendations:
+            return self
+        return self.take(self.ranks <= n_recommendations)
+
+
+    def to_frame(self, include_query=True):
+        """
+        Sonucu DataFrame'e dönüştürür.
+
+        Parametreler:
+        include_query: True ise baştaki 'User ID' ve 'Rank' sütunları eklenir
+        """
+        data = {}
+        if include_query:
+            data['User ID'] = self.user_ids
+            data['Rank'] = self.ranks
+        for name in self.columns:
+            data[name] = self.column(name)
+        return pd.DataFrame(data)
+
+
+    def to_records(self):
+        """'Rank' ve gösterilen sütunlarla, JSON'a dönüştürülebilir (yerleşik tipli) sözlük listesi"""
+        names = ['Rank', *self.columns]
+        values = [self.ranks.tolist(), *(self.column(name).tolist() for name in self.columns)]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+
+class RecommendationRecord:
+    """
+    Bir öneri satırının görünümü. Değerler sözlük gibi sütun adıyla okunur ve ancak
+    erişildiğinde veri setinden çözülür.
+    """
+
+    __slots__ = ('result', 'index')
+
+    def __init__(self, result, index):
+        self.result = result
+        self.index = index
+
+
+    @property
+    def user_id(self):
+        return self.result.user_ids[self.index]
+
+
+    @property
+    def rank(self):
+        return int(self.result.ranks[self.index])
+
+
+    @property
+    def score(self):
+        return self.result.scores[self.index]
+
+
+    def __getitem__(self, name):
+        return self.result.value(self.index, name)
+
+
+    def __contains__(self, name):
+        return name in self.result._sources
+
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+
+    def keys(self):
+        return self.result.columns
+
+
+    def to_dict(self):
+        return {name: self[name] for name in self.result.columns}
+
+
+    def __repr__(self):
+        return f"RecommendationRecord({self.to_dict()!r})"
@@ -0,0 +1,200 @@
+# server.py
+
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from common.batching import DEFAULT_MAX_BATCH, DEFAULT_MAX_WAIT, MicroBatcher
+from common.customer_index import CustomerNotFoundError
+from common.result_cache import DEFAULT_CACHE_SIZE, ResultCache
+
+
+# Gecikme yüzdelikleri her mod için son bu kadar istek üzerinden hesaplanır
+LATENCY_WINDOW = 10000
+
+# Tek istekte döndürülebilecek en fazla öneri sayısı
+MAX_RECOMMENDATIONS = 100
+
+
+class LatencyStats:
+    """Mod başına istek sayılarını ve gecikme dağılımını iş parçacığı güvenli tutar"""
+
+    def __init__(self, modes, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._counts = {mode: 0 for mode in modes}
+        self._errors = {mode: 0 for mode in modes}
+        self._latencies = {mode: deque(maxlen=window) for mode in modes}
+
+
+    def record(self, mode, seconds, ok=True):
+        with self._lock:
+            self._counts[mode] += 1
+            if not ok:
+                self._errors[mode] += 1
+            self._latencies[mode].append(seconds)
+
+
+    def snapshot(self):
+        """
+        Dönüş:
+        dict: Mod -> istek sayısı, hata sayısı ve milisaniye cinsinden p50/p99 gecikme
+        """
+        with self._lock:
+            latencies = {mode: np.array(values) for mode, values in self._latencies.items()}
+            counts = dict(self._counts)
+            errors = dict(self._errors)
+
+        stats = {}
+        for mode, values in latencies.items():
+            stats[mode] = {
+                'requests': counts[mode],
+                'errors': errors[mode],
+                'p50_ms': float(np.percentile(values, 50) * 1000) if len(values) else None,
+                'p99_ms': float(np.percentile(values, 99) * 1000) if len(values) else None
+            }
+        return stats
+
+
+class RecommendationService:
+    """
+    Eğitilmiş (ya da yüklenmiş) öneri modellerini bellekte tutarak istekleri yanıtlar.
+
+    Parametreler:
+    recommenders: Mod adı ('user', 'item', 'cluster') -> öneri modeli
+    customer_index: Modellerin paylaştığı müşteri indeksi
+    cache_size: Sonuç önbelleğinin kayıt sınırı (0 ise önbellek kullanılmaz)
+    max_wait: Eşzamanlı isteklerin toplu hesaplama için bekleyeceği en uzun süre (saniye)
+    max_batch: Tek toplu hesaplamadaki en fazla istek sayısı (1 ise istekler tek tek hesaplanır)
+    """
+
+    def __init__(self, recommenders, customer_index, max_recommendations=MAX_RECOMMENDATIONS,
+                 cache_size=DEFAULT_CACHE_SIZE, max_wait=DEFAULT_MAX_WAIT,
+                 max_batch=DEFAULT_MAX_BATCH):
+        self.recommenders = dict(recommenders)
+        self.customer_index = customer_index
+        self.max_recommendations = max_recommendations
+        self.stats = LatencyStats(self.recommenders)
+        self.batcher = MicroBatcher(self.recommenders, max_wait, max_batch) if max_batch > 1 else None
+        self.cache = ResultCache(self.recommenders, cache_size, self._compute) if cache_size else None
+
+
+    def _compute(self, mode, user_id, n_recommendations):
+        """Önbellekte olmayan sonucu (varsa) zamanlayıcı üzerinden hesaplar"""
+        if self.batcher is not None:
+            return self.batcher.recommend(mode, user_id, n_recommendations)
+        return self.recommenders[mode].recommend_batch([user_id], n_recommendations)
+
+
+    def recommend(self, user_id, mode, n_recommendations):
+        """
+        Tek bir kullanıcı için önerileri JSON'a dönüştürülebilir sözlük olarak döndürür.
+        Geçersiz parametrelerde ValueError, bilinmeyen kullanıcıda CustomerNotFoundError fırlatır.
+        """
+        if mode not in self.recommenders:
+            raise ValueError(f"Geçersiz mod: {mode}")
+        if not 1 <= n_recommendations <= self.max_recommendations:
+            raise ValueError(f"Öneri sayısı 1 ile {self.max_recommendations} arasında olmalıdır")
+
+        start = time.perf_counter()
+        ok = False
+        try:
+            self.customer_index.position(user_id)
+            if self.cache is not None:
+                recommendations = self.cache.get_recommendations(mode, user_id, n_recommendations)
+            else:
+                recommendations = self._compute(mode, user_id, n_recommendations)
+            ok = True
+        finally:
+            self.stats.record(mode, time.perf_counter() - start, ok)
+
+        return {
+            'user_id': user_id,
+            'mode': mode,
+            'n': n_recommendations,
+            'recommendations': recommendations.to_records()
+        }
+
+
+    def snapshot(self):
+        """Mod başına istek istatistikleri, (varsa) önbellek ve toplu hesaplama sayaçları"""
+        snapshot = self.stats.snapshot()
+        if self.cache is not None:
+            snapshot['cache'] = self.cache.stats()
+        if self.batcher is not None:
+            snapshot['batching'] = self.batcher.stats()
+        return snapshot
+
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+
+
+def _json_default(value):
+    # NumPy skalerlerini yerleşik Python tiplerine çevir
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"JSON'a dönüştürülemeyen tip: {type(value).__name__}")
+
+
+class RecommendationRequestHandler(BaseHTTPRequestHandler):
+    """/recommend ve /stats uç noktalarını sunan HTTP işleyicisi"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        if url.path == '/recommend':
+            self._recommend(query)
+        elif url.path == '/stats':
+            self._send_json(200, self.server.service.snapshot())
+        else:
+            self._send_json(404, {'error': f"Bilinmeyen adres: {url.path}"})
+
+
+    def _recommend(self, query):
+        try:
+            user_id = int(query['user_id'])
+            n_recommendations = int(query.get('n', 5))
+            mode = query.get('mode', 'user')
+        except (KeyError, ValueError):
+            self._send_json(400, {'error': "user_id (tam sayı) ve n (tam sayı) parametreleri gereklidir"})
+            return
+
+        try:
+            result = self.server.service.recommend(user_id, mode, n_recommendations)
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+        except CustomerNotFoundError as e:
+            self._send_json(404, {'error': str(e)})
+        except Exception as e:
+            self._send_json(500, {'error': f"Öneri hatası: {str(e)}"})
+        else:
+            self._send_json(200, result)
+
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, default=_json_default, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args):
+        # İstek bazında günlük tutmak önündeki ağ geçidine bırakılır
+        pass
+
+
+def make_server(service, host='127.0.0.1', port=8000):
+    """Her isteği ayrı iş parçacığında yanıtlayan HTTP sunucusunu oluşturur"""
+    server = ThreadingHTTPServer((host, port), RecommendationRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
@@ -1,5 +1,8 @@
 # utils.py - düzeltilmiş versiyon
 
+from common.profiling import profiler
+
+
 class RecommendationFormatter:
     """Öneri sistemlerinin çıktılarını formatlayan sınıf"""
     
@@ -22,6 +25,8 @@ class RecommendationFormatter:
         # Sadece user-based ve item-based modeller için benzerlik skorunu göster
         if 'Similarity' in item_data and similarity_score is not None:
             output.append(f"  - Benzerlik Skoru: {similarity_score:.4f}")
+        if item_data.get('Neighbor_Score') is not None:
+            output.append(f"  - Komşu Skoru: {item_data.get('Neighbor_Score'):.4f}")
             
         if item_data.get('User_Cluster') is not None:
             output.extend([
@@ -76,15 +81,26 @@ class RecommendationFormatter:
 
 
     @classmethod
-    def format_recommendations(cls, recommendations_df, include_user_info=False, mode=''):
-        """Tüm önerileri formatlar"""
+    @profiler.timed('format')
+    def format_recommendations(cls, recommendations, include_user_info=False, mode=''):
+        """
+        Tüm önerileri formatlar.
+        
+        Parametreler:
+        recommendations: RecommendationResult (kayıtlar sözlük gibi okunur) ya da DataFrame
+        """
         
         mode_str = f"{mode.upper()} BAZLI " if mode else ""
         output = [f"\n{'='*50}\n{mode_str}ÖNERİLER:"]
         
-        for idx, recommendation in recommendations_df.iterrows():
+        if hasattr(recommendations, 'iterrows'):
+            records = ((idx, row.to_dict()) for idx, row in recommendations.iterrows())
+        else:
+            records = enumerate(recommendations)
+        
+        for idx, recommendation in records:
             output.append(cls.format_recommendation(
-                recommendation.to_dict(),
+                recommendation,
                 index=idx,
                 include_user_info=include_user_info
             ))
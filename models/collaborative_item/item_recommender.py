@@ -1,74 +1,235 @@
 # item_recommender.py
 
 import numpy as np
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
-from common.data_preprocessing import encode_features
-from common import MIN_SIMILARITY_THRESHOLD
+from scipy import sparse as sp
+from common.data_preprocessing import DatasetStore, FeatureCache
+from common.catalog import PRODUCT_COLUMNS, ProductCatalog
+from common.interactions import InteractionMatrix, top_k_sparse
+from common.ann import build_neighbor_index, neighbor_index_from_state
+from common.customer_index import CustomerIndex, CustomerNotFoundError
+from common.persistence import save_state, load_state, new_model_version
+from common.profiling import profiler
+from common.results import RecommendationResult
 
 # Ürün bazlı öneri sistemi için:
 # |
 # v
 class ItemBasedRecommender:
 
-    def __init__(self, user_df, item_df):
-        self.user_df = user_df.copy()
-        self.item_df = item_df.copy()
+    def __init__(self, user_df, item_df, n_neighbors=100, customer_index=None, features=None,
+                 neighbor_backend='exact', backend_options=None, catalog=None, interactions=None):
+        self._attach_data(user_df, item_df, customer_index, features, catalog, interactions)
         
-        # Fiyat ve ID kolonlarını çıkar
-        item_features = self.item_df.drop(['Customer ID', 'Purchase Amount (USD)'], axis=1)
+        # Ürün özelliklerini kodla: her alışveriş yerine katalogdaki her benzersiz ürün bir kez
+        self.encoded_items = self.catalog.encode(self.item_features)
         
-        # Ürün özelliklerini kodla
-        self.encoded_items = encode_features(item_features)
-        self.similarity_matrix = cosine_similarity(self.encoded_items)
+        # Tam N×N matris yerine ürün başına en benzer k ürün saklanır ('exact') ya da
+        # komşular yaklaşık indeksle ('ivf', 'lsh') sorgu anında aranır (bkz. common.ann)
+        self.neighbor_index = build_neighbor_index(
+            neighbor_backend, n_neighbors, **(backend_options or {})).fit(self.encoded_items)
 
         
+    def _attach_data(self, user_df, item_df, customer_index=None, features=None, catalog=None,
+                     interactions=None):
+        # Veri seti kopyalanmaz: paylaşılan deponun salt okunur görünümleri kullanılır
+        # (görünüm olmayan DataFrame'ler için iki taraf tek bir depoya bir kez kopyalanır)
+        self.dataset = DatasetStore.of(user_df, item_df)
+        self.user_df = self.dataset.view(user_df.columns)
+        self.item_df = self.dataset.view(item_df.columns)
+        
+        # Müşteri ID -> satır konumu indeksi (verilmezse bu veri seti için oluşturulur)
+        if customer_index is None:
+            customer_index = CustomerIndex.from_frame(self.item_df)
+        self.customer_index = customer_index
+        
+        # Veri seti için paylaşılan kodlanmış özellikler
+        self.features = features if features is not None else FeatureCache()
+        
+        # Alışverişlerden indirgenmiş benzersiz ürünler (verilmezse bu veri seti için oluşturulur)
+        if catalog is None:
+            catalog = ProductCatalog.from_frame(self.item_df, self.features.dtype, self.features.sparse)
+        self.catalog = catalog
+        
+        # Müşteri × ürün etkileşim matrisi (verilmezse bu katalogla oluşturulur)
+        if interactions is None:
+            interactions = InteractionMatrix.from_frame(self.item_df, self.catalog)
+        self.interactions = interactions
+        
+        # Her eğitim/yüklemede yenilenir; önbelleğe alınmış sonuçlar buna göre geçersizleşir
+        self.model_version = new_model_version()
+        
+        # Fiyat ve ID kolonları hariç ürün özellikleri (ürünü tanımlayan sütunlar)
+        self.item_features = list(PRODUCT_COLUMNS)
+
+
+    def save(self, path):
+        """Kodlanmış matrisi ve komşu listelerini diske kaydeder"""
+        save_state({
+            'encoded_items': self.encoded_items,
+            'item_encoder': self.catalog.features.encoder(self.item_features),
+            'neighbor_index': self.neighbor_index.get_state()
+        }, path)
+
+
+    @classmethod
+    def load(cls, path, user_df, item_df, customer_index=None, features=None, catalog=None,
+             interactions=None):
+        """Kaydedilmiş modeli yeniden eğitmeden (bellek eşlemeli dizilerle) yükler"""
+        state = load_state(path)
+        recommender = cls.__new__(cls)
+        recommender._attach_data(user_df, item_df, customer_index, features, catalog, interactions)
+        recommender.encoded_items = recommender.catalog.features.register(
+            recommender.item_features, state['item_encoder'], state['encoded_items'])
+        recommender.neighbor_index = neighbor_index_from_state(state['neighbor_index'])
+        return recommender
+
+
+    @profiler.timed('item.update')
+    def update(self, new_rows, customer_index=None, dataset=None, catalog=None, interactions=None):
+        """
+        Yeni satırları (yeni alışverişler/müşteriler) modeli baştan eğitmeden ekler.
+        Katalogda olmayan yeni ürünler eğitilmiş kodlayıcılarla kodlanır ve komşu listelerine
+        eklenir; mevcut ürün çiftleri yeniden hesaplanmaz.
+        
+        Parametreler:
+        new_rows: Veri setiyle aynı sütunlara sahip yeni satırlar
+        customer_index: Güncellenmiş veri seti için paylaşılan indeks (verilmezse oluşturulur)
+        dataset: Yeni satırları içeren paylaşılan veri deposu (verilmezse oluşturulur)
+        catalog: Yeni satırları içeren paylaşılan ürün kataloğu (verilmezse genişletilir)
+        interactions: Yeni satırları içeren paylaşılan etkileşim matrisi (verilmezse oluşturulur)
+        """
+        if dataset is None:
+            dataset = self.dataset.append(new_rows)
+        self.dataset = dataset
+        self.user_df = dataset.view(self.user_df.columns)
+        self.item_df = dataset.view(self.item_df.columns)
+        
+        if customer_index is None:
+            customer_index = CustomerIndex.from_frame(self.item_df)
+        self.customer_index = customer_index
+        
+        if catalog is None:
+            catalog = self.catalog.extend(self.item_df)
+        self.catalog = catalog
+        
+        if interactions is None:
+            interactions = InteractionMatrix.from_frame(self.item_df, self.catalog)
+        self.interactions = interactions
+        
+        self.encoded_items = self.catalog.encode(self.item_features)
+        self.neighbor_index.extend(self.encoded_items)
+        
+        # Önbelleğe alınmış sonuçlar artık geçersiz
+        self.model_version = new_model_version()
+        return self
+
+
+    @profiler.timed('item.recommend')
     def get_recommendations(self, user_id, n_recommendations=3):
+        """
+        Dönüş:
+        (RecommendationResult, dict): Öneriler ve kullanıcının satın aldığı ürün; kullanıcı
+        bulunamazsa ya da eşiği geçen benzer ürün yoksa boş sonuç ve None
+        """
         try:
             # Kullanıcının satın aldığı ürünü bul
-            user_item_idx = self.item_df[self.item_df['Customer ID'] == user_id].index[0]
+            user_item_idx = self.customer_index.position(user_id)
             target_item = self.item_df.iloc[user_item_idx]
             
-            item_similarities = self.similarity_matrix[user_item_idx]
-            
-            # Benzerlik eşiğini uygula (Eklendi)
-            similar_mask = item_similarities >= MIN_SIMILARITY_THRESHOLD
-            item_similarities = item_similarities[similar_mask]
+            # Kullanıcının geçmişindeki ürünlere en benzer ürünler (skora göre sıralı)
+            _, ranks, similar_products, item_similarities = self._score_products(
+                [self.interactions.customer_codes[user_item_idx]], n_recommendations)
             
             # Eğer eşiği geçen ürün yoksa boş döndür
-            if len(item_similarities) == 0:
-                return pd.DataFrame(), None
-            
-            # Benzerlik sırasına göre ürünleri al
-            similar_items_idx = np.argsort(item_similarities)[::-1][1:n_recommendations+1]
-
+            if len(similar_products) == 0:
+                return RecommendationResult.empty_for(self.item_df, self.user_df), None
             
-            # Önerileri hazırla
-            recommendations = []
+            # Her ürün ilk alışverişiyle gösterilir; ürünü alan kullanıcının bilgileri
+            # biçimlendirilirken okunur
+            similar_items_idx = self.catalog.first_rows[similar_products]
+            recommendations = RecommendationResult.single(
+                self.item_df, self.user_df, user_id, similar_items_idx,
+                self._purchasers(similar_items_idx), item_similarities)
             
-            for idx in similar_items_idx:
-                similar_item = self.item_df.iloc[idx]
-                # Ürünü alan kullanıcının bilgilerini al
-                user_info = self.user_df[self.user_df['Customer ID'] == similar_item['Customer ID']].iloc[0]
-                
-                recommendation = {
-                    'Item Purchased': similar_item['Item Purchased'],
-                    'Category': similar_item['Category'],
-                    'Color': similar_item['Color'],
-                    'Season': similar_item['Season'],
-                    'Purchase Amount': similar_item['Purchase Amount (USD)'],
-                    'Similarity': item_similarities[idx],
-                    'User_Age': user_info['Age'],
-                    'User_Gender': user_info['Gender'],
-                    'User_Location': user_info['Location'],
-                    'User_Size': user_info['Size'],
-                    'User_Previous_Purchases': user_info['Previous Purchases'],
-                    'User_Frequency': user_info['Frequency of Purchases']
-                }
-                recommendations.append(recommendation)
+            return recommendations, target_item.to_dict()
             
-            return pd.DataFrame(recommendations), target_item.to_dict()
+        except CustomerNotFoundError as e:
+            print(f"Uyarı: {str(e)}")
+            return RecommendationResult.empty_for(self.item_df, self.user_df), None
             
         except Exception as e:
             print(f"Öneri hatası: {str(e)}")
-            return pd.DataFrame(), None
+            return RecommendationResult.empty_for(self.item_df, self.user_df), None
+
+
+    def _purchasers(self, item_rows):
+        """Ürün satırlarını satın alan müşterilerin user_df konumları"""
+        return self.customer_index.positions(self.item_df['Customer ID'].to_numpy()[item_rows])
+
+
+    def _score_products(self, customers, n_recommendations):
+        """
+        Müşterilerin geçmişlerine en benzer ürünleri skorlar.
+        
+        Skorlar, müşteri geçmişleri (H, satırları 1'e normalize edilmiş etkileşimler) ile
+        geçmişteki ürünlerin komşu listelerinden oluşan seyrek benzerlik matrisinin (S)
+        çarpımıdır: bir ürünün skoru, geçmişteki ürünlere alışveriş sayısıyla ağırlıklı
+        ortalama benzerliğidir. Müşterinin zaten satın aldığı ürünler önerilmez.
+        
+        Dönüş:
+        (queries, ranks, products, scores): Sorgu ve sıra sırasıyla öneriler; queries
+        customers içindeki konumlar, ranks 1'den başlar
+        """
+        history = self.interactions.weights[np.asarray(customers, dtype=np.int64)]
+        history_products = np.unique(history.indices)
+        
+        # Her üründen en az saklanan komşu sayısı kadar liste alınır. n <= n_neighbors için bir
+        # müşterinin skorları ne n'e ne de aynı toplu işteki diğer müşterilere bağlıdır; küçük
+        # n için sonuçlar büyük n sonuçlarının başıdır (önbellek ve toplu hesaplama bunu
+        # kullanır). Daha büyük n için listeler tam yoldan (bkz. neighbors_batch) n genişliğinde
+        # hesaplanır; böylece öneri sayısı komşu sayısıyla sınırlanmaz.
+        neighbor_idx, neighbor_scores, counts = self.neighbor_index.neighbors_batch(
+            history_products, max(n_recommendations, self.neighbor_index.n_neighbors))
+        valid = np.arange(neighbor_idx.shape[1]) < counts[:, None]
+        list_rows, _ = np.nonzero(valid)
+        similarity = sp.csr_matrix(
+            (neighbor_scores[valid], (list_rows, neighbor_idx[valid])),
+            shape=(len(history_products), len(self.catalog)))
+        
+        scores = history[:, history_products] @ similarity
+        rows, cells, ranks = top_k_sparse(scores, n_recommendations, exclude=history)
+        return rows, ranks + 1, scores.indices[cells], scores.data[cells]
+
+
+    @profiler.timed('item.recommend_batch')
+    def recommend_batch(self, user_ids, n_recommendations=3):
+        """
+        Birden çok kullanıcı için önerileri tek seferde, seyrek matris işlemleriyle hesaplar.
+        
+        Dönüş:
+        RecommendationResult: Kullanıcı ve sıra sırasıyla öneriler. Bulunamayan kullanıcılar atlanır.
+        """
+        user_ids = np.asarray(user_ids)
+        user_item_positions = self.customer_index.positions(user_ids)
+        found = user_item_positions >= 0
+        user_ids, user_item_positions = user_ids[found], user_item_positions[found]
+        
+        queries, ranks, products, scores = self._score_products(
+            self.interactions.customer_codes[user_item_positions], n_recommendations)
+        
+        # Her ürün ilk alışverişiyle gösterilir
+        similar_items_idx = self.catalog.first_rows[products]
+        return RecommendationResult(
+            self.item_df, self.user_df, user_ids[queries], ranks,
+            similar_items_idx, self._purchasers(similar_items_idx), scores)
+
+
+    def get_recommendations_batch(self, user_ids, n_recommendations=3):
+        """
+        recommend_batch sonucunu DataFrame olarak döndürür.
+        
+        Dönüş:
+        pd.DataFrame: Her öneri bir satır; 'User ID' ve 'Rank' sütunlarına ek olarak
+        get_recommendations ile aynı sütunlar. Bulunamayan kullanıcılar atlanır.
+        """
+        return self.recommend_batch(user_ids, n_recommendations).to_frame()
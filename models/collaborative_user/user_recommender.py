@@ -1,67 +1,242 @@
 # user_recommender.py
 
 import numpy as np
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
-from common.data_preprocessing import encode_features
-from common import MIN_SIMILARITY_THRESHOLD
+from scipy import sparse as sp
+from common.data_preprocessing import DatasetStore, FeatureCache
+from common.catalog import ProductCatalog
+from common.interactions import InteractionMatrix, top_k_sparse
+from common.ann import build_neighbor_index, neighbor_index_from_state
+from common.customer_index import CustomerIndex, CustomerNotFoundError
+from common.persistence import save_state, load_state, new_model_version
+from common.profiling import profiler
+from common.results import USER_BASED_LAYOUT, RecommendationResult
 
 # Kullanıcı bazlı öneri sistemi için:
 # |
 # v
 class UserBasedRecommender:
 
-    def __init__(self, user_df, item_df):
-        self.user_df = user_df.copy()
-        self.item_df = item_df.copy()
-        self.encoded_users = encode_features(user_df)
-        self.similarity_matrix = cosine_similarity(self.encoded_users)
+    def __init__(self, user_df, item_df, n_neighbors=100, customer_index=None, features=None,
+                 neighbor_backend='exact', backend_options=None, interactions=None):
+        self._attach_data(user_df, item_df, customer_index, features, interactions)
+        self.encoded_users = self.features.encode(self.user_df)
+        
+        # Müşteriler, alışveriş satırlarının ortalaması olan profilleriyle karşılaştırılır.
+        # Tam N×N matris yerine müşteri başına en benzer k müşteri saklanır ('exact') ya da
+        # komşular yaklaşık indeksle ('ivf', 'lsh') sorgu anında aranır (bkz. common.ann)
+        self.neighbor_index = build_neighbor_index(
+            neighbor_backend, n_neighbors, **(backend_options or {})).fit(
+                self.interactions.profiles(self.encoded_users))
 
 
+    def _attach_data(self, user_df, item_df, customer_index=None, features=None,
+                     interactions=None):
+        # Veri seti kopyalanmaz: paylaşılan deponun salt okunur görünümleri kullanılır
+        # (görünüm olmayan DataFrame'ler için iki taraf tek bir depoya bir kez kopyalanır)
+        self.dataset = DatasetStore.of(user_df, item_df)
+        self.user_df = self.dataset.view(user_df.columns)
+        self.item_df = self.dataset.view(item_df.columns)
+        
+        # Müşteri ID -> satır konumu indeksi (verilmezse bu veri seti için oluşturulur)
+        if customer_index is None:
+            customer_index = CustomerIndex.from_frame(self.user_df)
+        self.customer_index = customer_index
+        
+        # Veri seti için paylaşılan kodlanmış özellikler
+        self.features = features if features is not None else FeatureCache()
+        
+        # Müşteri × ürün etkileşim matrisi (verilmezse bu veri seti için oluşturulur)
+        if interactions is None:
+            interactions = InteractionMatrix.from_frame(
+                self.item_df, ProductCatalog.from_frame(self.item_df))
+        self.interactions = interactions
+        
+        # Her eğitim/yüklemede yenilenir; önbelleğe alınmış sonuçlar buna göre geçersizleşir
+        self.model_version = new_model_version()
+
+
+    def save(self, path):
+        """Kodlanmış matrisi ve komşu listelerini diske kaydeder"""
+        save_state({
+            'encoded_users': self.encoded_users,
+            'user_encoder': self.features.encoder(self.user_df.columns),
+            'neighbor_index': self.neighbor_index.get_state()
+        }, path)
+
+
+    @classmethod
+    def load(cls, path, user_df, item_df, customer_index=None, features=None, interactions=None):
+        """Kaydedilmiş modeli yeniden eğitmeden (bellek eşlemeli dizilerle) yükler"""
+        state = load_state(path)
+        recommender = cls.__new__(cls)
+        recommender._attach_data(user_df, item_df, customer_index, features, interactions)
+        recommender.encoded_users = recommender.features.register(
+            recommender.user_df.columns, state['user_encoder'], state['encoded_users'])
+        recommender.neighbor_index = neighbor_index_from_state(state['neighbor_index'])
+        return recommender
+
+
+    @profiler.timed('user.update')
+    def update(self, new_rows, customer_index=None, dataset=None, interactions=None):
+        """
+        Yeni satırları (yeni alışverişler/müşteriler) modeli baştan eğitmeden ekler.
+        Yeni satırlar eğitilmiş kodlayıcılarla kodlanır; yeni müşteriler komşu listelerine
+        eklenir ve mevcut müşteri çiftleri yeniden hesaplanmaz. Yeni alışverişi olan mevcut
+        müşterilerin profili değiştiği için yalnızca bu müşterilerin komşuları yeniden
+        hesaplanır ve diğer müşterilerin listelerindeki benzerlikleri güncellenir.
+        
+        Parametreler:
+        new_rows: Veri setiyle aynı sütunlara sahip yeni satırlar
+        customer_index: Güncellenmiş veri seti için paylaşılan indeks (verilmezse oluşturulur)
+        dataset: Yeni satırları içeren paylaşılan veri deposu (verilmezse oluşturulur)
+        interactions: Yeni satırları içeren paylaşılan etkileşim matrisi (verilmezse oluşturulur)
+        """
+        n_old_rows = len(self.interactions.customer_codes)
+        if dataset is None:
+            dataset = self.dataset.append(new_rows)
+        self.dataset = dataset
+        self.user_df = dataset.view(self.user_df.columns)
+        self.item_df = dataset.view(self.item_df.columns)
+        
+        if customer_index is None:
+            customer_index = CustomerIndex.from_frame(self.user_df)
+        self.customer_index = customer_index
+        
+        if interactions is None:
+            interactions = InteractionMatrix.from_frame(
+                self.item_df, self.interactions.catalog.extend(self.item_df))
+        self.interactions = interactions
+        
+        self.encoded_users = self.features.extend(self.user_df)
+        profiles = self.interactions.profiles(self.encoded_users)
+        self.neighbor_index.refresh(profiles, self.interactions.returning_customers(n_old_rows))
+        
+        # Önbelleğe alınmış sonuçlar artık geçersiz
+        self.model_version = new_model_version()
+        return self
+
+
+    @profiler.timed('user.recommend')
     def get_recommendations(self, user_id, n_recommendations=3):
+        """
+        Dönüş:
+        (RecommendationResult, dict): Öneriler ve hedef kullanıcının özellikleri; kullanıcı
+        bulunamazsa ya da eşiği geçen benzer kullanıcı yoksa boş sonuç ve None
+        """
         try:
             # Kullanıcının indeksini bul
-            user_idx = self.user_df[self.user_df['Customer ID'] == user_id].index[0]
-            user_similarities = self.similarity_matrix[user_idx]
+            user_idx = self.customer_index.position(user_id)
             
-            # Benzerlik eşiğini uygula (Eklendi)
-            similar_mask = user_similarities >= MIN_SIMILARITY_THRESHOLD
-            user_similarities = user_similarities[similar_mask]
+            # Benzer müşterilerin satın aldığı ürünler (skora göre sıralı)
+            _, ranks, item_rows, user_rows, similarities, neighbor_scores = self._score_products(
+                [self.interactions.customer_codes[user_idx]], n_recommendations)
             
             # Eğer eşiği geçen kullanıcı yoksa boş döndür
-            if len(user_similarities) == 0:
-                return pd.DataFrame(), None
+            if len(item_rows) == 0:
+                return self._empty_result(), None
             
-            # Benzerlik sırasına göre kullanıcıları al
-            similar_users_idx = np.argsort(user_similarities)[::-1][1:n_recommendations+1]
-            similar_users = self.user_df.iloc[similar_users_idx]
+            # Ürün ve benzer kullanıcı özellikleri biçimlendirilirken okunur
+            recommendations = RecommendationResult.single(
+                self.item_df, self.user_df, user_id, item_rows, user_rows, similarities,
+                USER_BASED_LAYOUT, {'Neighbor_Score': neighbor_scores})
             
             # Hedef kullanıcının özellikleri
-            target_user = self.user_df[self.user_df['Customer ID'] == user_id].iloc[0]
-            
-            # Önerileri hazırla
-            recommendations = []
-            for idx, similar_user in similar_users.iterrows():
-                user_item = self.item_df[self.item_df['Customer ID'] == similar_user['Customer ID']].iloc[0]
-                
-                recommendation = {
-                    'Item Purchased': user_item['Item Purchased'],
-                    'Category': user_item['Category'],
-                    'Color': user_item['Color'],
-                    'Season': user_item['Season'],
-                    'Purchase Amount': user_item['Purchase Amount (USD)'],
-                    'Similarity': user_similarities[idx],
-                    'User_Age': similar_user['Age'],
-                    'User_Gender': similar_user['Gender'],
-                    'User_Location': similar_user['Location'],
-                    'User_Size': similar_user['Size'],
-                    'User_Previous_Purchases': similar_user['Previous Purchases'],
-                    'User_Frequency': similar_user['Frequency of Purchases']
-                }
-                recommendations.append(recommendation)
+            return recommendations, self.user_df.iloc[user_idx].to_dict()
             
-            return pd.DataFrame(recommendations), target_user.to_dict()
+        except CustomerNotFoundError as e:
+            print(f"Uyarı: {str(e)}")
+            return self._empty_result(), None
             
         except Exception as e:
             print(f"Öneri hatası: {str(e)}")
-            return pd.DataFrame(), None
+            return self._empty_result(), None
+
+
+    def _empty_result(self):
+        return RecommendationResult.empty_for(self.item_df, self.user_df, USER_BASED_LAYOUT)
+
+
+    def _score_products(self, customers, n_recommendations):
+        """
+        Müşterilerin en benzer komşularının satın aldığı ürünleri skorlar.
+        
+        Sıralama skoru, komşu benzerlikleri (W) ile etkileşim matrisinin (R) çarpımıdır: bir
+        ürünün skoru onu satın alan komşuların benzerlik toplamıdır (1'i aşabilir). Çarpım
+        yalnızca komşuların satın aldığı hücreler üzerinden açık olarak hesaplanır; böylece
+        her ürünü alan en benzer komşu da (gösterilen alışveriş, kullanıcı ve benzerlik)
+        aynı adımda bulunur.
+        
+        Dönüş:
+        (queries, ranks, item_rows, user_rows, similarities, neighbor_scores): Sorgu ve sıra
+        sırasıyla öneriler; queries customers içindeki konumlar, ranks 1'den başlar,
+        similarities ürünü alan en benzer komşunun benzerliği, neighbor_scores sıralama skoru
+        """
+        # Tüm müşterilerin komşu listeleri tek seferde. Komşu sayısı en az n_neighbors'tır:
+        # n <= n_neighbors için skorlar n'den bağımsızdır ve küçük n için sonuçlar büyük n
+        # sonuçlarının başıdır (değerlendirme, önbellek ve toplu hesaplama bunu kullanır).
+        # Daha büyük n için listeler tam yoldan n genişliğinde hesaplanır.
+        neighbor_idx, neighbor_scores, counts = self.neighbor_index.neighbors_batch(
+            customers, max(n_recommendations, self.neighbor_index.n_neighbors))
+        
+        # Geçerli komşuları düzleştir (müşteri ve benzerlik sırası korunur)
+        valid = np.arange(neighbor_idx.shape[1]) < counts[:, None]
+        queries, slots = np.nonzero(valid)
+        neighbors, similarities = neighbor_idx[valid], neighbor_scores[valid]
+        
+        # W·R'nin sıfır olmayan terimleri: komşuların satın aldığı her (sorgu, ürün) hücresi
+        owners, purchase_cells = self.interactions.cells_of(neighbors)
+        products = self.interactions.matrix.indices[purchase_cells]
+        term_queries, term_slots = queries[owners], slots[owners]
+        
+        # Aynı (sorgu, ürün) terimleri toplanır; grubun ilk terimi en benzer komşunundur
+        order = np.lexsort((term_slots, products, term_queries))
+        sorted_queries, sorted_products = term_queries[order], products[order]
+        group_starts = np.flatnonzero(np.r_[True, (sorted_queries[1:] != sorted_queries[:-1]) |
+                                            (sorted_products[1:] != sorted_products[:-1])])
+        totals = np.add.reduceat(similarities[owners][order], group_starts) if len(order) else []
+        scores = sp.csr_matrix(
+            (totals, (sorted_queries[group_starts], sorted_products[group_starts])),
+            shape=(len(customers), len(self.interactions.catalog)))
+        
+        # Gruplar (sorgu, ürün) sırasında olduğundan CSR hücreleriyle hizalıdır. Eşit
+        # skorlarda en benzer alıcı komşusu önce gelen ürün önce gelir
+        best = order[group_starts]
+        rows, cells, ranks = top_k_sparse(scores, n_recommendations, tiebreak=term_slots[best])
+        
+        # Ürün, en benzer alıcı komşunun o ürünü aldığı alışverişle gösterilir
+        best = best[cells]
+        item_rows = self.interactions.cell_rows[purchase_cells[best]]
+        user_rows = self.interactions.first_rows[neighbors[owners[best]]]
+        return (rows, ranks + 1, item_rows, user_rows, similarities[owners[best]],
+                scores.data[cells])
+
+
+    @profiler.timed('user.recommend_batch')
+    def recommend_batch(self, user_ids, n_recommendations=3):
+        """
+        Birden çok kullanıcı için önerileri tek seferde, seyrek matris işlemleriyle hesaplar.
+        
+        Dönüş:
+        RecommendationResult: Kullanıcı ve sıra sırasıyla öneriler. Bulunamayan kullanıcılar atlanır.
+        """
+        user_ids = np.asarray(user_ids)
+        user_positions = self.customer_index.positions(user_ids)
+        found = user_positions >= 0
+        user_ids, user_positions = user_ids[found], user_positions[found]
+        
+        queries, ranks, item_rows, user_rows, similarities, neighbor_scores = self._score_products(
+            self.interactions.customer_codes[user_positions], n_recommendations)
+        return RecommendationResult(
+            self.item_df, self.user_df, user_ids[queries], ranks, item_rows, user_rows,
+            similarities, USER_BASED_LAYOUT, {'Neighbor_Score': neighbor_scores})
+
+
+    def get_recommendations_batch(self, user_ids, n_recommendations=3):
+        """
+        recommend_batch sonucunu DataFrame olarak döndürür.
+        
+        Dönüş:
+        pd.DataFrame: Her öneri bir satır; 'User ID' ve 'Rank' sütunlarına ek olarak
+        get_recommendations ile aynı sütunlar. Bulunamayan kullanıcılar atlanır.
+        """
+        return self.recommend_batch(user_ids, n_recommendations).to_frame()
@@ -1,73 +1,178 @@
 # cluster_recommender.py
 
+import time
+import warnings
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans 
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics.pairwise import cosine_similarity
-from kneed import KneeLocator
-from common.data_preprocessing import encode_features
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler, normalize
+from common.data_preprocessing import DatasetStore, FeatureCache
+from common.catalog import ProductCatalog
+from common.customer_index import CustomerIndex, CustomerNotFoundError
+from common.interactions import InteractionMatrix
+from common.neighbors import DEFAULT_BLOCK_CELLS, row_similarities, select_top_k
+from common.persistence import save_state, load_state, new_model_version
+from common.profiling import profiler
+from common.results import CLUSTER_LAYOUT, RecommendationResult
 from common import MIN_SIMILARITY_THRESHOLD
 
-class ClusteringRecommender:
 
-    def find_optimal_k(self, data, k_range=range(1, 11)):
-        """Elbow metodu ile optimal k değerini bulur"""
-        inertias = []
-        
-        for k in k_range:
-            kmeans = KMeans(n_clusters=k, random_state=42)
-            kmeans.fit(data)
-            inertias.append(kmeans.inertia_)
-        
+# Artımlı güncellemelerde tam yeniden eğitimi tetikleyen küme kayması oranı:
+# yeni satırların merkezlere ortalama kare uzaklığı eğitim verisindekinden %50 fazlaysa
+DRIFT_THRESHOLD = 0.5
+
+
+def _fit_inertia(data, k, mini_batch, random_state, sample_weight=None):
+    """Tek bir k değeri için KMeans eğitir (süreç havuzunda çalışır)"""
+    started = time.perf_counter()
+    model_cls = MiniBatchKMeans if mini_batch else KMeans
+    model = model_cls(n_clusters=k, random_state=random_state).fit(data, sample_weight=sample_weight)
+    return {'k': k, 'inertia': float(model.inertia_), 'fit_time': time.perf_counter() - started}
+
+
+def _locate_knee(report):
+    """Şu ana kadarki inertia değerleri üzerinden dirsek noktasını bulur"""
+    if len(report) < 3:
+        return None
+    
+    # kneed, matplotlib'i de yüklediğinden yalnızca elbow araması yapılırken içe aktarılır
+    # (kaydedilmiş model yüklenirken gerekmez)
+    from kneed import KneeLocator
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
         kneedle = KneeLocator(
-            x=list(k_range), 
-            y=inertias, 
+            x=[entry['k'] for entry in report], 
+            y=[entry['inertia'] for entry in report], 
             S=1.0, 
             curve='convex', 
             direction='decreasing'
         )
-        optimal_k = kneedle.knee
-        return optimal_k if optimal_k else 3
-
-
-    def __init__(self, user_df, item_df):
-        self.user_df = user_df.copy()
-        self.item_df = item_df.copy()
-        
-        # Kullanıcı kümelemesi için seçilen özellikler
-        user_features = [
-            'Age',
-            'Gender',
-            'Previous Purchases',
-            'Frequency of Purchases',
-            'Size',
-            'Subscription Status'
-        ]
-        
-        # Ürün kümelemesi için seçilen özellikler
-        item_features = [
-            'Item Purchased',
-            'Category',
-            'Season'
-        ]
-        
-        # Benzerlik hesaplama için kullanılacak özellikler
-        similarity_features = [
-            'Item Purchased',
-            'Category',
-            'Color',
-            'Season'
-        ]
-        
-        # Seçilen özellikleri kullanarak kümeleme için veri hazırla
-        self.encoded_users = encode_features(self.user_df[user_features])
-        self.encoded_items = encode_features(self.item_df[item_features])
-        self.encoded_similarity = encode_features(self.item_df[similarity_features])
-        
-        # Optimal k değerlerini bul
-        self.n_user_clusters = self.find_optimal_k(self.encoded_users)
-        self.n_item_clusters = self.find_optimal_k(self.encoded_items)
+    return kneedle.knee
+
+
+class ClusteringRecommender:
+
+    # Benzerlik faktörlerinin ağırlıkları
+    SIMILARITY_WEIGHTS = {
+        'cluster': 0.26,      # Ürün kümesi benzerliği
+        'category': 0.25,     # Kategori benzerliği
+        'season': 0.20,       # Sezon benzerliği
+        'user_cluster': 0.19, # Kullanıcı kümesi benzerliği
+        'price': 0.05,        # Fiyat benzerliği
+        'color': 0.05         # Renk benzerliği
+    }
+    
+    # Kullanıcı kümelemesi için seçilen özellikler
+    USER_FEATURES = [
+        'Age',
+        'Gender',
+        'Previous Purchases',
+        'Frequency of Purchases',
+        'Size',
+        'Subscription Status'
+    ]
+    
+    # Ürün kümelemesi için seçilen özellikler
+    ITEM_FEATURES = [
+        'Item Purchased',
+        'Category',
+        'Season'
+    ]
+    
+    # Benzerlik hesaplama için kullanılacak özellikler
+    SIMILARITY_FEATURES = [
+        'Item Purchased',
+        'Category',
+        'Color',
+        'Season'
+    ]
+
+    @profiler.timed('cluster.elbow_search')
+    def elbow_search(self, data, k_range=range(1, 11), n_jobs=1, sample_size=None,
+                     mini_batch=False, time_budget=None, patience=2, random_state=42,
+                     sample_weight=None):
+        """
+        Elbow metodu için her k değerinde KMeans eğitir.
+        
+        Parametreler:
+        data: Kümelenecek kodlanmış veri
+        k_range: Denenecek küme sayıları
+        n_jobs: Paralel süreç sayısı (-1: tüm çekirdekler)
+        sample_size: Verilirse arama bu kadar satırlık rastgele örnek üzerinde yapılır
+        mini_batch: True ise KMeans yerine MiniBatchKMeans kullanılır
+        time_budget: Saniye cinsinden süre sınırı; aşıldığında dirsek noktası
+            son `patience` sonuçta değişmemişse arama erken durdurulur
+        sample_weight: Satır ağırlıkları (ör. katalogdaki ürünlerin alışveriş sayıları)
+        
+        Dönüş:
+        (optimal_k, report): Seçilen k ve her k için {'k', 'inertia', 'fit_time'} listesi
+        """
+        if sample_size is not None and data.shape[0] > sample_size:
+            rng = np.random.default_rng(random_state)
+            sample = np.sort(rng.choice(data.shape[0], sample_size, replace=False))
+            data = data[sample]
+            if sample_weight is not None:
+                sample_weight = np.asarray(sample_weight)[sample]
+        
+        started = time.perf_counter()
+        report = []
+        knee, stable_steps = None, 0
+        
+        # Sonuçlar k sırasıyla gelir; erken çıkışta kalan işler iptal edilir
+        results = Parallel(n_jobs=n_jobs, return_as='generator')(
+            delayed(_fit_inertia)(data, k, mini_batch, random_state, sample_weight) for k in k_range)
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='.*(successfully executed|have been cancelled)')
+            for result in results:
+                report.append(result)
+                profiler.count('cluster.elbow_fits')
+                
+                new_knee = _locate_knee(report)
+                stable_steps = stable_steps + 1 if new_knee is not None and new_knee == knee else 0
+                knee = new_knee
+                
+                out_of_time = time_budget is not None and time.perf_counter() - started > time_budget
+                if out_of_time and stable_steps >= patience:
+                    break
+            results.close()
+        
+        optimal_k = _locate_knee(report)
+        return (optimal_k if optimal_k else 3), report
+
+
+    def find_optimal_k(self, data, k_range=range(1, 11), **search_options):
+        """Elbow metodu ile optimal k değerini bulur"""
+        optimal_k, _ = self.elbow_search(data, k_range, **search_options)
+        return optimal_k
+
+
+    def __init__(self, user_df, item_df, customer_index=None, elbow_options=None, features=None,
+                 catalog=None, interactions=None):
+        self._attach_data(user_df, item_df, customer_index, features, catalog, interactions)
+        
+        # Seçilen özellikleri kullanarak kümeleme için veri hazırla; ürün tarafı her
+        # alışveriş yerine katalogdaki her benzersiz ürün için bir kez kodlanır
+        self.encoded_users = self.features.encode(self.user_df, self.USER_FEATURES)
+        self.encoded_items = self.catalog.encode(self.ITEM_FEATURES)
+        self.encoded_similarity = self.catalog.encode(self.SIMILARITY_FEATURES)
+        
+        # Optimal k değerlerini bul (elbow_options: bkz. elbow_search)
+        self.elbow_options = dict(elbow_options or {})
+        self._fit_clusters()
+
+
+    def _fit_clusters(self):
+        """Elbow araması ile k değerlerini seçer ve KMeans modellerini tüm veriyle eğitir"""
+        self.n_user_clusters, user_report = self.elbow_search(self.encoded_users, **self.elbow_options)
+        
+        # Ürünler alışveriş sayılarıyla ağırlıklandırılarak kümelenir: amaç fonksiyonu tüm
+        # alışveriş satırlarını kümelemekle aynıdır, ancak nokta sayısı ürün sayısı kadardır
+        purchase_counts = self.catalog.purchase_counts
+        self.n_item_clusters, item_report = self.elbow_search(
+            self.encoded_items, sample_weight=purchase_counts, **self.elbow_options)
+        self.elbow_reports = {'users': user_report, 'items': item_report}
         
         print(f"\nOptimal küme sayıları belirlendi:")
         print(f"- Kullanıcı kümeleri: {self.n_user_clusters}")
@@ -77,156 +182,582 @@ class ClusteringRecommender:
         self.user_clustering = KMeans(n_clusters=self.n_user_clusters, random_state=42)
         self.item_clustering = KMeans(n_clusters=self.n_item_clusters, random_state=42)
         
-        self.user_clusters = self.user_clustering.fit_predict(self.encoded_users)
-        self.item_clusters = self.item_clustering.fit_predict(self.encoded_items)
+        with profiler.span('cluster.kmeans_fit'):
+            self.user_clusters = self.user_clustering.fit_predict(self.encoded_users)
+            self.product_clusters = self.item_clustering.fit_predict(
+                self.encoded_items, sample_weight=purchase_counts)
         
-        # Küme etiketlerini DataFrame'lere ekle
-        self.user_df['Cluster'] = self.user_clusters
-        self.item_df['Cluster'] = self.item_clusters
+        # Kayma ölçümü için eğitim verisinde nokta başına ortalama kare uzaklık ve
+        # artımlı eklenen satırların uzaklık toplamları
+        self.cluster_baselines = {
+            'users': float(self.user_clustering.inertia_) / len(self.user_clusters),
+            'items': float(self.item_clustering.inertia_) / purchase_counts.sum()
+        }
+        self.drift_totals = {'users': [0.0, 0], 'items': [0.0, 0]}
+        
+        self._attach_clusters()
 
 
-    def calculate_similarity_score(self, idx1, idx2, user_cluster):
+    def _attach_data(self, user_df, item_df, customer_index=None, features=None, catalog=None,
+                     interactions=None):
+        # Veri seti kopyalanmaz: paylaşılan deponun salt okunur görünümleri kullanılır
+        # (görünüm olmayan DataFrame'ler için iki taraf tek bir depoya bir kez kopyalanır)
+        self.dataset = DatasetStore.of(user_df, item_df)
+        self.user_df = self.dataset.view(user_df.columns)
+        self.item_df = self.dataset.view(item_df.columns)
+        
+        # Müşteri ID -> satır konumu indeksi (verilmezse bu veri seti için oluşturulur)
+        if customer_index is None:
+            customer_index = CustomerIndex.from_frame(self.user_df)
+        self.customer_index = customer_index
+        
+        # Veri seti için paylaşılan kodlanmış özellikler
+        self.features = features if features is not None else FeatureCache()
+        
+        # Alışverişlerden indirgenmiş benzersiz ürünler (verilmezse bu veri seti için oluşturulur)
+        if catalog is None:
+            catalog = ProductCatalog.from_frame(self.item_df, self.features.dtype, self.features.sparse)
+        self.catalog = catalog
+        
+        # Müşteri × ürün etkileşim matrisi; öneriler müşterinin tüm alışveriş geçmişine göre
+        # skorlanır (verilmezse bu veri seti için oluşturulur)
+        if interactions is None:
+            interactions = InteractionMatrix.from_frame(self.item_df, self.catalog)
+        self.interactions = interactions
+        
+        # Her eğitim/yüklemede yenilenir; önbelleğe alınmış sonuçlar buna göre geçersizleşir
+        self.model_version = new_model_version()
+
+
+    def _attach_clusters(self):
+        # Küme etiketleri paylaşılan veri setine sütun olarak eklenmez; user_clusters ve
+        # item_clusters dizileri user_df/item_df satır konumlarıyla hizalıdır. Ürün kümeleri
+        # katalogda ürün başına tutulur ve alışveriş satırlarına ürün numarasıyla eşlenir
+        self.item_clusters = self.product_clusters[self.catalog.codes]
+        
+        # Skorlama motoru için ürün özniteliklerini dizi olarak hazırla
+        self._prepare_scoring_arrays()
+
+
+    def neighbor_clusters(self):
         """
-        İki ürün arasındaki benzerlik skorunu hesaplar.
+        Kullanıcı ve ürün bazlı modellerin IVF indekslerinde liste olarak kullanılacak
+        küme etiketleri (bkz. common.ann.IVFNeighborIndex).
+        
+        Dönüş:
+        (customer_clusters, product_clusters): Müşteri numarası başına (ilk alışveriş
+        satırının) kullanıcı kümesi ve katalogdaki ürün başına ürün kümesi
+        """
+        return self.user_clusters[self.interactions.first_rows], self.product_clusters
+
+
+    def save(self, path):
+        """Kodlanmış matrisleri, KMeans modellerini ve seçilen k değerlerini diske kaydeder"""
+        save_state({
+            'encoded_users': self.encoded_users,
+            'encoded_items': self.encoded_items,
+            'encoded_similarity': self.encoded_similarity,
+            'encoders': {
+                'encoded_users': self.features.encoder(self.USER_FEATURES),
+                'encoded_items': self.catalog.features.encoder(self.ITEM_FEATURES),
+                'encoded_similarity': self.catalog.features.encoder(self.SIMILARITY_FEATURES)
+            },
+            'n_user_clusters': self.n_user_clusters,
+            'n_item_clusters': self.n_item_clusters,
+            'elbow_options': self.elbow_options,
+            'elbow_reports': self.elbow_reports,
+            'cluster_baselines': self.cluster_baselines,
+            'drift_totals': self.drift_totals,
+            'user_clustering': self.user_clustering,
+            'item_clustering': self.item_clustering,
+            'user_clusters': self.user_clusters,
+            'product_clusters': self.product_clusters
+        }, path)
+
+
+    @classmethod
+    def load(cls, path, user_df, item_df, customer_index=None, features=None, catalog=None,
+             interactions=None):
+        """Kaydedilmiş modeli elbow araması ve KMeans eğitimi yapmadan yükler"""
+        state = load_state(path)
+        recommender = cls.__new__(cls)
+        recommender._attach_data(user_df, item_df, customer_index, features, catalog, interactions)
+        
+        # Kodlanmış matrisleri paylaşılan önbelleklere (kullanıcılar veri setinin, ürünler
+        # kataloğun önbelleğine) kaydet
+        encoders = state.pop('encoders')
+        for name, columns, cache in [
+                ('encoded_users', cls.USER_FEATURES, recommender.features),
+                ('encoded_items', cls.ITEM_FEATURES, recommender.catalog.features),
+                ('encoded_similarity', cls.SIMILARITY_FEATURES, recommender.catalog.features)]:
+            state[name] = cache.register(columns, encoders[name], state[name])
+        
+        for name, value in state.items():
+            setattr(recommender, name, value)
+        recommender._attach_clusters()
+        return recommender
+
+
+    def cluster_drift(self):
+        """
+        Artımlı eklenen satırların küme merkezlerine ortalama kare uzaklığının,
+        eğitim verisindekine göre göreli artışı (0: eğitim verisi kadar uyumlu).
+        
+        Dönüş:
+        dict: 'users' ve 'items' için kayma oranı
+        """
+        drift = {}
+        for name, (total, count) in self.drift_totals.items():
+            baseline = self.cluster_baselines[name]
+            if count == 0 or baseline <= 0:
+                drift[name] = 0.0
+            else:
+                drift[name] = (total / count) / baseline - 1.0
+        return drift
+
+
+    def _assign_new_rows(self, name, model, encoded, labels):
+        """Yeni satırları mevcut kümelere atar ve kayma istatistiklerini günceller"""
+        new_rows = encoded[len(labels):]
+        if new_rows.shape[0] == 0:
+            return labels
+        
+        distances = model.transform(new_rows)
+        new_labels = distances.argmin(axis=1).astype(labels.dtype)
+        totals = self.drift_totals[name]
+        totals[0] += float((distances.min(axis=1) ** 2).sum())
+        totals[1] += int(new_rows.shape[0])
+        return np.concatenate([labels, new_labels])
+
+
+    def _assign_new_products(self, n_old_rows):
+        """
+        Katalogdaki yeni ürünleri mevcut ürün kümelerine atar. Kayma istatistikleri,
+        mevcut ürünlerin yeni alışverişleri de dahil olmak üzere yeni alışveriş satırları
+        üzerinden güncellenir.
+        """
+        labels = self.product_clusters
+        new_row_products = self.catalog.codes[n_old_rows:]
+        if len(new_row_products) == 0:
+            return labels
+        
+        # Ürün sayısı küçük olduğundan tüm ürünlerin merkez uzaklıkları birlikte hesaplanır
+        distances = self.item_clustering.transform(self.encoded_items)
+        new_labels = distances[len(labels):].argmin(axis=1).astype(labels.dtype)
+        totals = self.drift_totals['items']
+        totals[0] += float((distances.min(axis=1)[new_row_products] ** 2).sum())
+        totals[1] += len(new_row_products)
+        return np.concatenate([labels, new_labels])
+
+
+    @profiler.timed('cluster.update')
+    def update(self, new_rows, customer_index=None, drift_threshold=DRIFT_THRESHOLD, dataset=None,
+               catalog=None, interactions=None):
+        """
+        Yeni satırları modeli baştan eğitmeden ekler: yeni kullanıcılar ve katalogdaki yeni
+        ürünler eğitilmiş kodlayıcılarla kodlanır ve mevcut KMeans kümelerine atanır. Kümelerdeki kayma
+        drift_threshold değerini aşarsa elbow araması ve KMeans tüm veriyle yeniden çalışır.
         
         Parametreler:
-        idx1: Birinci ürünün indeksi
-        idx2: İkinci ürünün indeksi
+        new_rows: Veri setiyle aynı sütunlara sahip yeni satırlar
+        customer_index: Güncellenmiş veri seti için paylaşılan indeks (verilmezse oluşturulur)
+        drift_threshold: Tam yeniden eğitimi tetikleyen kayma oranı (bkz. cluster_drift)
+        dataset: Yeni satırları içeren paylaşılan veri deposu (verilmezse oluşturulur)
+        catalog: Yeni satırları içeren paylaşılan ürün kataloğu (verilmezse genişletilir)
+        interactions: Yeni satırları içeren paylaşılan etkileşim matrisi (verilmezse oluşturulur)
+        """
+        n_old_rows = len(self.item_clusters)
+        if dataset is None:
+            dataset = self.dataset.append(new_rows)
+        self.dataset = dataset
+        self.user_df = dataset.view(self.user_df.columns)
+        self.item_df = dataset.view(self.item_df.columns)
+        
+        if customer_index is None:
+            customer_index = CustomerIndex.from_frame(self.user_df)
+        self.customer_index = customer_index
+        
+        if catalog is None:
+            catalog = self.catalog.extend(self.item_df)
+        self.catalog = catalog
+        
+        if interactions is None:
+            interactions = InteractionMatrix.from_frame(self.item_df, self.catalog)
+        self.interactions = interactions
+        
+        self.encoded_users = self.features.extend(self.user_df, self.USER_FEATURES)
+        self.encoded_items = self.catalog.encode(self.ITEM_FEATURES)
+        self.encoded_similarity = self.catalog.encode(self.SIMILARITY_FEATURES)
+        
+        self.user_clusters = self._assign_new_rows(
+            'users', self.user_clustering, self.encoded_users, self.user_clusters)
+        self.product_clusters = self._assign_new_products(n_old_rows)
+        
+        drift = self.cluster_drift()
+        if max(drift.values()) > drift_threshold:
+            print(f"\nKüme kayması eşiği aştı ({max(drift.values()):.3f} > {drift_threshold}); "
+                  f"kümeler yeniden eğitiliyor...")
+            self._fit_clusters()
+        else:
+            self._attach_clusters()
+        
+        # Önbelleğe alınmış sonuçlar artık geçersiz
+        self.model_version = new_model_version()
+        return self
+
+
+    @profiler.timed('cluster.prepare_scoring')
+    def _prepare_scoring_arrays(self):
+        """Tüm katalog skorlaması için gereken dizileri bir kez hesaplar"""
+        # Benzerlik vektörleri ürün başına tutulur; alışveriş satırları ürün numarasıyla okunur
+        self.normalized_similarity = normalize(self.encoded_similarity)
+        self.product_codes = self.catalog.codes
+        self.category_codes = pd.factorize(self.item_df['Category'])[0]
+        self.season_codes = pd.factorize(self.item_df['Season'])[0]
+        self.color_codes = pd.factorize(self.item_df['Color'])[0]
+        self.prices = self.item_df['Purchase Amount (USD)'].to_numpy(dtype=float)
+        
+        # Her ürünü satın alan kullanıcının kümesi (müşterinin ilk satırı)
+        purchaser_rows = self.customer_index.positions(self.item_df['Customer ID'])
+        self.purchaser_clusters = self.user_clusters[purchaser_rows]
+        
+        # Aday budama için ürünler (küme, kategori, sezon) kovalarına ayrılır; kova
+        # içindeki konumlar artan sıradadır
+        bucket_keys = np.stack([self.item_clusters, self.category_codes, self.season_codes], axis=1)
+        bucket_values, bucket_codes = np.unique(bucket_keys, axis=0, return_inverse=True)
+        bucket_codes = bucket_codes.ravel()
+        self.bucket_clusters, self.bucket_categories, self.bucket_seasons = bucket_values.T
+        self.bucket_rows = np.argsort(bucket_codes, kind='stable')
+        self.bucket_offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(bucket_codes, minlength=len(bucket_values)))))
+
+
+    def _history_targets(self, user_positions):
+        """
+        Kullanıcıların alışveriş geçmişindeki hedef ürünler.
+        
+        Dönüş:
+        (owners, target_rows, weights): Her hedefin user_positions içindeki konumu (artan
+        sırada), ürünün müşteri tarafından ilk alındığı satır ve ürünün müşterinin
+        geçmişindeki payı (alışveriş sayısıyla; müşteri başına toplamı 1)
+        """
+        customers = self.interactions.customer_codes[np.asarray(user_positions, dtype=np.int64)]
+        owners, cells = self.interactions.cells_of(customers)
+        return owners, self.interactions.cell_rows[cells], self.interactions.weights.data[cells]
+
+
+    def _purchase_count(self, user_position):
+        """Kullanıcının alışveriş satırı sayısı (etkileşim matrisindeki satırının toplamı)"""
+        matrix = self.interactions.matrix
+        customer = self.interactions.customer_codes[user_position]
+        return int(matrix.data[matrix.indptr[customer]:matrix.indptr[customer + 1]].sum())
+
+
+    @staticmethod
+    def _combine_targets(block, owners, weights):
+        """
+        Hedef başına skor satırlarını sahiplerine göre ağırlıklı toplar. Her sahip için
+        toplama hedef sırasıyla yapılır; tek hedefli kullanıcıların skorları değişmez.
+        """
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+        return np.add.reduceat(block * np.asarray(weights, dtype=float)[:, None], starts, axis=0)
+
+
+    def bucket_upper_bounds(self, target_idx, user_cluster, weights=None):
+        """
+        Hedef ürün(ler) için her (küme, kategori, sezon) kovasındaki ürünlerin alabileceği
+        en yüksek skor. Temel benzerlik en fazla 1, fiyat ve renk faktörleri en fazla
+        tam eşleşme kadar olabileceğinden skor bu sınırı aşamaz. Birden çok hedefte skor
+        hedef skorlarının ağırlıklı ortalaması olduğundan sınır da sınırların ortalamasıdır.
+        
+        Parametreler:
+        target_idx: Hedef ürünün konumu ya da müşterinin geçmişindeki ürün konumları
+        weights: Hedeflerin ağırlıkları (verilmezse tek hedef için 1)
+        """
+        targets = np.atleast_1d(target_idx)[:, None]
+        factor_weights = self.SIMILARITY_WEIGHTS
+        same_user_cluster = self.purchaser_clusters[targets] == user_cluster
+        bounds = (factor_weights['cluster'] * (self.bucket_clusters == self.item_clusters[targets])
+                  + factor_weights['category'] * (self.bucket_categories == self.category_codes[targets])
+                  + factor_weights['season'] * (self.bucket_seasons == self.season_codes[targets])
+                  + factor_weights['user_cluster'] * same_user_cluster
+                  + factor_weights['price'] + factor_weights['color'])
+        if weights is None:
+            weights = np.ones(len(targets))
+        bounds = np.asarray(weights, dtype=float) @ bounds
+        
+        # Kayan nokta yuvarlamasına karşı küçük pay (sınır hiçbir zaman gerçek skorun altında kalmaz)
+        return bounds * (1 + 1e-6) + 1e-9
+
+
+    def score_top_items(self, target_idx, user_cluster, n_recommendations, exclude_customer=None,
+                        threshold=MIN_SIMILARITY_THRESHOLD, weights=None):
+        """
+        Eşiği geçen en yüksek skorlu n ürünü, skoru eşiğe ya da mevcut n. skora
+        ulaşamayacak kovaları hiç skorlamadan bulur. Sonuç tüm kataloğu skorlamakla aynıdır
+        (skora göre azalan, eşitlikte küçük konum önce).
+        
+        Parametreler:
+        target_idx, weights: Hedef ürün ya da ağırlıklı geçmiş ürünleri (bkz. score_items)
+        
+        Dönüş:
+        (positions, scores, n_scored): Seçilen ürün konumları, skorları ve skorlanan ürün sayısı
+        """
+        bounds = self.bucket_upper_bounds(target_idx, user_cluster, weights)
+        item_customers = self.item_df['Customer ID'].to_numpy()
+        
+        positions = np.array([], dtype=np.int64)
+        scores = np.array([])
+        n_scored = 0
+        
+        # Aynı sınıra sahip kovalar birlikte, en yüksek sınırdan başlayarak skorlanır
+        levels = np.unique(bounds[bounds >= threshold])[::-1]
+        for level_idx, level in enumerate(levels):
+            buckets = np.flatnonzero(bounds == level)
+            candidates = np.concatenate([
+                self.bucket_rows[self.bucket_offsets[b]:self.bucket_offsets[b + 1]] for b in buckets])
+            if exclude_customer is not None:
+                candidates = candidates[item_customers[candidates] != exclude_customer]
+            if len(candidates) == 0:
+                continue
+            
+            candidate_scores = self.score_items(target_idx, user_cluster, candidates, weights)
+            n_scored += len(candidates)
+            profiler.count('cluster.items_scored', len(candidates))
+            passed = candidate_scores >= threshold
+            positions = np.concatenate([positions, candidates[passed]])
+            scores = np.concatenate([scores, candidate_scores[passed]])
+            
+            # Skora göre azalan, eşitlikte küçük konum önce
+            order = np.lexsort((positions, -scores))[:n_recommendations]
+            positions, scores = positions[order], scores[order]
+            
+            # Kalan kovaların sınırı mevcut n. skorun altındaysa hiçbiri listeye giremez
+            next_level = levels[level_idx + 1] if level_idx + 1 < len(levels) else -np.inf
+            if len(scores) == n_recommendations and scores[-1] > next_level:
+                profiler.count('cluster.bucket_levels_skipped', len(levels) - level_idx - 1)
+                break
+        
+        return positions, scores, n_scored
+
+
+    def score_items(self, target_idx, user_cluster, candidates=None, weights=None):
+        """
+        Hedef ürün ile aday ürünlerin benzerlik skorlarını tek bir NumPy geçişinde hesaplar.
+        
+        Parametreler:
+        target_idx: Hedef ürünün konumu ya da müşterinin geçmişindeki ürün konumları
         user_cluster: Hedef kullanıcının kümesi
+        candidates: Skorlanacak ürün konumları (None ise tüm katalog)
+        weights: Birden çok hedefte hedeflerin ağırlıkları; skor, hedeflere göre
+            skorların ağırlıklı ortalamasıdır (verilmezse tek hedef için 1)
         
         Dönüş:
-        float: 0-1 arası benzerlik skoru
+        np.ndarray: Tek hedefte calculate_similarity_score ile aynı skorlar
         """
-        # Ürünleri al
-        item1 = self.item_df.iloc[idx1]
-        item2 = self.item_df.iloc[idx2]
-        
-        # Base similarity - encoded özellikler üzerinden cosine similarity
-        base_similarity = cosine_similarity(
-            self.encoded_similarity[idx1].reshape(1, -1),
-            self.encoded_similarity[idx2].reshape(1, -1)
-        )[0][0]
-        
-        # Ağırlıklar
-        weights = {
-            'cluster': 0.26,      # Ürün kümesi benzerliği
-            'category': 0.25,     # Kategori benzerliği
-            'season': 0.20,       # Sezon benzerliği
-            'user_cluster': 0.19, # Kullanıcı kümesi benzerliği
-            'price': 0.05,        # Fiyat benzerliği
-            'color': 0.05         # Renk benzerliği
-        }
+        targets = np.atleast_1d(target_idx)
+        if weights is None:
+            weights = np.ones(len(targets))
+        block = self.score_items_batch(targets, np.full(len(targets), user_cluster), candidates)
+        return self._combine_targets(block, np.zeros(len(targets), dtype=np.int64), weights)[0]
+
+
+    def score_items_batch(self, target_indices, user_clusters, candidates=None):
+        """
+        Birden çok hedef ürün için skorları (hedef sayısı × aday sayısı) matris olarak hesaplar.
+        """
+        if candidates is None:
+            candidates = slice(None)
+        targets = np.asarray(target_indices)
         
-        # Her faktör için benzerlik hesapla (0-1 arası)
-        similarities = {
-            'cluster': 1.0 if item1['Cluster'] == item2['Cluster'] else 0.0,
-            'category': 1.0 if item1['Category'] == item2['Category'] else 0.0,
-            'season': 1.0 if item1['Season'] == item2['Season'] else 0.0,
-            'user_cluster': 1.0 if self.user_df[self.user_df['Customer ID'] == item1['Customer ID']].iloc[0]['Cluster'] == user_cluster else 0.0,
-            'price': max(0, 1 - abs(item1['Purchase Amount (USD)'] - item2['Purchase Amount (USD)']) / max(item2['Purchase Amount (USD)'], 1)),
-            'color': 1.0 if item1['Color'] == item2['Color'] else 0.0
-        }
+        # Base similarity - encoded özellikler üzerinden cosine similarity. Hedeflerin
+        # tüm ürünlerle benzerliği bir kez hesaplanır, adaylar ürün numaralarıyla okunur
+        product_similarity = row_similarities(self.normalized_similarity, self.product_codes[targets])
+        base_similarity = product_similarity[:, self.product_codes[candidates]]
         
-        # Ağırlıklı toplam faktör benzerliği
-        factor_similarity = sum(weights[k] * similarities[k] for k in weights)
+        target_prices = self.prices[targets][:, None]
+        prices = self.prices[candidates][None, :]
         
-        # Final benzerlik skoru
-        final_similarity = base_similarity * factor_similarity
+        def same(codes):
+            return codes[candidates][None, :] == codes[targets][:, None]
         
+        similarities = {
+            'cluster': same(self.item_clusters),
+            'category': same(self.category_codes),
+            'season': same(self.season_codes),
+            'user_cluster': (self.purchaser_clusters[targets] == np.asarray(user_clusters))[:, None],
+            'price': np.maximum(0, 1 - np.abs(target_prices - prices) / np.maximum(prices, 1)),
+            'color': same(self.color_codes)
+        }
+        
+        # Ağırlıklı toplam faktör benzerliği (tekil yol ile aynı toplama sırası)
+        factor_similarity = 0
+        for k, weight in self.SIMILARITY_WEIGHTS.items():
+            factor_similarity = factor_similarity + weight * similarities[k]
+
         """
             base_similarity: İki ürünün temel sayısal özellikler üzerinden benzerliğini ölçer.
             factor_similarity: Ürünlerin diğer kategorik özelliklerini ve fiyat gibi faktörleri değerlendirir.
             final_similarity: Bu iki benzerlik metriğini birleştirerek nihai bir skor döndürür.
         """
-        return final_similarity
+        return base_similarity * factor_similarity
+
+
+    def calculate_similarity_score(self, idx1, idx2, user_cluster):
+        """
+        İki ürün arasındaki benzerlik skorunu hesaplar.
+        
+        Parametreler:
+        idx1: Birinci ürünün indeksi
+        idx2: İkinci ürünün indeksi
+        user_cluster: Hedef kullanıcının kümesi
+        
+        Dönüş:
+        float: 0-1 arası benzerlik skoru
+        """
+        return float(self.score_items(idx1, user_cluster, [idx2])[0])
 
 
+    @profiler.timed('cluster.recommend')
     def get_cluster_recommendations(self, user_id, n_recommendations=5):
         try:
             print(f"\nKullanıcı ID: {user_id} için öneriler hazırlanıyor...")
             
             # Kullanıcının ve ürününün bilgilerini al
-            user_idx = self.user_df[self.user_df['Customer ID'] == user_id].index[0]
+            user_idx = self.customer_index.position(user_id)
             user_cluster = self.user_clusters[user_idx]
             user_info = self.user_df.iloc[user_idx]
             
-            # Kullanıcının mevcut ürününü bul
-            user_item_idx = self.item_df[self.item_df['Customer ID'] == user_id].index[0]
-            user_item = self.item_df.iloc[user_item_idx]
+            # Kullanıcının alışveriş geçmişindeki ürünler; skorlar bu ürünlere göre skorların
+            # alışveriş sayısıyla ağırlıklı ortalamasıdır. Hedef bilgisi ilk alışverişten alınır
+            _, target_rows, weights = self._history_targets([user_idx])
+            user_item = self.item_df.iloc[user_idx]
             
             print(f"Kullanıcı kümesi: {user_cluster}")
-            print(f"Kullanıcının ürün kümesi: {user_item['Cluster']}")
+            print(f"Kullanıcının ürün kümesi: {self.item_clusters[user_idx]}")
             print(f"Kullanıcının mevcut ürünü: {user_item['Item Purchased']}")
+            if len(target_rows) > 1:
+                print(f"Geçmişteki farklı ürün sayısı: {len(target_rows)}")
             
-            # Tüm ürünleri değerlendir (kendisi hariç)
-            other_items = self.item_df[self.item_df['Customer ID'] != user_id].copy()
-            print(f"Toplam değerlendirilecek ürün sayısı: {len(other_items)}")
+            # Eşiğe ya da mevcut en iyi n skora ulaşamayacak kovalar skorlanmadan atlanır
+            with profiler.span('cluster.score_items'):
+                positions, scores, n_scored = self.score_top_items(
+                    target_rows, user_cluster, n_recommendations, exclude_customer=user_id,
+                    weights=weights)
+            # Aday sayısı: müşterinin kendi alışveriş satırları dışındaki tüm satırlar
+            n_candidates = len(self.item_df) - self._purchase_count(user_idx)
+            print(f"Toplam değerlendirilecek ürün sayısı: {n_candidates}")
+            print(f"Skorlanan ürün sayısı: {n_scored} (diğerleri üst sınır ile elendi)")
             
-            # Her ürün için benzerlik skorunu hesapla
-            similarities = []
-            for idx in other_items.index:
-                similarity = self.calculate_similarity_score(user_item_idx, idx, user_cluster)
-                similarities.append(similarity)
-            
-            other_items['Similarity'] = similarities
-            
-            # Benzerlik dağılımını göster
-            similarity_stats = other_items['Similarity'].describe()
-            print("\nBenzerlik skorları dağılımı:")
-            print(similarity_stats)
-            
-            # Minimum benzerlik skoru filtresi
-            recommendations = other_items[other_items['Similarity'] >= MIN_SIMILARITY_THRESHOLD]
-            print(f"\n{MIN_SIMILARITY_THRESHOLD} üzeri benzerlik skoruna sahip ürün sayısı: {len(recommendations)}")
-            
-            if len(recommendations) == 0:
+            if len(positions) == 0:
                 print(f"\nUyarı: {MIN_SIMILARITY_THRESHOLD} benzerlik eşiği için yeterli öneri bulunamadı.")
-                return pd.DataFrame(), None
+                return self._empty_result(), None
             
-            # Benzerliğe göre sırala ve önerileri seç
-            recommendations = recommendations.sort_values('Similarity', ascending=False)
-            recommendations = recommendations.head(n_recommendations)
+            # Seçilen önerilerin benzerlik dağılımını göster
+            print("\nÖnerilerin benzerlik skorları dağılımı:")
+            print(pd.Series(scores, name='Similarity').describe())
             
-            # Önerileri hazırla
-            final_recommendations = []
-            for _, item in recommendations.iterrows():
-                item_user = self.user_df[self.user_df['Customer ID'] == item['Customer ID']].iloc[0]
-                
-                recommendation = {
-                    'Item Purchased': item['Item Purchased'],
-                    'Category': item['Category'],
-                    'Color': item['Color'],
-                    'Season': item['Season'],
-                    'Purchase Amount': item['Purchase Amount (USD)'],
-                    'Similarity': item['Similarity'],
-                    'User_Cluster': user_cluster,
-                    'Item_Cluster': item['Cluster'],
-                    'User_Age': item_user['Age'],
-                    'User_Gender': item_user['Gender'],
-                    'User_Location': item_user['Location'],
-                    'User_Size': item_user['Size'],
-                    'User_Previous_Purchases': item_user['Previous Purchases'],
-                    'User_Frequency': item_user['Frequency of Purchases'],
-                    'User_Subscription': item_user['Subscription Status']
-                }
-                final_recommendations.append(recommendation)
+            # Önerileri hazırla; ürün ve kullanıcı özellikleri biçimlendirilirken okunur
+            recommendations = RecommendationResult.single(
+                self.item_df, self.user_df, user_id, positions, self._purchasers(positions), scores,
+                CLUSTER_LAYOUT, {'User_Cluster': np.full(len(positions), user_cluster),
+                                 'Item_Cluster': self.item_clusters[positions]})
             
-            print(f"\nToplam önerilen ürün sayısı: {len(final_recommendations)}")
+            print(f"\nToplam önerilen ürün sayısı: {len(recommendations)}")
             
             # Hedef ürün bilgilerini hazırla
             target_dict = user_item.to_dict()
+            target_dict['Cluster'] = self.item_clusters[user_idx]
             target_dict['Purchase Amount'] = target_dict.pop('Purchase Amount (USD)', 0)
             
-            return pd.DataFrame(final_recommendations), target_dict
+            return recommendations, target_dict
+            
+        except CustomerNotFoundError as e:
+            print(f"Uyarı: {str(e)}")
+            return self._empty_result(), None
             
         except Exception as e:
             import traceback
             print(f"Kümeleme önerisi hatası: {str(e)}")
             print("Hata detayı:")
             print(traceback.format_exc())
-            return pd.DataFrame(), None
+            return self._empty_result(), None
+
+
+    def _empty_result(self):
+        return RecommendationResult.empty_for(self.item_df, self.user_df, CLUSTER_LAYOUT)
+
+
+    def _purchasers(self, item_rows):
+        """Ürün satırlarını satın alan müşterilerin user_df konumları"""
+        return self.customer_index.positions(self.item_df['Customer ID'].to_numpy()[item_rows])
+
+
+    @profiler.timed('cluster.recommend_batch')
+    def recommend_batch(self, user_ids, n_recommendations=5):
+        """
+        Birden çok kullanıcı için küme bazlı önerileri matris işlemleriyle hesaplar.
+        
+        Dönüş:
+        RecommendationResult: Kullanıcı ve sıra sırasıyla öneriler. Bulunamayan kullanıcılar atlanır.
+        """
+        user_ids = np.asarray(user_ids)
+        user_positions = self.customer_index.positions(user_ids)
+        found = user_positions >= 0
+        user_ids, user_positions = user_ids[found], user_positions[found]
+        user_clusters = self.user_clusters[user_positions]
+        item_customers = self.item_df['Customer ID'].to_numpy()
+        
+        # Bellek sınırı için kullanıcıları bloklar halinde skorla; blok boyutu müşteri başına
+        # ortalama geçmiş ürün sayısına göre küçültülür
+        n_items = len(self.item_df)
+        history_size = self.interactions.matrix.nnz / max(len(self.interactions), 1)
+        step = max(1, int(DEFAULT_BLOCK_CELLS // (max(n_items, 1) * max(history_size, 1))))
+        query_rows, ranks, item_positions, scores = [], [], [], []
+        for start in range(0, len(user_ids), step):
+            stop = min(start + step, len(user_ids))
+            # Her kullanıcının skorları geçmişindeki ürünlere göre skorların ağırlıklı ortalamasıdır
+            owners, target_rows, weights = self._history_targets(user_positions[start:stop])
+            block = self._combine_targets(
+                self.score_items_batch(target_rows, user_clusters[start:stop][owners]),
+                owners, weights)
+            profiler.count('cluster.items_scored', block.size)
+            
+            # Kullanıcının kendi ürünlerini dışla
+            block[item_customers[None, :] == user_ids[start:stop, None]] = -np.inf
+            
+            indices, block_scores, counts = select_top_k(block, n_recommendations)
+            valid = np.arange(indices.shape[1]) < counts[:, None]
+            rows, block_ranks = np.nonzero(valid)
+            query_rows.append(rows + start)
+            ranks.append(block_ranks)
+            item_positions.append(indices[valid])
+            scores.append(block_scores[valid])
+        
+        query_rows = np.concatenate(query_rows) if query_rows else np.array([], dtype=np.int64)
+        item_positions = np.concatenate(item_positions) if item_positions else np.array([], dtype=np.int64)
+        ranks = np.concatenate(ranks) if ranks else np.array([], dtype=np.int64)
+        scores = np.concatenate(scores) if scores else np.array([], dtype=float)
+        
+        return RecommendationResult(
+            self.item_df, self.user_df, user_ids[query_rows], ranks + 1, item_positions,
+            self._purchasers(item_positions), scores, CLUSTER_LAYOUT,
+            {'User_Cluster': user_clusters[query_rows],
+             'Item_Cluster': self.item_clusters[item_positions]})
+
+
+    def get_recommendations_batch(self, user_ids, n_recommendations=5):
+        """
+        recommend_batch sonucunu DataFrame olarak döndürür.
+        
+        Dönüş:
+        pd.DataFrame: Her öneri bir satır; 'User ID' ve 'Rank' sütunlarına ek olarak
+        get_cluster_recommendations ile aynı sütunlar. Bulunamayan kullanıcılar atlanır.
+        """
+        return self.recommend_batch(user_ids, n_recommendations).to_frame()
 
 
+    @profiler.timed('cluster.insights')
     def get_cluster_insights(self):
         """Kümeleme analizi sonuçlarını döndürür"""
         insights = {
@@ -236,7 +767,7 @@ class ClusteringRecommender:
         
         # Kullanıcı kümeleri için içgörüler
         for cluster in range(self.n_user_clusters):
-            cluster_users = self.user_df[self.user_df['Cluster'] == cluster]
+            cluster_users = self.user_df[self.user_clusters == cluster]
             insights['user_clusters'][cluster] = {
                 'size': len(cluster_users),
                 'avg_age': cluster_users['Age'].mean(),
@@ -248,7 +779,7 @@ class ClusteringRecommender:
             
         # Ürün kümeleri için içgörüler
         for cluster in range(self.n_item_clusters):
-            cluster_items = self.item_df[self.item_df['Cluster'] == cluster]
+            cluster_items = self.item_df[self.item_clusters == cluster]
             insights['item_clusters'][cluster] = {
                 'size': len(cluster_items),
                 'common_category': cluster_items['Category'].mode()[0],
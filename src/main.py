@@ -1,13 +1,21 @@
 # main.py
 
 import argparse
-import sys
-from models.collaborative_user.user_recommender import UserBasedRecommender
-from models.collaborative_item.item_recommender import ItemBasedRecommender
-from models.kmeans_hybrid.cluster_recommender import ClusteringRecommender
+import json
 from common.utils import RecommendationFormatter
-from common.evaluation import evaluate_recommenders
-from common.data_preprocessing import split_dataset
+from common.profiling import profiler
+
+# Modeller, değerlendirme, kalıcılık, sunucu ve dışa aktarım modülleri yalnızca seçilen
+# modda içe aktarılır; böylece ör. --help joblib'i, --mode item ise KMeans, kneed ve
+# matplotlib'i yüklemez. Bu nedenle aşağıdaki varsayılanlar modüllerdeki sabitlerin
+# (DEFAULT_ARTIFACT_DIR, DEFAULT_CACHE_SIZE, DEFAULT_MAX_WAIT, DEFAULT_MAX_BATCH,
+# DEFAULT_EXPORT_DIR, EXPORT_FORMATS) kopyasıdır
+DEFAULT_ARTIFACT_DIR = './artifacts'
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_MAX_WAIT_MS = 2.0
+DEFAULT_MAX_BATCH = 64
+DEFAULT_EXPORT_DIR = './exports'
+EXPORT_FORMATS = ('parquet', 'csv')
 
 def print_cluster_insights(insights):
     """Kümeleme analizi sonuçlarını formatlar ve ekrana basar"""
@@ -32,7 +40,125 @@ def print_cluster_insights(insights):
     print("="*50)
 
 
-def main():
+def print_memory_report(components):
+    """Bileşen başına bellek kullanımını yazdırır (paylaşılan diziler ilk bileşene sayılır)"""
+    from common.memory import format_memory_report, memory_report
+    
+    print("\nBELLEK KULLANIMI:")
+    print(format_memory_report(memory_report(components)))
+
+
+def load_all_recommenders(args, data_path):
+    """
+    Üç modeli paylaşılan nesnelerle bir kez eğitir ya da kayıttan yükler.
+    
+    Dönüş:
+    (dict, dict): Mod adı -> model ve bellek raporu için paylaşılan bileşenler
+    (veri deposu, müşteri indeksi, kodlanmış özellikler, katalog, etkileşimler)
+    """
+    from models.collaborative_user.user_recommender import UserBasedRecommender
+    from models.collaborative_item.item_recommender import ItemBasedRecommender
+    from models.kmeans_hybrid.cluster_recommender import ClusteringRecommender
+    from common.data_preprocessing import FeatureCache, split_dataset
+    from common.persistence import load_or_fit
+    from common.customer_index import CustomerIndex
+    from common.catalog import ProductCatalog
+    from common.interactions import InteractionMatrix
+    
+    user_df, item_df = split_dataset(data_path)
+    features = FeatureCache(sparse=args.sparse)
+    customer_index = CustomerIndex.from_frame(item_df)
+    # Ürün bazlı ve küme bazlı modeller aynı benzersiz ürün kataloğunu kullanır
+    catalog = ProductCatalog.from_frame(item_df, sparse=args.sparse)
+    # Üç model aynı müşteri × ürün etkileşim matrisini kullanır
+    interactions = InteractionMatrix.from_frame(item_df, catalog)
+    shared = dict(artifact_dir=args.artifact_dir, refit=args.refit,
+                  features=features, customer_index=customer_index)
+    
+    cluster = load_or_fit(ClusteringRecommender, user_df, item_df, data_path,
+                          elbow_options={'n_jobs': args.jobs}, catalog=catalog,
+                          interactions=interactions, **shared)
+    # IVF indeksleri ayrı bir KMeans eğitmek yerine küme modelinin kümelerini liste olarak kullanır
+    user_options, item_options = {}, {}
+    if args.neighbors == 'ivf':
+        customer_clusters, product_clusters = cluster.neighbor_clusters()
+        user_options, item_options = {'clusters': customer_clusters}, {'clusters': product_clusters}
+    
+    recommenders = {
+        'user': load_or_fit(UserBasedRecommender, user_df, item_df, data_path,
+                            neighbor_backend=args.neighbors, backend_options=user_options,
+                            interactions=interactions, **shared),
+        'item': load_or_fit(ItemBasedRecommender, user_df, item_df, data_path,
+                            neighbor_backend=args.neighbors, backend_options=item_options,
+                            catalog=catalog, interactions=interactions, **shared),
+        'cluster': cluster
+    }
+    components = {'dataset': recommenders['user'].dataset, 'customer_index': customer_index,
+                  'features': features, 'catalog': catalog, 'interactions': interactions}
+    return recommenders, components
+
+
+def serve(args, data_path):
+    """Üç modeli bir kez eğitip/yükleyip bellekte tutar ve HTTP üzerinden önerileri sunar"""
+    from common.server import RecommendationService, make_server
+    
+    recommenders, components = load_all_recommenders(args, data_path)
+    customer_index = components['customer_index']
+    service = RecommendationService(recommenders, customer_index, cache_size=args.cache_size,
+                                    max_wait=args.max_wait_ms / 1000, max_batch=args.max_batch)
+    if args.memory_report:
+        print_memory_report({**components, **recommenders, 'cache': service.cache})
+    server = make_server(service, args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"\nÖneri sunucusu çalışıyor: http://{host}:{port}")
+    print(f"  - Öneri: /recommend?user_id=<id>&mode=<user|item|cluster>&n=<sayı>")
+    print(f"  - İstatistikler: /stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nSunucu durduruluyor...")
+    finally:
+        server.server_close()
+        service.close()
+
+
+def export(args, data_path):
+    """Tüm kullanıcılar için her moddaki önerileri parça parça hesaplayıp dosyalara yazar"""
+    from common.export import export_recommendations, format_export_summary
+    
+    recommenders, components = load_all_recommenders(args, data_path)
+    if args.memory_report:
+        print_memory_report({**components, **recommenders})
+    
+    metrics = export_recommendations(
+        recommenders,
+        components['customer_index'].ids,
+        args.export_dir,
+        n_recommendations=args.num_recommendations,
+        file_format=args.export_format,
+        n_jobs=args.jobs
+    )
+    print("\nDIŞA AKTARIM ÖZETİ:")
+    print(format_export_summary(metrics))
+
+
+def report_profile(profile_format, output_path=None):
+    """Toplanan aşama süreleri ve sayaçları metin tablosu ya da JSON olarak yazar"""
+    if profile_format == 'json':
+        content = json.dumps(profiler.report(), indent=2, ensure_ascii=False)
+    else:
+        content = profiler.format_report()
+    
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        print(f"\nProfil kaydedildi: {output_path}")
+    else:
+        print(content)
+
+
+def build_parser():
+    """Komut satırı seçeneklerini tanımlar"""
     parser = argparse.ArgumentParser(description='Alışveriş Öneri Sistemi')
     
     # user_id artık sadece recommendation modunda zorunlu
@@ -46,30 +172,113 @@ def main():
                       help='Modelleri değerlendirme modunu aktifleştirir')
     parser.add_argument('--n_test_users', type=int, default=100,
                       help='Değerlendirme için kullanılacak test kullanıcısı sayısı')
-    
+    parser.add_argument('--data_path', default='./data/shopping_trends_updated.csv',
+                      help='Veri seti dosyası (CSV, Parquet veya Feather)')
+    parser.add_argument('--artifact_dir', default=DEFAULT_ARTIFACT_DIR,
+                      help='Eğitilmiş modellerin kaydedileceği/yükleneceği dizin')
+    parser.add_argument('--refit', action='store_true',
+                      help='Kaydedilmiş model olsa bile modeli yeniden eğitir')
+    parser.add_argument('--sparse', action='store_true',
+                      help='Kodlanmış özellikleri baştan sona seyrek (CSR) matris olarak tutar')
+    parser.add_argument('--neighbors', choices=['exact', 'ivf', 'lsh'], default='exact',
+                      help='Kullanıcı/ürün bazlı modlarda komşu arama motoru: exact (tam), '
+                           'ivf (KMeans listeleri) veya lsh (rastgele hiperdüzlem)')
+    parser.add_argument('--jobs', type=int, default=1,
+                      help='Paralel süreç sayısı (değerlendirmede, dışa aktarımda ve küme modunda '
+                           'optimal k araması için)')
+    parser.add_argument('--seed', type=int, default=42,
+                      help='Değerlendirmede test kullanıcılarını seçen rastgele tohum')
+    parser.add_argument('--serve', action='store_true',
+                      help='Modelleri bellekte tutan yerel HTTP öneri sunucusunu başlatır')
+    parser.add_argument('--host', default='127.0.0.1',
+                      help='Sunucu modunda dinlenecek adres')
+    parser.add_argument('--port', type=int, default=8000,
+                      help='Sunucu modunda dinlenecek port')
+    parser.add_argument('--cache_size', type=int, default=DEFAULT_CACHE_SIZE,
+                      help='Sunucu modunda sonuç önbelleğinin kayıt sınırı (0: önbellek kapalı)')
+    parser.add_argument('--max_wait_ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                      help='Sunucu modunda eşzamanlı isteklerin toplu hesaplama için bekleyeceği '
+                           'en uzun süre (milisaniye)')
+    parser.add_argument('--max_batch', type=int, default=DEFAULT_MAX_BATCH,
+                      help='Sunucu modunda tek toplu hesaplamadaki en fazla istek sayısı '
+                           '(1: toplu hesaplama kapalı)')
+    parser.add_argument('--export', action='store_true',
+                      help='Tüm kullanıcılar için her moddaki önerileri dosyalara yazar (toplu dışa aktarım)')
+    parser.add_argument('--export_dir', default=DEFAULT_EXPORT_DIR,
+                      help='Dışa aktarım modunda mod başına dosyaların yazılacağı dizin')
+    parser.add_argument('--export_format', choices=EXPORT_FORMATS, default='parquet',
+                      help='Dışa aktarım dosya formatı: parquet veya csv')
+    parser.add_argument('--memory_report', action='store_true',
+                      help='Modeller hazırlandıktan sonra veri deposu, kodlanmış özellikler ve '
+                           'modellerin bellek kullanımını yazdırır')
+    parser.add_argument('--profile', nargs='?', const='text', choices=['text', 'json'],
+                      help='Çalışma sonunda aşama sürelerini ve sayaçları yazdırır (text veya json)')
+    parser.add_argument('--profile_output',
+                      help='Profil çıktısının kaydedileceği dosya (verilmezse ekrana yazılır)')
+    return parser
+
+
+def main():
+    parser = build_parser()
     args = parser.parse_args()
     
+    # Aşama ölçümü yalnızca --profile ile açılır; kapalıyken ölçüm noktaları iş yapmaz
+    if args.profile:
+        profiler.enable()
+    try:
+        run(args, parser)
+    finally:
+        if args.profile:
+            report_profile(args.profile, args.profile_output)
+
+
+def run(args, parser):
+    """Seçilen modu (değerlendirme, sunucu ya da tek kullanıcı önerisi) çalıştırır"""
     # Veriyi yükle ve böl
-    data_path = "./data/shopping_trends_updated.csv"
+    data_path = args.data_path
     
     # Eğer değerlendirme modu seçildiyse
     if args.evaluate:
+        from common.evaluation import evaluate_recommenders
+        
         print("\nModeller değerlendiriliyor...")
         results, ranges = evaluate_recommenders(
             data_path,
-            n_test_users=args.n_test_users
+            n_test_users=args.n_test_users,
+            n_jobs=args.jobs,
+            seed=args.seed,
+            report_memory=args.memory_report
         )
         return
+    
+    # Sunucu modu seçildiyse
+    if args.serve:
+        serve(args, data_path)
+        return
+    
+    # Toplu dışa aktarım modu seçildiyse
+    if args.export:
+        export(args, data_path)
+        return
         
     # Değerlendirme modu değilse, user_id zorunlu
     if not args.user_id:
         parser.error("Öneri modu için --user_id parametresi gereklidir")
     
+    from common.data_preprocessing import FeatureCache, split_dataset
+    from common.persistence import load_or_fit
+    
     user_df, item_df = split_dataset(data_path)
+    features = FeatureCache(sparse=args.sparse)
     
     if args.mode == 'cluster':
+        from models.kmeans_hybrid.cluster_recommender import ClusteringRecommender
+        
         print("\nKüme bazlı öneriler hazırlanıyor...")
-        recommender = ClusteringRecommender(user_df, item_df)
+        recommender = load_or_fit(
+            ClusteringRecommender, user_df, item_df, data_path,
+            artifact_dir=args.artifact_dir, refit=args.refit, features=features,
+            elbow_options={'n_jobs': args.jobs})
         
         # Küme içgörülerini göster
         insights = recommender.get_cluster_insights()
@@ -90,8 +299,13 @@ def main():
             ))
     
     elif args.mode == 'user':
+        from models.collaborative_user.user_recommender import UserBasedRecommender
+        
         print("\nKullanıcı bazlı öneriler hazırlanıyor...")
-        recommender = UserBasedRecommender(user_df, item_df)
+        recommender = load_or_fit(
+            UserBasedRecommender, user_df, item_df, data_path,
+            artifact_dir=args.artifact_dir, refit=args.refit, features=features,
+            neighbor_backend=args.neighbors)
         recommendations, target_info = recommender.get_recommendations(
             args.user_id,
             args.num_recommendations
@@ -106,8 +320,13 @@ def main():
             ))
     
     else:  # item mode
+        from models.collaborative_item.item_recommender import ItemBasedRecommender
+        
         print("\nÜrün bazlı öneriler hazırlanıyor...")
-        recommender = ItemBasedRecommender(user_df, item_df)
+        recommender = load_or_fit(
+            ItemBasedRecommender, user_df, item_df, data_path,
+            artifact_dir=args.artifact_dir, refit=args.refit, features=features,
+            neighbor_backend=args.neighbors)
         recommendations, target_item = recommender.get_recommendations(
             args.user_id,
             args.num_recommendations
@@ -120,6 +339,10 @@ def main():
                 include_user_info=False,
                 mode='ürün'
             ))
+    
+    if args.memory_report:
+        print_memory_report({'dataset': recommender.dataset, 'customer_index': recommender.customer_index,
+                             'features': features, args.mode: recommender})
 
 
 if __name__ == "__main__":
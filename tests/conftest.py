@@ -0,0 +1,85 @@
+import os
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from common.data_preprocessing import split_dataset
+from common.persistence import new_model_version
+from models.collaborative_user.user_recommender import UserBasedRecommender
+from models.collaborative_item.item_recommender import ItemBasedRecommender
+from models.kmeans_hybrid.cluster_recommender import ClusteringRecommender
+
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'shopping_trends_updated.csv')
+
+# Toplu ve tek kullanıcılık yolların karşılaştırıldığı kullanıcılar (999999 veri setinde yok)
+TEST_USERS = [1, 2, 569, 3900, 999999]
+
+# Artımlı güncelleme testlerinde model ilk satırlarla eğitilir, kalanlar iki parça halinde eklenir
+UPDATE_SPLITS = (3500, 3700)
+
+
+@pytest.fixture(scope='session')
+def datasets():
+    return split_dataset(DATA_PATH)
+
+
+@pytest.fixture(scope='session')
+def recommenders(datasets):
+    user_df, item_df = datasets
+    with contextlib.redirect_stdout(io.StringIO()):
+        return {
+            'user': UserBasedRecommender(user_df, item_df, n_neighbors=10),
+            'item': ItemBasedRecommender(user_df, item_df, n_neighbors=10),
+            'cluster': ClusteringRecommender(user_df, item_df)
+        }
+
+
+def single_recommendations(recommender, user_id, n):
+    """Tek kullanıcılık yolun önerileri; toplu sonuçlarla karşılaştırmak için sorgu sütunları olmadan"""
+    single = getattr(recommender, 'get_cluster_recommendations', None) or recommender.get_recommendations
+    with contextlib.redirect_stdout(io.StringIO()):
+        recommendations, _ = single(user_id, n)
+    return recommendations.to_frame(include_query=False)
+
+
+def fit_then_update(recommender_cls, datasets, **options):
+    """
+    Modeli ilk UPDATE_SPLITS[0] satırla eğitir ve kalan satırları iki update ile ekler.
+
+    Dönüş:
+    (recommender, rows): Güncellenmiş model ve tüm satırlar
+    """
+    user_df, item_df = datasets
+    rows = pd.concat([user_df, item_df.drop(columns=['Customer ID'])], axis=1)
+    first, second = UPDATE_SPLITS
+    base = rows.iloc[:first]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        recommender = recommender_cls(base[user_df.columns], base[item_df.columns], **options)
+        version = recommender.model_version
+        recommender.update(rows.iloc[first:second]).update(rows.iloc[second:])
+    assert recommender.model_version != version
+    assert len(recommender.item_df) == len(rows)
+    return recommender, rows
+
+
+class CountingRecommender:
+    """Sarmaladığı modelin recommend_batch çağrılarını ve her çağrının kullanıcı sayısını kaydeder"""
+
+    def __init__(self, recommender):
+        self.recommender = recommender
+        self.model_version = new_model_version()
+        self.batch_sizes = []
+
+
+    @property
+    def calls(self):
+        return len(self.batch_sizes)
+
+
+    def recommend_batch(self, user_ids, n_recommendations):
+        self.batch_sizes.append(len(user_ids))
+        return self.recommender.recommend_batch(user_ids, n_recommendations)
@@ -0,0 +1,59 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from common.batching import MicroBatcher
+from tests.conftest import CountingRecommender
+
+
+def run_concurrently(batcher, requests):
+    results = [None] * len(requests)
+    start = threading.Barrier(len(requests))
+
+    def call(index, mode, user_id, n_recommendations):
+        start.wait()
+        results[index] = batcher.recommend(mode, user_id, n_recommendations)
+
+    threads = [threading.Thread(target=call, args=(index, *request))
+               for index, request in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_requests_share_one_batch(recommenders):
+    counting = {mode: CountingRecommender(recommenders[mode]) for mode in ('user', 'item')}
+    batcher = MicroBatcher(counting, max_wait=0.5, max_batch=8)
+
+    # Aynı moddaki istekler (farklı n'ler dahil) birlikte hesaplanır
+    requests = [('user', user_id, 5) for user_id in [1, 2, 3, 569, 2]] + \
+        [('user', 4, 3), ('item', 5, 5), ('item', 6, 5)]
+    try:
+        results = run_concurrently(batcher, requests)
+    finally:
+        batcher.close()
+
+    for (mode, user_id, n_recommendations), result in zip(requests, results):
+        pd.testing.assert_frame_equal(
+            result.to_frame(), recommenders[mode].get_recommendations_batch([user_id], n_recommendations))
+
+    assert counting['user'].batch_sizes == [5] and counting['item'].batch_sizes == [2]
+    stats = batcher.stats()
+    assert (stats['batches'], stats['requests'], stats['largest_batch']) == (1, 8, 8)
+    assert stats['queue_p50_ms'] <= stats['queue_p99_ms']
+
+
+def test_errors_reach_each_caller(recommenders):
+    batcher = MicroBatcher(recommenders, max_wait=0.0)
+    try:
+        with pytest.raises(KeyError):
+            batcher.recommend('nope', 1, 5)
+        assert len(batcher.recommend('cluster', 1, 5)) == 5
+    finally:
+        batcher.close()
+
+    with pytest.raises(RuntimeError):
+        batcher.recommend('cluster', 1, 5)
@@ -0,0 +1,35 @@
+import pytest
+
+from benchmarks.recommender_benchmark import compare_to_baseline, run_case
+from benchmarks.synthetic import generate_dataset
+from common.data_preprocessing import DATASET_COLUMNS, load_dataset
+from tests.conftest import DATA_PATH
+
+
+def test_synthetic_dataset_follows_schema():
+    source = load_dataset(DATA_PATH)
+    frame = generate_dataset(500, seed=1, data_path=DATA_PATH)
+    assert list(frame.columns) == DATASET_COLUMNS
+    assert frame['Customer ID'].is_unique
+    assert set(frame['Category']) <= set(source['Category'])
+    assert frame.equals(generate_dataset(500, seed=1, data_path=DATA_PATH))
+
+
+@pytest.mark.parametrize("mode", ['user', 'cluster'])
+def test_run_case_reports_metrics(mode):
+    result = run_case(600, mode, n_queries=5, batch_size=50, data_path=DATA_PATH)
+    assert result['rows'] == 600 and result['mode'] == mode
+    for metric in ['fit_s', 'query_p50_ms', 'query_p99_ms', 'batch_users_per_s', 'peak_rss_mb']:
+        assert result[metric] > 0
+
+
+def test_compare_to_baseline_flags_only_regressions():
+    baseline = [{'rows': 100, 'mode': 'user', 'fit_s': 1.0, 'query_p50_ms': 2.0,
+                 'batch_users_per_s': 1000.0, 'peak_rss_mb': 100.0}]
+    current = [{'rows': 100, 'mode': 'user', 'fit_s': 1.1, 'query_p50_ms': 3.0,
+                'batch_users_per_s': 500.0, 'peak_rss_mb': 60.0},
+               {'rows': 200, 'mode': 'user', 'fit_s': 9.0}]
+
+    regressions = compare_to_baseline(current, baseline, tolerance=0.25)
+    assert {entry['metric'] for entry in regressions} == {'query_p50_ms', 'batch_users_per_s'}
+    assert compare_to_baseline(current, baseline, tolerance=1.0) == []
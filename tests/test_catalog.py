@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from common.catalog import PRODUCT_COLUMNS, ProductCatalog
+
+
+def test_catalog_deduplicates_products(datasets):
+    _, item_df = datasets
+    catalog = ProductCatalog.from_frame(item_df)
+
+    expected_codes, expected_products = pd.MultiIndex.from_frame(item_df[PRODUCT_COLUMNS]).factorize()
+    np.testing.assert_array_equal(catalog.codes, expected_codes)
+    assert len(catalog) == len(expected_products) < len(item_df)
+    assert catalog.purchase_counts.sum() == len(item_df)
+
+    # Her ürün ilk alışverişine eşlenir; ortalama fiyat alışverişlerin ortalamasıdır
+    pd.testing.assert_frame_equal(
+        catalog.products[PRODUCT_COLUMNS],
+        item_df[PRODUCT_COLUMNS].iloc[catalog.first_rows].reset_index(drop=True))
+    prices = item_df['Purchase Amount (USD)'].groupby(catalog.codes).mean()
+    np.testing.assert_allclose(catalog.products['Purchase Amount (USD)'], prices.to_numpy())
+    np.testing.assert_array_equal(catalog.lookup(item_df.iloc[:50]), catalog.codes[:50])
+
+
+def test_catalog_extend_keeps_product_ids(datasets):
+    _, item_df = datasets
+    base = ProductCatalog.from_frame(item_df.iloc[:3000])
+    encoded = base.encode(PRODUCT_COLUMNS)
+    extended = base.extend(item_df)
+
+    np.testing.assert_array_equal(extended.codes, ProductCatalog.from_frame(item_df).codes)
+    assert extended.features is base.features
+    np.testing.assert_array_equal(extended.encode(PRODUCT_COLUMNS)[:len(base)], encoded)
+
+
+def test_item_recommendations_are_distinct_products(recommenders):
+    recommender = recommenders['item']
+    batch = recommender.get_recommendations_batch([1, 2, 569, 3900], 10)
+    products = recommender.catalog.lookup(batch)
+
+    assert (products >= 0).all()
+    for user_id, group in pd.Series(products).groupby(batch['User ID'].to_numpy()):
+        assert group.is_unique
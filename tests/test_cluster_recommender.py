@@ -0,0 +1,68 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from common import MIN_SIMILARITY_THRESHOLD
+from models.kmeans_hybrid.cluster_recommender import ClusteringRecommender
+from tests.conftest import UPDATE_SPLITS, fit_then_update
+
+
+def test_elbow_search_parallel_and_budgeted(recommenders):
+    recommender = recommenders['cluster']
+    data, weights = recommender.encoded_items, recommender.catalog.purchase_counts
+
+    serial_k, serial_report = recommender.elbow_search(data, sample_weight=weights)
+    parallel_k, parallel_report = recommender.elbow_search(data, n_jobs=2, sample_weight=weights)
+    assert serial_k == parallel_k == recommender.n_item_clusters
+    assert [entry['inertia'] for entry in serial_report] == [entry['inertia'] for entry in parallel_report]
+    assert all(entry['fit_time'] >= 0 for entry in serial_report)
+
+    # Süre bittiğinde dirsek noktası sabitlenince arama erken durur
+    budget_k, budget_report = recommender.elbow_search(
+        data, time_budget=0, patience=1, sample_weight=weights)
+    assert len(budget_report) < len(serial_report)
+    assert budget_k == serial_k
+
+
+@pytest.mark.parametrize("n", [1, 5, 50])
+def test_bucket_pruning_matches_full_scoring(recommenders, n):
+    recommender = recommenders['cluster']
+    customers = recommender.item_df['Customer ID'].to_numpy()
+
+    for user_id in [1, 2, 569, 3900]:
+        idx = recommender.customer_index.position(user_id)
+        cluster = recommender.user_clusters[idx]
+        positions, scores, n_scored = recommender.score_top_items(
+            idx, cluster, n, exclude_customer=user_id)
+
+        candidates = np.flatnonzero(customers != user_id)
+        full = recommender.score_items(idx, cluster, candidates)
+        order = np.argsort(-full, kind='stable')
+        order = order[full[order] >= MIN_SIMILARITY_THRESHOLD][:n]
+        np.testing.assert_array_equal(positions, candidates[order])
+        np.testing.assert_array_equal(scores, full[order])
+        assert n_scored < len(candidates)
+
+        # Hiçbir kova sınırı, içindeki ürünlerin gerçek skorunun altında kalmaz
+        bounds = recommender.bucket_upper_bounds(idx, cluster)
+        all_scores = recommender.score_items(idx, cluster, recommender.bucket_rows)
+        bucket_of = np.repeat(np.arange(len(bounds)), np.diff(recommender.bucket_offsets))
+        assert (all_scores <= bounds[bucket_of]).all()
+
+
+def test_incremental_update_assigns_new_rows_to_clusters(datasets):
+    cluster, rows = fit_then_update(ClusteringRecommender, datasets)
+
+    n_base = UPDATE_SPLITS[0]
+    new_products = cluster.catalog.codes[n_base:]
+    np.testing.assert_array_equal(
+        cluster.item_clusters[n_base:], cluster.item_clustering.predict(cluster.encoded_items[new_products]))
+    assert cluster.cluster_drift()['items'] < 0.5
+
+    # Eşik aşılırsa kümeler tüm veriyle yeniden eğitilir
+    with contextlib.redirect_stdout(io.StringIO()):
+        cluster.update(rows.iloc[:0], drift_threshold=-1.0)
+    assert cluster.drift_totals['users'][1] == 0
+    assert len(cluster.user_clusters) == len(rows)
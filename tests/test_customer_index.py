@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from common.customer_index import CustomerIndex, CustomerNotFoundError
+
+
+def test_customer_index_first_row_positions():
+    index = CustomerIndex([7, 3, 9, 3, 12])
+
+    assert len(index) == 4
+    assert index.position(3) == 1
+    assert index.position(np.int64(12)) == 4
+    assert 9 in index and 4 not in index
+    np.testing.assert_array_equal(index.positions([12, 4, 7, 3]), [4, -1, 0, 1])
+
+
+def test_customer_index_unknown_id():
+    index = CustomerIndex([1, 2, 3])
+
+    assert index.get(42) is None
+    with pytest.raises(CustomerNotFoundError) as excinfo:
+        index.position(42)
+    assert excinfo.value.customer_id == 42
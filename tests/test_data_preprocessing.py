@@ -0,0 +1,63 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse as sp
+
+from common.catalog import ProductCatalog
+from common.data_preprocessing import FeatureCache, split_dataset
+from models.collaborative_item.item_recommender import ItemBasedRecommender
+from models.kmeans_hybrid.cluster_recommender import ClusteringRecommender
+from tests.conftest import DATA_PATH, TEST_USERS
+
+
+def test_feature_cache_shares_encodings(datasets):
+    user_df, item_df = datasets
+    features, catalog = FeatureCache(), ProductCatalog.from_frame(item_df)
+    with contextlib.redirect_stdout(io.StringIO()):
+        item_recommender = ItemBasedRecommender(
+            user_df, item_df, n_neighbors=5, features=features, catalog=catalog)
+        cluster_recommender = ClusteringRecommender(
+            user_df, item_df, features=features, catalog=catalog)
+
+    assert cluster_recommender.encoded_similarity is item_recommender.encoded_items
+    assert item_recommender.encoded_items.dtype == np.float32
+
+    # Yeni satırlar eğitilmiş kodlayıcı ile yeniden eğitmeden kodlanır
+    encoder = catalog.features.encoder(item_recommender.item_features)
+    np.testing.assert_array_equal(
+        encoder.transform(catalog.products.iloc[:5]), item_recommender.encoded_items[:5])
+
+
+def test_sparse_pipeline_matches_dense(datasets, recommenders):
+    user_df, item_df = datasets
+    dense_features, sparse_features = FeatureCache(), FeatureCache(sparse=True)
+    np.testing.assert_array_equal(
+        sparse_features.encode(user_df).toarray(), dense_features.encode(user_df))
+
+    item_recommender = ItemBasedRecommender(user_df, item_df, n_neighbors=10, features=sparse_features)
+    assert sp.issparse(item_recommender.encoded_items)
+    pd.testing.assert_frame_equal(
+        item_recommender.get_recommendations_batch(TEST_USERS, 25),
+        recommenders['item'].get_recommendations_batch(TEST_USERS, 25))
+
+
+@pytest.mark.parametrize("fmt", ['csv-chunked', 'parquet', 'feather'])
+def test_typed_loader_formats(datasets, tmp_path, fmt):
+    user_df, item_df = datasets
+    assert isinstance(item_df['Category'].dtype, pd.CategoricalDtype)
+    assert item_df['Purchase Amount (USD)'].dtype.itemsize < 8
+
+    if fmt == 'csv-chunked':
+        loaded_user_df, loaded_item_df = split_dataset(DATA_PATH, chunksize=700)
+    else:
+        pytest.importorskip('pyarrow')
+        path = tmp_path / f"data.{fmt}"
+        frame = pd.read_csv(DATA_PATH)
+        frame.to_parquet(path) if fmt == 'parquet' else frame.to_feather(path)
+        loaded_user_df, loaded_item_df = split_dataset(str(path))
+
+    pd.testing.assert_frame_equal(user_df, loaded_user_df)
+    pd.testing.assert_frame_equal(item_df, loaded_item_df)
@@ -0,0 +1,67 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.data_preprocessing import DatasetStore, store_of
+from common.evaluation import RecommenderEvaluator
+from common.memory import memory_report
+
+
+def test_split_views_share_one_read_only_store(datasets, recommenders):
+    user_df, item_df = datasets
+    store = store_of(user_df)
+
+    assert store is not None and store_of(item_df) is store
+    assert np.shares_memory(user_df['Customer ID'].to_numpy(), item_df['Customer ID'].to_numpy())
+    with pytest.raises(ValueError):
+        user_df.iloc[0, user_df.columns.get_loc('Age')] = 99
+
+    # Modeller veri setini kopyalamaz; küme etiketleri ayrı dizilerde tutulur
+    for recommender in recommenders.values():
+        assert recommender.dataset is store
+        assert recommender.user_df is user_df and recommender.item_df is item_df
+    assert 'Cluster' not in item_df.columns
+    assert len(recommenders['cluster'].item_clusters) == len(item_df)
+
+
+def test_store_from_plain_frames_and_append(datasets):
+    user_df, item_df = datasets
+    plain_user, plain_item = user_df.head(100).copy(), item_df.head(100).copy()
+    store = DatasetStore.of(plain_user, plain_item)
+
+    assert len(store) == 100 and store.columns == list(dict.fromkeys([*plain_user, *plain_item]))
+    assert DatasetStore.of(store.view(plain_user.columns), store.view(plain_item.columns)) is store
+    pd.testing.assert_frame_equal(store.view(plain_item.columns), plain_item)
+
+    # Yeni satırlar yeni bir depo oluşturur; eski görünümler değişmez
+    rows = pd.concat([user_df, item_df.drop(columns=['Customer ID'])], axis=1).iloc[100:110]
+    extended = store.append(rows)
+    assert len(extended) == 110 and len(store) == 100
+    pd.testing.assert_frame_equal(extended.user_df.tail(10).reset_index(drop=True),
+                                  user_df.iloc[100:110].reset_index(drop=True))
+
+    with pytest.raises(ValueError):
+        DatasetStore.of(plain_user, plain_item.head(50))
+
+
+def test_memory_report_counts_shared_arrays_once(datasets):
+    user_df, item_df = datasets
+    with contextlib.redirect_stdout(io.StringIO()):
+        evaluator = RecommenderEvaluator(user_df, item_df)
+
+    assert evaluator.user_recommender.dataset is evaluator.dataset
+    report = memory_report(evaluator.memory_components())
+    components = report['components']
+
+    dataset_mb = sum(evaluator.dataset.memory_usage().values()) / 2**20
+    assert components['dataset']['memory_mb'] >= dataset_mb
+    assert components['features']['memory_mb'] > 0
+
+    # Paylaşılan veri deposu ve özellikler modellere tekrar sayılmaz
+    alone = memory_report({'user_based': evaluator.user_recommender})['components']['user_based']
+    assert alone['memory_mb'] > components['user_based']['memory_mb'] + dataset_mb
+    assert report['total_memory_mb'] == pytest.approx(
+        sum(entry['memory_mb'] for entry in components.values()))
@@ -0,0 +1,76 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from common.evaluation import RecommenderEvaluator
+
+
+# Önek değerlendirmesi her model için yeterince çok kullanıcıda doğrulanır
+TEST_USERS = [*range(1, 41), 569, 3900, 999999]
+RANGES = [3, 10, 25]
+
+
+@pytest.fixture(scope='module')
+def evaluator(datasets):
+    user_df, item_df = datasets
+    with contextlib.redirect_stdout(io.StringIO()):
+        return RecommenderEvaluator(user_df, item_df)
+
+
+def test_prefix_evaluation_matches_per_range_scores(evaluator):
+    with contextlib.redirect_stdout(io.StringIO()):
+        results, ranges = evaluator.evaluate_models(TEST_USERS, RANGES)
+    assert ranges == RANGES
+
+    models = {
+        'user_based': evaluator.user_recommender,
+        'item_based': evaluator.item_recommender,
+        'cluster_based': evaluator.cluster_recommender
+    }
+    for model_name, recommender in models.items():
+        for range_idx, n in enumerate(RANGES):
+            # Her n için ayrı öneri listesi ve kullanıcı başına skor
+            batch = recommender.get_recommendations_batch(TEST_USERS, n)
+            scores = [
+                evaluator.calculate_recommendation_score(
+                    user_id, batch[batch['User ID'] == user_id], n, model_name)
+                for user_id in TEST_USERS if (batch['User ID'] == user_id).any()
+            ]
+            expected = np.mean(scores) if scores else 0
+            assert results[model_name][range_idx] == pytest.approx(expected, abs=1e-12)
+
+
+def test_parallel_evaluation_is_bit_identical(evaluator, monkeypatch):
+    import common.evaluation as evaluation
+    monkeypatch.setattr(evaluation, 'EVAL_CHUNK_SIZE', 2)
+    users = [1, 2, 569, 3900, 999999, 17, 250]
+
+    runs = []
+    for n_jobs in (1, 3):
+        evaluator.results = {name: [] for name in evaluator.results}
+        with contextlib.redirect_stdout(io.StringIO()):
+            results, _ = evaluator.evaluate_models(users, RANGES, n_jobs=n_jobs)
+        runs.append(results)
+
+    assert runs[0] == runs[1]
+
+
+def test_parallel_evaluation_forks_or_runs_serially(evaluator, monkeypatch):
+    import common.evaluation as evaluation
+    from common.parallel import fork_context
+    context = fork_context()
+    assert context is None or context.get_start_method() == 'fork'
+
+    # fork yoksa değerlendirici alt süreçlere kopyalanmaz; parçalar seri puanlanır
+    def no_pool(*args, **kwargs):
+        raise AssertionError("süreç havuzu açılmamalı")
+
+    monkeypatch.setattr(evaluation, 'EVAL_CHUNK_SIZE', 2)
+    monkeypatch.setattr(evaluation, 'fork_context', lambda: None)
+    monkeypatch.setattr(evaluation, 'ProcessPoolExecutor', no_pool)
+    evaluator.results = {name: [] for name in evaluator.results}
+    with contextlib.redirect_stdout(io.StringIO()):
+        results, _ = evaluator.evaluate_models([1, 2, 569, 17], RANGES, n_jobs=3)
+    assert all(len(scores) == len(RANGES) for scores in results.values())
@@ -0,0 +1,46 @@
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from common.export import export_recommendations, format_export_summary
+
+
+@pytest.mark.parametrize("file_format, n_jobs", [('csv', 1), ('parquet', 2)])
+def test_export_matches_batch_recommendations(datasets, recommenders, tmp_path, file_format, n_jobs):
+    user_ids = datasets[0]['Customer ID'].to_numpy()[::5]
+    with contextlib.redirect_stdout(io.StringIO()):
+        metrics = export_recommendations(recommenders, user_ids, str(tmp_path), n_recommendations=3,
+                                         file_format=file_format, n_jobs=n_jobs, chunk_size=100)
+
+    for mode, recommender in recommenders.items():
+        expected = recommender.get_recommendations_batch(user_ids, 3)
+        path = tmp_path / f"{mode}.{file_format}"
+        exported = pd.read_csv(path) if file_format == 'csv' else pd.read_parquet(path)
+
+        pd.testing.assert_frame_equal(exported, expected, check_dtype=False)
+        assert metrics[mode]['users'] == len(user_ids) and metrics[mode]['rows'] == len(expected)
+    assert 'cluster' in format_export_summary(metrics)
+
+
+def test_export_without_users_writes_header(recommenders, tmp_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        export_recommendations({'item': recommenders['item']}, [], str(tmp_path), file_format='csv')
+
+    exported = pd.read_csv(tmp_path / "item.csv")
+    assert exported.empty and list(exported.columns[:2]) == ['User ID', 'Rank']
+
+
+def test_export_runs_serially_without_fork(recommenders, tmp_path, monkeypatch):
+    import common.export as export
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("süreç havuzu açılmamalı")
+
+    monkeypatch.setattr(export, 'fork_context', lambda: None)
+    monkeypatch.setattr(export, 'ProcessPoolExecutor', no_pool)
+    with contextlib.redirect_stdout(io.StringIO()):
+        metrics = export_recommendations({'item': recommenders['item']}, [1, 2, 3], str(tmp_path),
+                                         file_format='csv', n_jobs=2, chunk_size=1)
+    assert metrics['item']['users'] == 3
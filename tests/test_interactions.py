@@ -0,0 +1,159 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import normalize
+
+from common import MIN_SIMILARITY_THRESHOLD
+from common.catalog import ProductCatalog
+from common.interactions import InteractionMatrix
+from common.neighbors import TopKNeighborIndex
+from models.collaborative_user.user_recommender import UserBasedRecommender
+from models.collaborative_item.item_recommender import ItemBasedRecommender
+from models.kmeans_hybrid.cluster_recommender import ClusteringRecommender
+from common.evaluation import RecommenderEvaluator
+
+
+@pytest.fixture(scope='module')
+def purchase_log(datasets):
+    """İlk 300 müşterinin ikinci ve üçüncü alışverişlerini de içeren veri seti"""
+    user_df, item_df = datasets
+    rows = pd.concat([user_df, item_df.drop(columns=['Customer ID'])], axis=1)
+    repeats = []
+    for offset in (1500, 1800):
+        extra = rows.iloc[offset:offset + 300].copy()
+        extra[user_df.columns] = rows[user_df.columns].iloc[:300].to_numpy()
+        repeats.append(extra)
+    log = pd.concat([rows.iloc[:1500], *repeats], ignore_index=True)
+    return log[user_df.columns], log[item_df.columns]
+
+
+def test_interaction_matrix_and_profiles(datasets, purchase_log):
+    user_df, item_df = purchase_log
+    interactions = InteractionMatrix.from_frame(item_df, ProductCatalog.from_frame(item_df))
+
+    assert len(interactions) == 1500 and not interactions.single_purchase
+    assert interactions.matrix.sum() == len(item_df)
+    np.testing.assert_array_equal(np.flatnonzero(interactions.customer_codes == 0), [0, 1500, 1800])
+    np.testing.assert_allclose(interactions.weights.sum(axis=1), 1.0, rtol=1e-6)
+
+    # Her hücre müşterinin o ürünü aldığı ilk satıra eşlenir
+    owners, cells = interactions.cells_of([0])
+    np.testing.assert_array_equal(np.sort(interactions.cell_rows[cells]), [0, 1500, 1800])
+
+    encoded = np.arange(len(item_df) * 2, dtype=np.float32).reshape(-1, 2)
+    np.testing.assert_allclose(interactions.profiles(encoded)[0], encoded[[0, 1500, 1800]].mean(axis=0))
+
+    # Her müşterinin tek alışverişi varsa profiller satırların kendisidir
+    single = InteractionMatrix.from_frame(datasets[1], ProductCatalog.from_frame(datasets[1]))
+    assert single.single_purchase and single.profiles(encoded) is encoded
+
+
+def test_item_recommendations_use_full_history(purchase_log):
+    user_df, item_df = purchase_log
+    with contextlib.redirect_stdout(io.StringIO()):
+        recommender = ItemBasedRecommender(user_df, item_df, n_neighbors=2000)
+    catalog = recommender.catalog
+    history = catalog.codes[[0, 1500, 1800]]
+
+    batch = recommender.get_recommendations_batch([1], 20)
+    products = catalog.lookup(batch)
+    assert len(batch) == 20 and not np.isin(products, history).any()
+    
+
+    # Skor: geçmişteki ürünlere (eşik altı 0 sayılarak) ortalama benzerlik
+    normalized = normalize(recommender.encoded_items)
+    similarity = normalized[history] @ normalized.T
+    similarity[similarity < MIN_SIMILARITY_THRESHOLD] = 0
+    expected = similarity.mean(axis=0)
+    np.testing.assert_allclose(batch['Similarity'], expected[products], rtol=1e-5)
+    expected[history] = 0
+    assert batch['Similarity'].iloc[-1] >= np.sort(expected)[-20] - 1e-6
+
+
+def test_user_recommendations_use_customer_profiles(purchase_log):
+    user_df, item_df = purchase_log
+    with contextlib.redirect_stdout(io.StringIO()):
+        recommender = UserBasedRecommender(user_df, item_df, n_neighbors=10)
+    interactions = recommender.interactions
+    assert recommender.neighbor_index.indices.shape[0] == len(interactions)
+
+    neighbors, similarities = recommender.neighbor_index.neighbors(0, 10)
+    batch = recommender.get_recommendations_batch([1], 10)
+
+    # Sıralama skoru ürünü satın alan komşuların benzerlik toplamıdır; Similarity ise
+    # ürünü alan en benzer komşunun benzerliğidir
+    bought = interactions.matrix[neighbors].toarray() > 0
+    expected = similarities @ bought
+    best = np.where(bought, similarities[:, None], 0).max(axis=0)
+    products = interactions.catalog.lookup(batch)
+    np.testing.assert_allclose(batch['Neighbor_Score'], expected[products], rtol=1e-5)
+    np.testing.assert_allclose(batch['Similarity'], best[products], rtol=1e-5)
+    assert batch['Neighbor_Score'].is_monotonic_decreasing and products.size == np.unique(products).size
+    assert (batch['Similarity'] <= 1 + 1e-6).all()
+
+    # Yeni alışveriş mevcut bir müşterinin profilini değiştirir; yalnızca o müşterinin
+    # komşuları yeniden hesaplanır ve ilk k komşu baştan hesaplananla aynıdır
+    rows = pd.concat([user_df, item_df.drop(columns=['Customer ID'])], axis=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        recommender.update(rows.iloc[[5, 1600]])
+    refit = TopKNeighborIndex(10).fit(recommender.interactions.profiles(recommender.encoded_users))
+    customers = np.arange(len(recommender.interactions))
+    for expected, actual in zip(refit.neighbors_batch(customers, 10),
+                                recommender.neighbor_index.neighbors_batch(customers, 10)):
+        np.testing.assert_array_equal(expected, actual)
+
+
+def test_item_scores_independent_of_n_and_batch(purchase_log):
+    user_df, item_df = purchase_log
+    with contextlib.redirect_stdout(io.StringIO()):
+        recommender = ItemBasedRecommender(user_df, item_df, n_neighbors=5)
+    
+    # n <= n_neighbors için küçük n sonuçları büyük n sonuçlarının başıdır
+    five = recommender.get_recommendations_batch([1], 5)
+    pd.testing.assert_frame_equal(recommender.get_recommendations_batch([1], 3), five.head(3))
+    
+    # Daha büyük n komşu sayısıyla sınırlanmaz (tam yol)
+    large = recommender.get_recommendations_batch([1], 50)
+    assert len(large) == 50
+    
+    # Geçmiş uzunluğu farklı müşterilerle aynı toplu işte hesaplanan sonuçlar değişmez
+    for n in (5, 50):
+        batch = recommender.get_recommendations_batch([1000, 1, 3], n)
+        single = recommender.get_recommendations_batch([1], n)
+        pd.testing.assert_frame_equal(batch[batch['User ID'] == 1].reset_index(drop=True), single)
+
+
+def test_cluster_and_evaluation_targets_use_full_history(purchase_log):
+    user_df, item_df = purchase_log
+    with contextlib.redirect_stdout(io.StringIO()):
+        evaluator = RecommenderEvaluator(user_df, item_df)
+        cluster = evaluator.cluster_recommender
+        single, _ = cluster.get_cluster_recommendations(1, 10)
+    batch = cluster.recommend_batch([1, 1000], 10)
+    
+    # Skor: geçmişteki ürünlere göre skorların alışveriş sayısıyla ağırlıklı ortalaması
+    history_rows, weights = [0, 1500, 1800], np.full(3, 1 / 3)
+    expected = sum(weight * cluster.score_items(row, cluster.user_clusters[0])
+                   for row, weight in zip(history_rows, weights))
+    mine = batch.take(batch.user_ids == 1)
+    np.testing.assert_allclose(mine.scores, expected[mine.item_rows], rtol=1e-6)
+    np.testing.assert_array_equal(single.item_rows, mine.item_rows)
+    np.testing.assert_allclose(single.scores, mine.scores, rtol=1e-9)
+    
+    # Değerlendirme skoru da geçmişteki ürünlere göre skorların ağırlıklı ortalamasıdır
+    frame = mine.to_frame()
+    scores = evaluator.recommendation_scores(frame['User ID'].to_numpy(), frame, 'item_based')
+    history = evaluator.interactions.weights[0]
+    rec = evaluator.catalog.lookup(frame)
+    expected = np.zeros(len(frame))
+    for product, weight in zip(history.indices, history.data):
+        pair = evaluator.normalized_items[rec] @ evaluator.normalized_items[product]
+        for codes, bonus in [(evaluator.season_codes, evaluator.SEASON_BONUS),
+                             (evaluator.color_codes, evaluator.COLOR_BONUS),
+                             (evaluator.category_codes, evaluator.CATEGORY_BONUS)]:
+            pair = pair + np.where(codes[rec] == codes[product], bonus, 0.0)
+        expected += weight * np.minimum(1.0, pair)
+    np.testing.assert_allclose(scores, expected, rtol=1e-6)
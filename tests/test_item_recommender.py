@@ -0,0 +1,13 @@
+import numpy as np
+
+from common.neighbors import TopKNeighborIndex
+from models.collaborative_item.item_recommender import ItemBasedRecommender
+from tests.conftest import fit_then_update
+
+
+def test_incremental_update_matches_refit_neighbors(datasets):
+    recommender, _ = fit_then_update(ItemBasedRecommender, datasets, n_neighbors=10)
+
+    # Artımlı komşu listeleri, aynı kodlanmış matrisle baştan hesaplananlarla aynı
+    refit = TopKNeighborIndex(10).fit(recommender.encoded_items)
+    np.testing.assert_array_equal(recommender.neighbor_index.indices, refit.indices)
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+from sklearn.metrics.pairwise import cosine_similarity
+
+from common import MIN_SIMILARITY_THRESHOLD
+from common.neighbors import DEFAULT_SLACK, TopKNeighborIndex
+from common.profiling import profiler
+from common.ann import build_neighbor_index, neighbor_index_from_state
+
+
+def exact_neighbors(matrix, row, n):
+    """Tam N×N matris üzerinden referans sonuç"""
+    similarities = cosine_similarity(matrix)[row]
+    candidates = np.flatnonzero(similarities >= MIN_SIMILARITY_THRESHOLD)
+    candidates = candidates[candidates != row]
+    order = np.argsort(-similarities[candidates], kind='stable')
+    selected = candidates[order][:n]
+    return selected, similarities[selected]
+
+
+@pytest.fixture
+def one_hot_matrix():
+    # Çok sayıda eşit skor üretmek için az sayıda kategorik değer
+    rng = np.random.default_rng(0)
+    codes = rng.integers(0, 3, size=(300, 4))
+    matrix = np.zeros((300, 12))
+    for col in range(4):
+        matrix[np.arange(300), col * 3 + codes[:, col]] = 1.0
+    return matrix
+
+
+@pytest.mark.parametrize("n_neighbors, block_size, n", [(10, 7, 5), (10, 64, 10), (5, None, 40)])
+def test_neighbor_index_matches_exact(one_hot_matrix, n_neighbors, block_size, n):
+    index = TopKNeighborIndex(n_neighbors, block_size=block_size).fit(one_hot_matrix)
+    assert index.indices.shape == (300, n_neighbors + DEFAULT_SLACK)
+
+    for row in range(0, 300, 13):
+        indices, scores = index.neighbors(row, n)
+        expected_indices, expected_scores = exact_neighbors(one_hot_matrix, row, n)
+        np.testing.assert_array_equal(indices, expected_indices)
+        np.testing.assert_allclose(scores, expected_scores)
+
+
+@pytest.mark.parametrize("slack", [DEFAULT_SLACK, 0])
+def test_refresh_changed_rows_matches_refit(one_hot_matrix, slack):
+    rng = np.random.default_rng(6)
+    matrix = one_hot_matrix.copy()
+    index = TopKNeighborIndex(10, slack=slack).fit(matrix)
+
+    # İki tur: önce birkaç satır değişir, sonra değişikliklerle birlikte yeni satırlar eklenir
+    for changed, n_new in [(rng.choice(300, 5, replace=False), 0),
+                           (rng.choice(300, 40, replace=False), 20)]:
+        matrix = np.vstack([matrix, one_hot_matrix[rng.choice(300, n_new)]])
+        matrix[changed] = one_hot_matrix[rng.choice(300, len(changed))]
+        profiler.enable()
+        try:
+            index.refresh(matrix, changed)
+        finally:
+            profiler.disable()
+        refreshed_rows = profiler.report()['counters']['neighbors.refreshed_rows']
+
+        refit = TopKNeighborIndex(10, slack=slack).fit(matrix)
+        rows = np.arange(len(matrix))
+        for expected, actual in zip(refit.neighbors_batch(rows, 10), index.neighbors_batch(rows, 10)):
+            np.testing.assert_array_equal(expected, actual)
+        if slack:
+            # Yalnızca değişen/yeni satırlar ve kesin kısmı k'nın altına düşen az sayıda satır
+            assert refreshed_rows < len(changed) + n_new + len(matrix) // 4
+
+
+@pytest.mark.parametrize("backend, options", [('ivf', {'n_probe': 100}), ('lsh', {'n_tables': 1, 'n_bits': 0})])
+def test_ann_backends_exhaustive_settings_match_exact(backend, options):
+    # Tüm listeler taranınca / tek kovada yaklaşık arama tam aramaya eşit olmalı
+    rng = np.random.default_rng(3)
+    matrix = (rng.random((300, 10)) > 0.5).astype(np.float32)
+    exact = TopKNeighborIndex(10, threshold=0.3).fit(matrix)
+    approximate = build_neighbor_index(backend, 10, threshold=0.3, **options).fit(matrix)
+
+    rows = np.arange(0, 300, 7)
+    expected = exact.neighbors_batch(rows, 10)
+    actual = approximate.neighbors_batch(rows, 10)
+    np.testing.assert_array_equal(expected[2], actual[2])
+    np.testing.assert_allclose(expected[1], actual[1], rtol=1e-6)
+
+
+@pytest.mark.parametrize("backend", ['ivf', 'lsh'])
+def test_ann_backend_extend_and_state_roundtrip(backend):
+    rng = np.random.default_rng(4)
+    matrix = rng.random((400, 8)).astype(np.float32)
+    index = build_neighbor_index(backend, 5).fit(matrix[:350]).extend(matrix)
+    restored = neighbor_index_from_state(index.get_state())
+
+    rows = [0, 360, 399]
+    for expected, actual in zip(index.neighbors_batch(rows, 5), restored.neighbors_batch(rows, 5)):
+        np.testing.assert_array_equal(expected, actual)
+    assert restored.normalized.shape[0] == 400
+
+
+def test_ivf_uses_given_clusters_as_lists():
+    rng = np.random.default_rng(5)
+    matrix = (rng.random((300, 10)) > 0.5).astype(np.float32)
+    clusters = rng.integers(0, 6, size=280)
+    index = build_neighbor_index('ivf', 10, threshold=0.3, n_probe=6, clusters=clusters).fit(matrix)
+
+    # Etiketli satırlar kendi listelerinde, etiketsiz son satırlar en yakın merkezin listesinde
+    assert index.centroids.shape == (6, 10)
+    np.testing.assert_array_equal(index.assignments[:280], clusters)
+    tail = np.asarray(index.normalized[280:] @ index.centroids.T).argmax(axis=1)
+    np.testing.assert_array_equal(index.assignments[280:], tail)
+
+    # Tüm listeler taranınca sonuç tam aramayla aynı
+    rows = np.arange(0, 300, 7)
+    expected = TopKNeighborIndex(10, threshold=0.3).fit(matrix).neighbors_batch(rows, 10)
+    actual = index.neighbors_batch(rows, 10)
+    np.testing.assert_array_equal(expected[2], actual[2])
+    np.testing.assert_allclose(expected[1], actual[1], rtol=1e-6)
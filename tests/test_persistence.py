@@ -0,0 +1,19 @@
+import pandas as pd
+import pytest
+
+from tests.conftest import TEST_USERS
+
+
+@pytest.mark.parametrize("mode", ['user', 'item', 'cluster'])
+def test_saved_model_loads_without_refit(recommenders, datasets, tmp_path, mode):
+    user_df, item_df = datasets
+    recommender = recommenders[mode]
+    path = str(tmp_path / f"{mode}.joblib")
+    recommender.save(path)
+
+    loaded = type(recommender).load(path, user_df, item_df)
+    assert loaded.model_version != recommender.model_version
+
+    pd.testing.assert_frame_equal(
+        recommender.get_recommendations_batch(TEST_USERS, 10),
+        loaded.get_recommendations_batch(TEST_USERS, 10))
@@ -0,0 +1,59 @@
+import json
+
+from common.profiling import Profiler, profiler
+
+
+def test_nested_spans_and_counters():
+    local = Profiler()
+    local.enable()
+
+    @local.timed('inner')
+    def work():
+        local.count('items', 3)
+        return 42
+
+    with local.span('outer'):
+        assert work() == 42
+        work()
+    with local.span('other'):
+        pass
+
+    report = local.report()
+    assert list(report['spans']) == ['outer', 'outer/inner', 'other']
+    assert report['spans']['outer/inner']['calls'] == 2
+    assert report['spans']['outer']['total_s'] >= report['spans']['outer/inner']['total_s']
+    assert report['counters'] == {'items': 6}
+    json.dumps(report)
+
+    text = local.format_report()
+    assert text.index('outer') < text.index('  inner') < text.index('other')
+
+
+def test_disabled_profiler_records_nothing():
+    local = Profiler()
+    assert local.span('a') is local.span('b')
+
+    @local.timed('work')
+    def work(value):
+        local.count('calls')
+        return value * 2
+
+    with local.span('outer'):
+        assert work(21) == 42
+    assert local.report()['spans'] == {} and local.report()['counters'] == {}
+
+    # Uygulama genelindeki ölçüm nesnesi varsayılan olarak kapalıdır
+    assert not profiler.enabled
+
+
+def test_recommender_spans(datasets, recommenders):
+    profiler.enable()
+    try:
+        recommenders['cluster'].get_recommendations_batch([1, 2], 5)
+        recommenders['user'].get_recommendations_batch([1, 2], 5)
+    finally:
+        profiler.disable()
+
+    report = profiler.report()
+    assert {'cluster.recommend_batch', 'user.recommend_batch'} <= set(report['spans'])
+    assert report['counters']['cluster.items_scored'] == 2 * len(datasets[1])
@@ -1,21 +1,33 @@
-import sys
-import os
+import pandas as pd
 import pytest
 
-# sys.path ekleme (gerekebilir)
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
-
-from data_preparation import prepare_data
-from utils import compute_similarity, recommend_items_for_user
+from tests.conftest import TEST_USERS, single_recommendations
 
 
+@pytest.mark.parametrize("mode", ['user', 'item', 'cluster'])
 @pytest.mark.parametrize("user_id, num_recs", [(569, 3), (10, 5)])
-def test_recommendation(user_id, num_recs):
-    df, feature_matrix, ohe, numeric_cols, categorical_cols = prepare_data()
-    sim_matrix = compute_similarity(feature_matrix)
-    items = recommend_items_for_user(user_id, df, sim_matrix, num_recs)
+def test_recommendation(recommenders, mode, user_id, num_recs):
+    recommendations = recommenders[mode].get_recommendations_batch([user_id], num_recs)
+    items = recommendations['Item Purchased'].tolist()
     assert len(items) <= num_recs
-    
-    # Her bir önerilen item string olmalıs
+    assert (recommendations['User ID'] == user_id).all()
+
+    # Her bir önerilen item string olmalı
     for it in items:
         assert isinstance(it, str)
+
+
+@pytest.mark.parametrize("mode", ['user', 'item', 'cluster'])
+@pytest.mark.parametrize("n", [5, 25])
+def test_batch_matches_single_user(recommenders, mode, n):
+    recommender = recommenders[mode]
+    batch = recommender.get_recommendations_batch(TEST_USERS, n)
+
+    for user_id in TEST_USERS:
+        expected = single_recommendations(recommender, user_id, n)
+        actual = batch[batch['User ID'] == user_id].drop(columns=['User ID', 'Rank'])
+        if expected.empty:
+            assert actual.empty
+            continue
+        pd.testing.assert_frame_equal(
+            expected.reset_index(drop=True), actual.reset_index(drop=True), check_dtype=False)
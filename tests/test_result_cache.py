@@ -0,0 +1,53 @@
+import pandas as pd
+
+from common.persistence import new_model_version
+from common.result_cache import ResultCache
+from tests.conftest import CountingRecommender
+
+
+def test_prefix_hits_and_invalidation(recommenders):
+    recommender = CountingRecommender(recommenders['item'])
+    cache = ResultCache({'item': recommender}, max_entries=10)
+
+    cache.get_recommendations('item', 569, 8)
+    small = cache.get_recommendations('item', 569, 5)
+    pd.testing.assert_frame_equal(
+        small.to_frame(), recommenders['item'].get_recommendations_batch([569], 5))
+    assert recommender.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Daha büyük n önbellekten yanıtlanamaz
+    cache.get_recommendations('item', 569, 10)
+    assert recommender.calls == 2
+
+    # Model yenilendiğinde kayıt geçersizleşir
+    recommender.model_version = new_model_version()
+    cache.get_recommendations('item', 569, 5)
+    assert recommender.calls == 3
+    assert cache.invalidations == 1
+
+
+def test_user_prefix_hits_match_direct_results(recommenders):
+    recommender = CountingRecommender(recommenders['user'])
+    cache = ResultCache({'user': recommender})
+
+    cache.get_recommendations('user', 569, 10)
+    small = cache.get_recommendations('user', 569, 5)
+    pd.testing.assert_frame_equal(
+        small.to_frame(), recommenders['user'].get_recommendations_batch([569], 5))
+    assert recommender.calls == 1 and cache.hits == 1
+
+
+def test_lru_eviction(recommenders):
+    recommender = CountingRecommender(recommenders['user'])
+    cache = ResultCache({'user': recommender}, max_entries=2)
+
+    for user_id in [1, 2, 1, 3]:
+        cache.get_recommendations('user', user_id, 5)
+    assert cache.evictions == 1
+
+    # 2 en eski kullanılan kayıttı ve çıkarıldı; 1 hâlâ önbellekte
+    cache.get_recommendations('user', 1, 5)
+    cache.get_recommendations('user', 2, 5)
+    assert cache.stats()['hits'] == 2
+    assert recommender.calls == 4
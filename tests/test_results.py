@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.utils import RecommendationFormatter
+
+
+@pytest.mark.parametrize("mode", ['user', 'item', 'cluster'])
+def test_result_views_match_frame(recommenders, mode):
+    result = recommenders[mode].recommend_batch([1, 2, 569], 10)
+    frame = result.to_frame()
+    assert len(result) == len(frame)
+
+    # Kayıt görünümü DataFrame satırlarıyla aynı değerleri verir
+    for index in [0, len(result) // 2, -1]:
+        record = result[index]
+        row = frame.iloc[index]
+        assert record.user_id == row['User ID'] and record.rank == row['Rank']
+        for name in result.columns:
+            assert record[name] == row[name]
+
+    # Önek, her kullanıcı için ilk n öneridir
+    pd.testing.assert_frame_equal(
+        result.head(3).to_frame(),
+        frame[frame['Rank'] <= 3].reset_index(drop=True))
+
+    records = result.head(3).to_records()
+    assert [entry['Rank'] for entry in records] == frame.loc[frame['Rank'] <= 3, 'Rank'].tolist()
+    assert all(type(entry['Similarity']) is float for entry in records)
+
+
+def test_formatter_accepts_result_and_frame(recommenders):
+    recommendations, target = recommenders['item'].get_recommendations(569, 3)
+    assert not recommendations.empty and target is not None
+
+    from_result = RecommendationFormatter.format_recommendations(recommendations, mode='ürün')
+    from_frame = RecommendationFormatter.format_recommendations(
+        recommendations.to_frame(include_query=False), mode='ürün')
+    assert from_result == from_frame
+
+    empty, target = recommenders['user'].get_recommendations(999999, 3)
+    assert empty.empty and target is None
+    assert empty.to_frame().empty
+    assert np.array_equal(empty.head(5).scores, [])
@@ -0,0 +1,55 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from common.customer_index import CustomerIndex
+from common.server import RecommendationService, make_server
+
+
+@pytest.fixture(scope='module')
+def server_url(datasets, recommenders):
+    user_df, item_df = datasets
+    service = RecommendationService(recommenders, CustomerIndex.from_frame(item_df))
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def get_json(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize("mode", ['user', 'item', 'cluster'])
+def test_recommend_endpoint_matches_batch(server_url, recommenders, mode):
+    status, payload = get_json(f"{server_url}/recommend?user_id=569&mode={mode}&n=5")
+    assert status == 200
+
+    expected = recommenders[mode].get_recommendations_batch([569], 5)
+    assert [row['Item Purchased'] for row in payload['recommendations']] == \
+        expected['Item Purchased'].tolist()
+    assert [row['Rank'] for row in payload['recommendations']] == expected['Rank'].tolist()
+
+
+def test_errors_and_stats(server_url):
+    assert get_json(f"{server_url}/recommend?user_id=999999&mode=user")[0] == 404
+    assert get_json(f"{server_url}/recommend?user_id=1&mode=nope")[0] == 400
+    assert get_json(f"{server_url}/recommend?mode=user")[0] == 400
+    get_json(f"{server_url}/recommend?user_id=2&mode=item&n=3")
+
+    status, stats = get_json(f"{server_url}/stats")
+    assert status == 200
+    assert stats['user']['errors'] >= 1
+    assert stats['item']['requests'] >= 1
+    assert stats['item']['p50_ms'] <= stats['item']['p99_ms']
+    assert stats['batching']['requests'] >= 1 and stats['batching']['max_batch'] > 1
@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from tests.conftest import DATA_PATH
+
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+# --help yalnızca argparse ve hafif modülleri yüklemeli (ölçülen ~0.3 s; yavaş makineler için pay bırakıldı)
+HELP_STARTUP_BUDGET_S = 1.5
+
+# Bir modda yüklenmemesi gereken ağır modüller
+HEAVY_MODULES = ['matplotlib', 'kneed', 'common.evaluation', 'sklearn.cluster',
+                 'models.collaborative_user.user_recommender',
+                 'models.collaborative_item.item_recommender',
+                 'models.kmeans_hybrid.cluster_recommender']
+
+# --help yalnızca varsayılanları gösterir; kalıcılık, sunucu ve dışa aktarım modülleri de yüklenmemeli
+HELP_SKIPPED_MODULES = HEAVY_MODULES + ['joblib', 'common.persistence', 'common.result_cache',
+                                        'common.batching', 'common.export']
+
+LOADED_MODULES_SCRIPT = """
+import contextlib, io, json, runpy, sys
+sys.argv = ['main.py'] + sys.argv[1:]
+with contextlib.redirect_stdout(io.StringIO()), contextlib.suppress(SystemExit):
+    runpy.run_path('src/main.py', run_name='__main__')
+print(json.dumps(sorted(name for name in {modules} if name in sys.modules)))
+"""
+
+
+def run_main(*args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def loaded_heavy_modules(*args, modules=HEAVY_MODULES):
+    script = LOADED_MODULES_SCRIPT.format(modules=modules)
+    return set(json.loads(run_main('-c', script, *args).stdout.strip().splitlines()[-1]))
+
+
+def test_help_starts_fast():
+    started = time.perf_counter()
+    run_main('src/main.py', '--help')
+    assert time.perf_counter() - started < HELP_STARTUP_BUDGET_S
+
+    assert loaded_heavy_modules('--help', modules=HELP_SKIPPED_MODULES) == set()
+
+
+def test_cli_defaults_match_module_constants():
+    from common.batching import DEFAULT_MAX_BATCH, DEFAULT_MAX_WAIT
+    from common.export import DEFAULT_EXPORT_DIR, EXPORT_FORMATS
+    from common.persistence import DEFAULT_ARTIFACT_DIR
+    from common.result_cache import DEFAULT_CACHE_SIZE
+    from src.main import build_parser
+
+    args = build_parser().parse_args([])
+    assert args.artifact_dir == DEFAULT_ARTIFACT_DIR
+    assert args.cache_size == DEFAULT_CACHE_SIZE
+    assert args.max_wait_ms == DEFAULT_MAX_WAIT * 1000
+    assert args.max_batch == DEFAULT_MAX_BATCH
+    assert args.export_dir == DEFAULT_EXPORT_DIR
+    assert args.export_format in EXPORT_FORMATS
+    for file_format in EXPORT_FORMATS:
+        assert build_parser().parse_args(['--export_format', file_format]).export_format == file_format
+
+
+@pytest.mark.parametrize("mode, expected", [
+    ('item', {'models.collaborative_item.item_recommender'}),
+    ('user', {'models.collaborative_user.user_recommender'}),
+])
+def test_mode_loads_only_its_modules(tmp_path, mode, expected):
+    args = ['--mode', mode, '--user_id', '1', '--data_path', DATA_PATH,
+            '--artifact_dir', str(tmp_path)]
+    assert loaded_heavy_modules(*args) == expected
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.neighbors import TopKNeighborIndex
+from models.collaborative_user.user_recommender import UserBasedRecommender
+from tests.conftest import TEST_USERS, fit_then_update, single_recommendations
+
+
+def test_incremental_update_matches_refit_neighbors(datasets):
+    recommender, _ = fit_then_update(UserBasedRecommender, datasets, n_neighbors=10)
+
+    # Artımlı komşu listeleri, aynı kodlanmış matrisle baştan hesaplananlarla aynı
+    refit = TopKNeighborIndex(10).fit(recommender.encoded_users)
+    np.testing.assert_array_equal(recommender.neighbor_index.indices, refit.indices)
+
+    # Yeni müşteriler öneri alabilir
+    batch = recommender.get_recommendations_batch([3800, 3900], 5)
+    assert set(batch['User ID']) == {3800, 3900}
+
+
+@pytest.mark.parametrize("backend", ['ivf', 'lsh'])
+def test_approximate_backend_recommender(datasets, tmp_path, backend):
+    user_df, item_df = datasets
+    recommender = UserBasedRecommender(user_df, item_df, n_neighbors=10, neighbor_backend=backend)
+    batch = recommender.get_recommendations_batch(TEST_USERS, 10)
+
+    for user_id in TEST_USERS[:3]:
+        expected = single_recommendations(recommender, user_id, 10)
+        actual = batch[batch['User ID'] == user_id].drop(columns=['User ID', 'Rank'])
+        pd.testing.assert_frame_equal(
+            expected.reset_index(drop=True), actual.reset_index(drop=True), check_dtype=False)
+
+    path = str(tmp_path / f"{backend}.joblib")
+    recommender.save(path)
+    loaded = UserBasedRecommender.load(path, user_df, item_df)
+    assert loaded.neighbor_index.backend == backend
+    pd.testing.assert_frame_equal(batch, loaded.get_recommendations_batch(TEST_USERS, 10))